@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, absolute_import, division, print_function
 
-import random
 import functools
+import multiprocessing
 from collections import Iterable
 import enum
+import numpy as np
+
+
+# 97.5% quantile of the normal distribution, for 95% confidence intervals
+_Z = 1.959963984540054
 
 
 class _PokerEnumMeta(enum.EnumMeta):
@@ -27,8 +32,9 @@ class _PokerEnumMeta(enum.EnumMeta):
             value = value.upper()
         return super(_PokerEnumMeta, cls).__call__(value)
 
-    def make_random(cls):
-        return random.choice(list(cls))
+    def make_random(cls, random_state=None):
+        members = list(cls)
+        return members[_make_random_state(random_state).randint(len(members))]
 
 
 @functools.total_ordering
@@ -94,3 +100,40 @@ def _make_float(string):
 
 def _make_int(string):
     return int(string.strip().replace(',', ''))
+
+
+def _make_random_state(random_state=None):
+    """Make a numpy RandomState from an int seed, or return the RandomState given.
+    None means the global numpy random state.
+    """
+    if random_state is None:
+        return np.random.mtrand._rand
+    elif isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
+
+
+def _spawn_random_states(random_state, count):
+    """Make count independent RandomStates (e.g. one for every parallel task). The same int
+    seed always gives the same streams, no matter in which order or process they are used.
+    """
+    if random_state is None or isinstance(random_state, np.random.RandomState):
+        random_state = _make_random_state(random_state).randint(1 << 31)
+    return [np.random.RandomState([random_state, ind]) for ind in range(count)]
+
+
+def _parallel_map(function, arguments, processes=1):
+    """List of function results for every argument, calculated in processes number of worker
+    processes, or in this process for one. The workers are stopped and joined when done."""
+    if processes <= 1:
+        return [function(argument) for argument in arguments]
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(function, arguments)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Vectorized Hold'em hand evaluator and card/combo indexing used by the equity modules.
+
+    Cards are represented as integers 0-51 in the same order as ``Card`` iterates:
+    ``rank * 4 + suit`` where rank 0 is a deuce and 12 is an ace and suits are ordered
+    clubs, diamonds, hearts, spades. Combos are indexed 0-1325 in lexicographic order of
+    their card pairs, Hands 0-168 in the order of ``Hand`` iteration.
+"""
+
+import itertools
+import numpy as np
+from .card import Card
+from .hand import Hand, Combo, Range
+
+
+CARDS = tuple(Card)
+"""All the 52 Cards in index order."""
+
+_CARD_INDEX = {card: ind for ind, card in enumerate(CARDS)}
+
+COMBO_CARDS = np.array([(second, first) for first, second in itertools.combinations(range(52), 2)],
+                       dtype=np.int8)
+"""(1326, 2) array of card indexes for every combo, higher card first."""
+
+_COMBO_INDEX = np.full((52, 52), -1, dtype=np.int16)
+_COMBO_INDEX[COMBO_CARDS[:, 0], COMBO_CARDS[:, 1]] = np.arange(1326)
+_COMBO_INDEX[COMBO_CARDS[:, 1], COMBO_CARDS[:, 0]] = np.arange(1326)
+
+COMBOS = tuple(Combo.from_cards(CARDS[first], CARDS[second]) for first, second in COMBO_CARDS)
+"""All the 1326 Combos in index order."""
+
+HANDS = tuple(Hand)
+"""All the 169 Hands in index order."""
+
+_HAND_INDEX = {hand: ind for ind, hand in enumerate(HANDS)}
+
+COMBO_HANDS = np.array([_HAND_INDEX[combo.to_hand()] for combo in COMBOS], dtype=np.int16)
+"""Hand index of every combo."""
+
+COMBO_MASKS = (np.int64(1) << COMBO_CARDS[:, 0].astype(np.int64)) | \
+              (np.int64(1) << COMBO_CARDS[:, 1].astype(np.int64))
+"""64 bit card mask of every combo."""
+
+SUIT_PERMUTATIONS = np.array(list(itertools.permutations(range(4))), dtype=np.int8)
+"""All the 24 possible suit permutations."""
+
+PERMUTED_CARDS = ((np.arange(52) & ~3)[np.newaxis, :] |
+                  SUIT_PERMUTATIONS[:, np.arange(52) & 3]).astype(np.int8)
+"""(24, 52) array; card indexes after applying every suit permutation."""
+
+PERMUTED_COMBOS = _COMBO_INDEX[PERMUTED_CARDS[:, COMBO_CARDS[:, 0]],
+                               PERMUTED_CARDS[:, COMBO_CARDS[:, 1]]]
+"""(24, 1326) array; combo indexes after applying every suit permutation."""
+
+
+def card_index(card):
+    return _CARD_INDEX[Card(card)]
+
+
+def combo_index(combo):
+    combo = Combo(combo)
+    return int(_COMBO_INDEX[_CARD_INDEX[combo.first], _CARD_INDEX[combo.second]])
+
+
+def hand_index(hand):
+    return _HAND_INDEX[Hand(hand)]
+
+
+def cards_to_array(cards):
+    """Convert an iterable of Cards or card strings (or None) to an array of card indexes."""
+    if not cards:
+        return np.zeros(0, dtype=np.int8)
+    return np.array([card_index(card) for card in cards], dtype=np.int8)
+
+
+def cards_to_mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << int(card)
+    return mask
+
+
+def to_weights(holding):
+    """Make a 1326 long float array of combo weights from a Combo, Hand, Range, range string
+    or from an already made weight array.
+    """
+    if isinstance(holding, np.ndarray):
+        if holding.shape != (1326,):
+            raise ValueError('Weight array should have a shape of (1326,), not %r' %
+                             (holding.shape,))
+        return holding.astype(np.float64)
+
+    weights = np.zeros(1326)
+    if isinstance(holding, Combo):
+        weights[combo_index(holding)] = 1
+    elif isinstance(holding, Hand):
+        weights[[combo_index(combo) for combo in holding.to_combos()]] = 1
+    else:
+        if not isinstance(holding, Range):
+            holding = Range(holding)
+        # the bits of a Range are in combo index order
+        weights[holding._indexes] = 1
+    return weights
+
+
+def conflicts(first_indexes, second_indexes):
+    """Boolean matrix of combos sharing a card between the two lists of combo indexes."""
+    first_masks = COMBO_MASKS[first_indexes]
+    second_masks = COMBO_MASKS[second_indexes]
+    return (first_masks[:, np.newaxis] & second_masks[np.newaxis, :]) != 0
+
+
+def combinations(n, k):
+    """Every k long sorted combinations of range(n) as an array in lexicographic order,
+    the same as ``itertools.combinations(range(n), k)``, just much faster.
+    """
+    if k == 0:
+        return np.zeros((1, 0), dtype=np.int8)
+    result = np.arange(n).reshape(-1, 1)
+    for _ in range(k - 1):
+        last = result[:, -1]
+        counts = n - 1 - last
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        following = np.repeat(last + 1, counts) + np.arange(counts.sum()) - starts
+        result = np.column_stack([np.repeat(result, counts, axis=0), following])
+    return result.astype(np.int8)
+
+
+# Lookup tables for every possible 13 bit rank mask
+_MASKS = np.arange(1 << 13)
+_RANK_BITS = 1 << np.arange(13)
+
+_POPCOUNT = ((_MASKS[:, np.newaxis] & _RANK_BITS) != 0).sum(axis=1)
+
+# index of the highest rank in the mask, 0 for the empty mask
+_TOP = np.zeros(1 << 13, dtype=np.int32)
+_TOP[1:] = np.floor(np.log2(_MASKS[1:])).astype(np.int32)
+
+
+def _keep_top(count):
+    """Lookup table which keeps only the highest count ranks of the mask."""
+    kept = _MASKS.copy()
+    for _ in range(13):
+        kept = np.where(_POPCOUNT[kept] > count, kept & (kept - 1), kept)
+    return kept.astype(np.int32)
+
+
+_KEEP1, _KEEP2, _KEEP3, _KEEP5 = _keep_top(1), _keep_top(2), _keep_top(3), _keep_top(5)
+
+# highest rank of a straight in the mask + 1, 0 if there is none
+_STRAIGHT = np.zeros(1 << 13, dtype=np.int32)
+for _high in range(3, 13):
+    if _high == 3:
+        _window = 0b1111 | (1 << 12)  # wheel
+    else:
+        _window = 0b11111 << (_high - 4)
+    _STRAIGHT[(_MASKS & _window) == _window] = _high + 1
+del _high, _window
+
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+CATEGORY_SHIFT = 26
+"""Hand category can be get from a hand value by shifting it with CATEGORY_SHIFT."""
+
+
+def evaluate(cards):
+    """Evaluate 5-7 card hands. The last axis of cards are card indexes of one hand.
+    Returns an int32 array of hand values; the bigger the value, the stronger the hand.
+    """
+    cards = np.asarray(cards)
+    shape = cards.shape[:-1]
+    cards = cards.reshape(-1, cards.shape[-1]).astype(np.intp)
+    hands_num = len(cards)
+
+    ranks = cards >> 2
+    suits = cards & 3
+    rank_bits = (1 << ranks).astype(np.int32)
+
+    rows = np.arange(hands_num)[:, np.newaxis]
+    counts = np.bincount((rows * 13 + ranks).ravel(), minlength=hands_num * 13)
+    counts = counts.reshape(hands_num, 13)
+
+    m1 = (counts >= 1).astype(np.int32).dot(_RANK_BITS).astype(np.int32)
+    m2 = (counts >= 2).astype(np.int32).dot(_RANK_BITS).astype(np.int32)
+    m3 = (counts >= 3).astype(np.int32).dot(_RANK_BITS).astype(np.int32)
+    m4 = (counts >= 4).astype(np.int32).dot(_RANK_BITS).astype(np.int32)
+
+    flush_mask = np.zeros(hands_num, dtype=np.int32)
+    for suit in range(4):
+        suit_mask = np.bitwise_or.reduce(np.where(suits == suit, rank_bits, 0), axis=1)
+        flush_mask |= np.where(_POPCOUNT[suit_mask] >= 5, suit_mask, 0).astype(np.int32)
+
+    straight_flush = _STRAIGHT[flush_mask]
+    straight = _STRAIGHT[m1]
+
+    quad = _TOP[m4]
+    trip = _TOP[m3]
+    pair = _TOP[m2]
+    fullhouse_pair = m2 & ~(1 << trip)
+    second_pair = _TOP[m2 & ~(1 << pair)]
+
+    conditions = [
+        straight_flush > 0,
+        m4 > 0,
+        (m3 > 0) & (fullhouse_pair > 0),
+        flush_mask > 0,
+        straight > 0,
+        m3 > 0,
+        _POPCOUNT[m2] >= 2,
+        m2 > 0,
+    ]
+    choices = [
+        (STRAIGHT_FLUSH << CATEGORY_SHIFT) | straight_flush,
+        (QUADS << CATEGORY_SHIFT) | (quad << 13) | _KEEP1[m1 & ~(1 << quad)],
+        (FULL_HOUSE << CATEGORY_SHIFT) | (trip << 4) | _TOP[fullhouse_pair],
+        (FLUSH << CATEGORY_SHIFT) | _KEEP5[flush_mask],
+        (STRAIGHT << CATEGORY_SHIFT) | straight,
+        (TRIPS << CATEGORY_SHIFT) | (trip << 13) | _KEEP2[m1 & ~(1 << trip)],
+        ((TWO_PAIR << CATEGORY_SHIFT) | (pair << 17) | (second_pair << 13) |
+         _KEEP1[m1 & ~(1 << pair) & ~(1 << second_pair)]),
+        (PAIR << CATEGORY_SHIFT) | (pair << 13) | _KEEP3[m1 & ~(1 << pair)],
+    ]
+    values = np.select(conditions, choices, default=_KEEP5[m1])
+    return values.astype(np.int32).reshape(shape)
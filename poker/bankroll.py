@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Winrate, variance, downswing and risk of ruin estimates from hand results.
+"""
+
+import re
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from ._common import _make_random_state, _Z
+
+
+__all__ = ['hand_results', 'winrate', 'simulate_bankroll', 'risk_of_ruin']
+
+
+_Winrate = namedtuple('_Winrate', 'winrate std interval hands')
+"""Named tuple for the winrate and standard deviation per a number of hands (100 by default),
+the 95% confidence interval of the winrate and the number of hands."""
+
+_Simulation = namedtuple('_Simulation', 'results downswings ruin')
+"""Named tuple for the simulated paths: the final result and the biggest downswing (drop from
+the highest point before) of every path and the ratio of the paths losing the bankroll."""
+
+# random increments generated at once, bounds the memory of a simulation
+_CHUNK_SIZE = 1 << 22
+
+# hand history formats hand results can be read from
+_ROOMS = ('PokerStars ', 'Full Tilt Poker ')
+
+_AMOUNT = r'\$?([\d,]+(?:\.\d+)?)'
+_UNCALLED_RE = re.compile(r'^Uncalled bet (?:of )?\(?%s\)? returned to (.*)$' % _AMOUNT)
+
+# the hero's lines after the name and what their amount is: money not counting in the bets of
+# the street, added to the street, all of the street or collected
+_HERO_LINES = tuple((re.compile(pattern % _AMOUNT), kind) for pattern, kind in (
+    (r'posts (?:the )?ante (?:of )?%s', 'dead'),
+    (r'antes %s', 'dead'),
+    (r'posts (?:the )?small & big blinds (?:of )?%s', 'blinds'),
+    (r'posts (?:the )?(?:small|big) blind (?:of )?%s', 'put'),
+    (r'(?:bets|calls) %s', 'put'),
+    (r'raises (?:\$?[\d,.]+ )?to %s', 'to'),
+    (r'collected %s', 'won'),
+    (r'(?:wins|ties for) (?:the )?(?:main |side )?pot(?: #\d+)? \(%s\)', 'won'),
+))
+
+
+def hand_results(hand_histories, big_blinds=True):
+    """Results of the hero in every hand: everything the hero collected and got back as an
+    uncalled bet minus the antes, blinds, bets, calls and raises the hero put in, in big blinds
+    of the hand by default.
+
+    Hand histories are parsed if they were not yet and can be in any order, hands are ordered by
+    date. The result is read from the hero's own lines of the raw PokerStars or Full Tilt Poker
+    hand history, so chips added between hands (top-ups, rebuys) are not counted. Hands without
+    a hero, of other rooms or with more put in than the hero's stack are skipped.
+    Returns a numpy array of the results in date order.
+    """
+    results = []
+    for hand_history in hand_histories:
+        if not hand_history.parsed:
+            hand_history.parse()
+        if getattr(hand_history, 'hero', None) is None:
+            continue
+        result = _hero_result(hand_history)
+        if result is None:
+            continue
+        if big_blinds:
+            result = result / hand_history.bb
+        results.append((hand_history.date, float(result)))
+    results.sort(key=lambda date_result: date_result[0])
+    return np.array([result for date, result in results], dtype=np.float64)
+
+
+def _hero_result(hand_history):
+    """Chips won (or lost if negative) by the hero, None if it can not be worked out."""
+    if not hand_history.raw.startswith(_ROOMS):
+        return None
+    hero = hand_history.hero.name
+    dead = street = put_in = won = Decimal(0)
+    for line in hand_history.raw.splitlines():
+        if line.startswith('*** SUMMARY'):
+            break
+        elif line.startswith(('*** FLOP', '*** TURN', '*** RIVER')):
+            put_in += street
+            street = Decimal(0)
+            continue
+        match = _UNCALLED_RE.match(line)
+        if match:
+            if match.group(2) == hero:
+                won += _amount(match.group(1))
+            continue
+        if not line.startswith((hero + ': ', hero + ' ')):
+            continue
+        action = line[len(hero):].lstrip(':').lstrip()
+        for regex, kind in _HERO_LINES:
+            match = regex.match(action)
+            if not match:
+                continue
+            amount = _amount(match.group(1))
+            if kind == 'dead':
+                dead += amount
+            elif kind == 'blinds':
+                # the small blind part is dead, the big blind part counts as a bet
+                dead += hand_history.sb
+                street += amount - hand_history.sb
+            elif kind == 'put':
+                street += amount
+            elif kind == 'to':
+                street = amount
+            else:
+                won += amount
+            break
+    put_in += street + dead
+    if put_in > hand_history.hero.stack:
+        return None
+    return won - put_in
+
+
+def _amount(text):
+    return Decimal(text.replace(',', ''))
+
+
+def winrate(results, per=100):
+    """Winrate and standard deviation per the given number of hands of the results of every
+    hand (like bb/100 with results in big blinds), the winrate with a 95% confidence interval.
+    """
+    results = np.asarray(results, dtype=np.float64)
+    hands = len(results)
+    if hands < 2:
+        raise ValueError('At least two hands are needed, not %d!' % hands)
+    mean = results.mean() * per
+    std = results.std(ddof=1) * np.sqrt(per)
+    error = _Z * std / np.sqrt(hands / per)
+    return _Winrate(mean, std, (mean - error, mean + error), hands)
+
+
+def simulate_bankroll(winrate, std, hands, bankroll=None, paths=10000, steps=1000, per=100,
+                      random_state=None):
+    """Simulate paths of hands played with a winrate and standard deviation per the given
+    number of hands (like the ones from :func:`winrate`).
+
+    The hands are played in steps of (almost) equal size, the result of a step is normally
+    distributed: sums of many hands are, whatever the distribution of single hands. More steps
+    find downswings and ruins between them more precisely. Paths are simulated in chunks with
+    every step at once, the time only depends on paths * steps (about 0.1s a million), not on
+    the number of hands.
+    Returns the results of every path with the ratio of paths losing the bankroll (None without
+    a bankroll).
+    """
+    if hands < 1 or paths < 1:
+        raise ValueError('There should be hands and paths to simulate!')
+    random_state = _make_random_state(random_state)
+    steps = min(steps, hands)
+    step_hands = np.diff(np.linspace(0, hands, steps + 1).round())
+    means = step_hands * winrate / per
+    stds = np.sqrt(step_hands / per) * std
+
+    results = np.empty(paths)
+    downswings = np.empty(paths)
+    ruined = 0
+    chunk_size = max(_CHUNK_SIZE // steps, 1)
+    for start in range(0, paths, chunk_size):
+        count = min(chunk_size, paths - start)
+        totals = np.cumsum(random_state.standard_normal((count, steps)) * stds + means, axis=1)
+        # the highest point starts at zero before the first hand
+        peaks = np.maximum(np.maximum.accumulate(totals, axis=1), 0)
+        results[start:start + count] = totals[:, -1]
+        downswings[start:start + count] = (peaks - totals).max(axis=1)
+        if bankroll is not None:
+            ruined += (totals.min(axis=1) <= -bankroll).sum()
+    return _Simulation(results, downswings, ruined / paths if bankroll is not None else None)
+
+
+def risk_of_ruin(winrate, std, bankroll):
+    """Probability of ever losing the bankroll playing forever with the winrate and standard
+    deviation (per the same number of hands), for normally distributed results.
+    """
+    if winrate <= 0:
+        return 1.
+    return min(np.exp(-2 * winrate * bankroll / std ** 2), 1.)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Persistent, size-bounded cache for equity results.
+"""
+
+import time
+import pickle
+import hashlib
+import sqlite3
+from collections import namedtuple, OrderedDict as odict
+import numpy as np
+from . import _eval
+from .equity import equity, _canonize
+
+
+__all__ = ['EquityCache']
+
+
+_CacheInfo = namedtuple('_CacheInfo', 'hits disk_hits misses memory_size disk_size')
+"""Named tuple for cache statistics. Sizes are number of items in memory and bytes on disk."""
+
+
+class EquityCache(object):
+    """Cache equity results in memory (LRU) and optionally in an SQLite database on disk.
+
+    Results are keyed by the canonical form of the situation: two situations which are the same
+    after renaming suits (e.g. AsJs vs QQ on Ks 7s 2d and AhJh vs QQ on Kh 7h 2c) share
+    the same cache entry. Entries older than max_age seconds are not returned (from memory or
+    disk) and are evicted from disk, the least recently used ones too when the database grows
+    bigger than max_bytes.
+    Access times of hits are written with the next stored result (or on close), so reads
+    don't commit transactions.
+    """
+
+    def __init__(self, filename=None, maxsize=1024, max_bytes=100 * 1024 * 1024, max_age=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._memory = odict()
+        self._hits = self._disk_hits = self._misses = 0
+        # access times of hits not written to disk yet
+        self._accessed = {}
+        self._db = None
+        if filename is not None:
+            self._db = sqlite3.connect(unicode(filename))
+            self._db.execute('CREATE TABLE IF NOT EXISTS equity (key TEXT PRIMARY KEY, '
+                             'value BLOB, size INTEGER, created REAL, accessed REAL)')
+            self._db.commit()
+
+    def equity(self, hero, villain, board=None, **kwargs):
+        """Same as :func:`poker.equity.equity`, but results are looked up from the cache first."""
+        key = make_key(hero, villain, board, **kwargs)
+        return self.get_or_calculate(key, lambda: equity(hero, villain, board, **kwargs))
+
+    def get_or_calculate(self, key, calculate):
+        """Look up the result for key, or call calculate without arguments and store its result."""
+        now = time.time()
+        try:
+            created, value = self._memory.pop(key)
+        except KeyError:
+            pass
+        else:
+            if not self._expired(created, now):
+                self._hits += 1
+                self._memory[key] = created, value
+                if self._db is not None:
+                    self._accessed[key] = now
+                return value
+
+        entry = self._get_from_disk(key, now)
+        if entry is not None:
+            self._disk_hits += 1
+            created, value = entry
+        else:
+            self._misses += 1
+            created, value = now, calculate()
+            self._put_to_disk(key, value, created)
+
+        self._memory[key] = created, value
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return value
+
+    @property
+    def info(self):
+        self._write_accessed()
+        disk_size = 0
+        if self._db is not None:
+            disk_size = self._db.execute('SELECT TOTAL(size) FROM equity').fetchone()[0]
+        return _CacheInfo(self._hits, self._disk_hits, self._misses, len(self._memory),
+                          int(disk_size))
+
+    def clear(self):
+        """Remove every entry from memory and disk and reset statistics."""
+        self._memory.clear()
+        self._accessed.clear()
+        self._hits = self._disk_hits = self._misses = 0
+        if self._db is not None:
+            self._db.execute('DELETE FROM equity')
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._write_accessed()
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def _expired(self, created, now):
+        return self.max_age is not None and created < now - self.max_age
+
+    def _get_from_disk(self, key, now):
+        """The creation time and value of key, None if it is not on disk or expired."""
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT value, created FROM equity WHERE key = ?',
+                               (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, created = row
+        if self._expired(created, now):
+            self._db.execute('DELETE FROM equity WHERE key = ?', (key,))
+            self._db.commit()
+            return None
+
+        self._accessed[key] = now
+        return created, pickle.loads(bytes(value))
+
+    def _put_to_disk(self, key, value, now):
+        if self._db is None:
+            return
+        value = pickle.dumps(value, protocol=2)
+        self._db.execute('INSERT OR REPLACE INTO equity VALUES (?, ?, ?, ?, ?)',
+                         (key, sqlite3.Binary(value), len(value) + len(key), now, now))
+        # the least recently used entries are evicted by the latest access times
+        self._write_accessed()
+        self._evict(now)
+        self._db.commit()
+
+    def _write_accessed(self):
+        """Update the access times of the hits since the last write, in the open transaction."""
+        if self._db is None or not self._accessed:
+            return
+        self._db.executemany('UPDATE equity SET accessed = ? WHERE key = ?',
+                             [(accessed, key) for key, accessed in self._accessed.items()])
+        self._accessed.clear()
+
+    def _evict(self, now):
+        if self.max_age is not None:
+            self._db.execute('DELETE FROM equity WHERE created < ?', (now - self.max_age,))
+
+        disk_size = self._db.execute('SELECT TOTAL(size) FROM equity').fetchone()[0]
+        if disk_size <= self.max_bytes:
+            return
+
+        rows = self._db.execute('SELECT key, size FROM equity ORDER BY accessed DESC')
+        kept_size, evicted = 0, []
+        for key, size in rows:
+            kept_size += size
+            if kept_size > self.max_bytes:
+                evicted.append((key,))
+        self._db.executemany('DELETE FROM equity WHERE key = ?', evicted)
+
+
+def make_key(hero, villain, board=None, dead=None, **kwargs):
+    """Canonical key of an equity calculation.
+
+    The suits are renamed the same way as for :func:`poker.equity.batch_equity` queries, so suit
+    isomorphic situations get the same key. The order of board and dead cards doesn't matter.
+    Any other keyword argument is part of the key as is, a RandomState can not be (its results
+    depend on its state), use an int seed instead.
+    """
+    if any(isinstance(value, np.random.RandomState) for value in kwargs.values()):
+        raise ValueError('A RandomState can not be cached, use an int seed as random_state.')
+    key = _canonize(_eval.to_weights(hero), _eval.to_weights(villain),
+                    _eval.cards_to_array(board), _eval.cards_to_array(dead))[2]
+    extra = repr(sorted(kwargs.items())).encode('utf-8')
+    return hashlib.sha1(key + extra).hexdigest()
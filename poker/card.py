@@ -3,7 +3,7 @@ from __future__ import unicode_literals, absolute_import, division, print_functi
 
 import itertools
 from functools import total_ordering
-from ._common import PokerEnum, _ReprMixin
+from ._common import PokerEnum, _ReprMixin, _make_random_state
 
 
 __all__ = ['Suit', 'Rank', 'Card', 'FACE_RANKS', 'BROADWAY_RANKS']
@@ -61,11 +61,12 @@ class _CardMeta(type):
                               for rank, suit in itertools.product(Rank, Suit))
         return cls
 
-    def make_random(cls):
+    def make_random(cls, random_state=None):
         """Returns a random Card instance."""
+        random_state = _make_random_state(random_state)
         self = object.__new__(cls)
-        self.rank = Rank.make_random()
-        self.suit = Suit.make_random()
+        self.rank = Rank.make_random(random_state)
+        self.suit = Suit.make_random(random_state)
         return self
 
     def __iter__(cls):
@@ -54,6 +54,49 @@ def range_(range, no_border, html):
     click.echo(result)
 
 
+@poker.command('preflop-tables', short_help="Generate preflop all-in equity tables.")
+@click.argument('directory', type=click.Path(exists=True, file_okay=False, writable=True))
+@click.option('--samples', type=click.IntRange(1), help="Estimate every matchup from this many "
+              "random boards instead of enumerating every board.")
+@click.option('--processes', type=click.IntRange(1), default=1, help="Number of processes.")
+@click.option('--seed', type=int, help="Random seed for reproducible sampled tables.")
+def preflop_tables(directory, samples, processes, seed):
+    """Generate preflop equity tables for every Combo and Hand matchup and save them
+    to DIRECTORY. Enumerating every board takes many CPU hours, use --samples for a quick,
+    approximate table.
+    """
+    from .preflop import PreflopTable
+
+    PreflopTable.generate(samples, processes, seed).save(directory)
+
+
+@poker.command('push-fold', short_help="Generate a push/fold equilibrium strategy file.")
+@click.argument('tables', type=click.Path(exists=True, file_okay=False))
+@click.argument('output', type=click.File('w', encoding='utf-8'))
+@click.option('--players', type=click.IntRange(2, 9), default=9, help="Number of players.")
+@click.option('--depths', type=(int, int), default=(5, 20), show_default=True,
+              help="Smallest and biggest stack depth in big blinds, one situation each.")
+@click.option('--ante', type=float, default=0, help="Ante in big blinds.")
+@click.option('--payouts', help="Comma separated prizes for ICM, chip EV without them.")
+@click.option('--calls', is_flag=True, help="Write the calling ranges too.")
+def push_fold(tables, output, players, depths, ante, payouts, calls):
+    """Solve push/fold equilibria for every stack depth with equal stacks with the preflop
+    tables in TABLES directory (see preflop-tables) and write them to OUTPUT .strategy file.
+    """
+    from collections import OrderedDict
+    from .preflop import PreflopTable
+    from .pushfold import solve_push_fold, push_fold_strategy
+
+    table = PreflopTable.load(tables)
+    if payouts:
+        payouts = [float(payout) for payout in payouts.split(',')]
+    solutions = OrderedDict()
+    for depth in range(depths[0], depths[1] + 1):
+        solutions['%d BB' % depth] = solve_push_fold(table, [depth] * players, ante=ante,
+                                                     payouts=payouts)
+    output.write(push_fold_strategy(solutions, calls=calls))
+
+
 @poker.command('2p2player', short_help="Get profile information about a Two plus Two member.")
 @click.argument('username')
 def twoplustwo_player(username):
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Made hand and draw composition of a range on a board.
+"""
+
+from collections import namedtuple, OrderedDict as odict
+import numpy as np
+from . import _eval
+
+
+__all__ = ['range_composition', 'combo_outs', 'range_outs', 'MADE_HANDS', 'DRAWS',
+           'HAND_CATEGORIES']
+
+
+_Composition = namedtuple('_Composition', 'combos made draws')
+"""Named tuple for range compositions. ``combos`` is the number of combos not conflicting with
+the board (weighted), ``made`` and ``draws`` are OrderedDicts of category names and
+_CategoryCounts."""
+
+_CategoryCount = namedtuple('_CategoryCount', 'combos ratio')
+"""Named tuple for the (weighted) number of combos in a category and their ratio in the range."""
+
+MADE_HANDS = (
+    'straight_flush', 'quads', 'full_house', 'flush', 'straight', 'set', 'trips', 'two_pair',
+    'overpair', 'top_pair_top_kicker', 'top_pair_good_kicker', 'top_pair_weak_kicker',
+    'second_pair', 'underpair', 'weak_pair', 'ace_high', 'nothing',
+)
+"""Made hand categories from the strongest; every combo is in exactly one of them."""
+
+DRAWS = (
+    'flush_draw', 'oesd', 'gutshot', 'combo_draw', 'backdoor_flush_draw',
+    'backdoor_straight_draw', 'two_overcards',
+)
+"""Draw types; a combo can be in any number of them or in none."""
+
+HAND_CATEGORIES = (
+    'high_card', 'pair', 'two_pair', 'trips', 'straight', 'flush', 'full_house', 'quads',
+    'straight_flush',
+)
+"""Hand categories outs improve to, in the order of the hand evaluator categories."""
+
+_MADE_INDEX = {category: ind for ind, category in enumerate(MADE_HANDS)}
+
+# categories of the evaluator straight or better, indexed by evaluator category - STRAIGHT
+_STRONG_HANDS = np.array([_MADE_INDEX[category] for category in
+                          ('straight', 'flush', 'full_house', 'quads', 'straight_flush')])
+
+_RANK_BITS = 1 << np.arange(13)
+_CARD_BITS = np.int64(1) << np.arange(52, dtype=np.int64)
+# every pair of different ranks for backdoor straight draws
+_RANK_PAIRS = _eval.combinations(13, 2).astype(np.intp)
+
+
+def range_composition(range, board, dead=None):
+    """Break down the combos of a range by made hand category and draw type on a board.
+
+    Range can be anything :func:`poker.equity.equity` accepts for a player. Combos conflicting
+    with the board or dead cards are removed, ratios are of the rest.
+    Top pair kickers are top (the best possible kicker), good (second to fourth best) or weak.
+    Underpairs are pocket pairs between the top and second board rank, smaller pocket pairs
+    are weak pairs like pairing the third board rank. Hands playing the board (like trips on
+    a trips board) are categorized by the hole cards.
+    Straight draws are eight out (``'oesd'``, including double gutshots) or four out
+    (``'gutshot'``) draws using at least one hole card; backdoor draws are only counted on the
+    flop and only without the real draw.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    if not 3 <= len(board) <= 5:
+        raise ValueError('Composition needs a flop, turn or river, not %d board cards!'
+                         % len(board))
+    weights = _eval.to_weights(range)
+    live, made, draws = _categorize(board, dead)
+    weights = np.where(live, weights, 0)
+    total = weights.sum()
+    if not total:
+        raise ValueError('Every combo of the range is conflicting with the board or dead cards!')
+
+    made_combos = np.bincount(made[live], weights[live], len(MADE_HANDS))
+    made = odict((category, _CategoryCount(combos, combos / total))
+                 for category, combos in zip(MADE_HANDS, made_combos))
+    draws = odict((category, _CategoryCount(combos, combos / total))
+                  for category, combos in zip(DRAWS, draws.dot(weights)))
+    return _Composition(total, made, draws)
+
+
+def _categorize(board, dead):
+    """Made hand category index of every combo and a boolean array of every draw type in the
+    shape of (draws, 1326), both calculated only for the live combos (the first return value).
+    """
+    live = (_eval.COMBO_MASKS & (_eval.cards_to_mask(board) | _eval.cards_to_mask(dead))) == 0
+    cards = np.empty((1326, 2 + len(board)), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS, board
+    categories = _eval.evaluate(cards) >> _eval.CATEGORY_SHIFT
+
+    # hole cards: COMBO_CARDS has the bigger card first
+    high, low = (_eval.COMBO_CARDS >> 2).T.astype(np.intp)
+    board_counts = np.bincount(board >> 2, minlength=13)
+    board_ranks = np.flatnonzero(board_counts)[::-1]
+    top_rank = board_ranks[0]
+    second_rank = board_ranks[1] if len(board_ranks) > 1 else -1
+
+    pocket_pair = high == low
+    high_hits, low_hits = board_counts[high], board_counts[low]
+    paired_rank = np.where(high_hits > 0, high, low)
+    kicker = np.where(high_hits > 0, low, high)
+    # position of the kicker among the ranks which could be a top pair kicker
+    kicker_ranks = (np.arange(13) != top_rank) & (board_counts == 0)
+    kicker_position = np.cumsum(kicker_ranks[::-1])[::-1][kicker] - 1
+
+    made = np.select([
+        pocket_pair & (high_hits == 1),
+        ~pocket_pair & ((high_hits == 2) | (low_hits == 2)),
+        ~pocket_pair & (high_hits > 0) & (low_hits > 0),
+        pocket_pair & (high > top_rank),
+        ~pocket_pair & (paired_rank == top_rank) & (high_hits + low_hits > 0) &
+        (kicker_position == 0),
+        ~pocket_pair & (paired_rank == top_rank) & (high_hits + low_hits > 0) &
+        (kicker_position <= 3),
+        ~pocket_pair & (paired_rank == top_rank) & (high_hits + low_hits > 0),
+        ~pocket_pair & (paired_rank == second_rank) & (high_hits + low_hits > 0),
+        pocket_pair & (high > second_rank),
+        pocket_pair | (high_hits + low_hits > 0),
+        high == 12,
+    ], [_MADE_INDEX[category] for category in MADE_HANDS[5:-1]], _MADE_INDEX['nothing'])
+    strong = categories >= _eval.STRAIGHT
+    made = np.where(strong, _STRONG_HANDS[np.maximum(categories - _eval.STRAIGHT, 0)], made)
+
+    draws = np.zeros((len(DRAWS), 1326), dtype=bool)
+    if len(board) == 5:
+        return live, made, draws
+
+    # flush draws: four (or three for backdoors) cards of a suit with at least one hole card
+    hole_suits = _eval.COMBO_CARDS & 3
+    suit_counts = np.bincount(board & 3, minlength=4)
+    hole_counts = ((hole_suits[:, :, np.newaxis] == np.arange(4)).sum(axis=1))
+    suited = suit_counts + hole_counts
+    has_flush = categories >= _eval.FLUSH
+    flush_draw = ((suited == 4) & (hole_counts > 0)).any(axis=1) & ~has_flush
+    backdoor_flush = ((suited == 3) & (hole_counts > 0)).any(axis=1) & ~flush_draw & ~has_flush
+
+    # straight draws: ranks which make a better straight with the hole cards than without
+    board_mask = int(_RANK_BITS[board_counts > 0].sum())
+    masks = board_mask | (1 << high) | (1 << low)
+    outs = (_eval._STRAIGHT[masks[:, np.newaxis] | _RANK_BITS] >
+            _eval._STRAIGHT[board_mask | _RANK_BITS])
+    has_straight = categories >= _eval.STRAIGHT
+    out_ranks = np.where(has_straight, 0, outs.sum(axis=1))
+    pair_masks = _RANK_BITS[_RANK_PAIRS].sum(axis=1)
+    backdoor_straight = ((_eval._STRAIGHT[masks[:, np.newaxis] | pair_masks] >
+                          _eval._STRAIGHT[board_mask | pair_masks]).any(axis=1) &
+                         (out_ranks == 0) & ~has_straight)
+
+    flop = len(board) == 3
+    draws[:] = [
+        flush_draw,
+        out_ranks >= 2,
+        out_ranks == 1,
+        flush_draw & (out_ranks > 0),
+        backdoor_flush & flop,
+        backdoor_straight & flop,
+        (low > top_rank) & (made >= _MADE_INDEX['ace_high']),
+    ]
+    return live, made, draws
+
+
+def combo_outs(combo, board, dead=None):
+    """Cards improving a combo to a better hand category on the next street.
+
+    Returns an OrderedDict of the :data:`HAND_CATEGORIES` and tuples of Cards improving to
+    them. See :func:`range_outs` about what counts as an out.
+    """
+    weights = _eval.to_weights(combo)
+    if (weights > 0).sum() != 1:
+        raise ValueError('Outs are calculated for one combo, use range_outs for ranges.')
+    masks = range_outs(weights, board, dead)[np.flatnonzero(weights)[0]]
+    return odict((category, tuple(_eval.CARDS[card] for card in range(52)
+                                  if (int(mask) >> card) & 1))
+                 for category, mask in zip(HAND_CATEGORIES, masks))
+
+
+def range_outs(range, board, dead=None):
+    """Outs of every combo of a range on a flop or turn as card bitmasks.
+
+    An out is a card which is not on the board, in the combo or among the dead cards and makes
+    the combo a better hand category than it is now and better than the board with the card
+    alone, so cards counterfeiting the hole cards (pairing or completing the board) are not outs.
+    Returns an int64 array in the shape of (1326, len(HAND_CATEGORIES)): the bit of every out
+    card (card index) is set in the column of the category it improves to, zeros for combos
+    not in the range or conflicting with the board or dead cards.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    if len(board) not in (3, 4):
+        raise ValueError('Outs need a flop or turn, not %d board cards!' % len(board))
+    known_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    weights = _eval.to_weights(range)
+    indexes = np.flatnonzero((weights > 0) & ((_eval.COMBO_MASKS & known_mask) == 0))
+
+    cards = np.empty((len(indexes), 2 + len(board)), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS[indexes], board
+    current = _eval.evaluate(cards) >> _eval.CATEGORY_SHIFT
+    next_cards = np.empty((len(indexes), 52, cards.shape[1] + 1), dtype=np.int8)
+    next_cards[:, :, :-1], next_cards[:, :, -1] = cards[:, np.newaxis, :], np.arange(52)
+    categories = _eval.evaluate(next_cards) >> _eval.CATEGORY_SHIFT
+
+    unseen = ((_eval.COMBO_MASKS[indexes, np.newaxis] | known_mask) & _CARD_BITS) == 0
+    improved = (unseen & (categories > current[:, np.newaxis]) &
+                (categories > _board_categories(board)))
+    outs = np.zeros((1326, len(HAND_CATEGORIES)), dtype=np.int64)
+    for category in np.unique(categories[improved]):
+        outs[indexes, category] = np.where(improved & (categories == category), _CARD_BITS,
+                                           0).sum(axis=1)
+    return outs
+
+
+def _board_categories(board):
+    """Hand category of the board with every card added. A flop and a card can't be evaluated,
+    but only pairs, trips and quads are possible with four cards."""
+    next_cards = np.empty((52, len(board) + 1), dtype=np.int8)
+    next_cards[:, :-1], next_cards[:, -1] = board, np.arange(52)
+    if next_cards.shape[1] >= 5:
+        return _eval.evaluate(next_cards) >> _eval.CATEGORY_SHIFT
+
+    rank_counts = np.zeros((52, 13), dtype=np.intp)
+    for column in next_cards.T:
+        rank_counts[np.arange(52), column >> 2] += 1
+    return np.select([rank_counts.max(axis=1) == 4, rank_counts.max(axis=1) == 3,
+                      (rank_counts == 2).sum(axis=1) == 2, rank_counts.max(axis=1) == 2],
+                     [_eval.QUADS, _eval.TRIPS, _eval.TWO_PAIR, _eval.PAIR], _eval.HIGH_CARD)
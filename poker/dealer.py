@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    No limit Hold'em dealer for playing hands between bots, many tables at once.
+"""
+
+from abc import ABCMeta, abstractmethod
+from collections import namedtuple
+import numpy as np
+from .constants import Action, Position
+from .handhistory import _Player, _PlayerAction
+from .narrowing import STREETS
+from .sng import _deal, _next_alive
+from ._common import _make_random_state, _Z
+from . import _eval
+
+
+__all__ = ['Agent', 'CallingStation', 'RandomAgent', 'RangeAgent', 'play_hand', 'play_hands',
+           'play_match', 'FOLD', 'CHECK', 'CALL', 'RAISE', 'ACTIONS']
+
+
+FOLD, CHECK, CALL, RAISE = range(4)
+ACTIONS = (Action.FOLD, Action.CHECK, Action.CALL, Action.RAISE)
+"""The Actions of the action codes agents return, a raise is a bet without a bet before."""
+
+# positions of a full table in preflop order, smaller tables use the last ones
+_POSITIONS = (Position.UTG, Position.UTG1, Position.UTG2, Position.UTG3, Position.UTG4,
+              Position.HJ, Position.CO, Position.BTN, Position.SB, Position.BB)
+
+# number of board cards seen on every street
+_BOARD_CARDS = np.array([0, 3, 4, 5])
+
+_Decisions = namedtuple('_Decisions', 'tables seat street holes combos board pot to_call '
+                                      'min_raise max_raise can_raise stacks bets folded buttons')
+"""Named tuple for the states of the tables where a seat has to act, every field is an array
+with a row for every table.
+
+``holes`` are the two card indexes (see :data:`poker._eval.CARDS`) and ``combos`` the combo
+index (see :data:`poker._eval.COMBOS`) of the seat's hole cards, ``board`` has the card indexes
+of the board with -1 for the cards not dealt yet. ``pot`` has every chip put in the pot,
+``to_call`` is the amount to call, ``min_raise`` and ``max_raise`` are the smallest and biggest
+(all-in) total bets of a raise on the street. ``can_raise`` is False when the seat already
+acted and only an all-in smaller than a full raise came since: it can only call or fold.
+``stacks``, ``bets`` (on this street) and ``folded`` have a column for every seat.
+"""
+
+_Hand = namedtuple('_Hand', 'players positions board actions stacks')
+"""Named tuple for a hand played by :func:`play_hand`.
+
+``players`` are :class:`poker.handhistory._Player` s with the stacks before the hand and their
+Combos, ``board`` has the Cards dealt until the end of the hand, ``actions`` are (street,
+:class:`poker.handhistory._PlayerAction`) pairs with the called amount or the total bet of bets
+and raises and ``stacks`` are the stacks after the hand.
+"""
+
+_MatchResult = namedtuple('_MatchResult', 'winnings interval')
+"""Named tuple for the average winnings of a seat in big blinds per 100 hands and its 95%
+confidence interval."""
+
+
+class Agent(object):
+    """Base class of bots. Agents decide at many tables at once, every array of the decisions
+    has a row for every table."""
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def act(self, decisions):
+        """Arrays of action codes (:data:`FOLD`, :data:`CHECK`, :data:`CALL` or :data:`RAISE`)
+        and of the total bets on the street for raises.
+
+        Invalid actions are corrected: folding or calling when there is nothing to call is a
+        check, checking a bet is a fold, raises are clipped between the smallest raise and
+        all-in and raising without more chips than the call or when the seat can not raise is
+        a call.
+        """
+
+
+class CallingStation(Agent):
+    """Checks or calls everything."""
+
+    def act(self, decisions):
+        return np.full(len(decisions.tables), CALL), np.zeros(len(decisions.tables))
+
+
+class RandomAgent(Agent):
+    """Folds, calls or raises randomly with the given probabilities; raises are uniformly
+    distributed between the smallest raise and all-in."""
+
+    def __init__(self, fold=0.2, call=0.5, raise_=0.3, random_state=None):
+        self.probabilities = np.array([fold, call, raise_]) / (fold + call + raise_)
+        self.random_state = _make_random_state(random_state)
+
+    def act(self, decisions):
+        count = len(decisions.tables)
+        choices = self.random_state.random_sample(count)
+        thresholds = np.cumsum(self.probabilities)
+        actions = np.array([FOLD, CALL, RAISE])[np.searchsorted(thresholds[:-1], choices)]
+        amounts = decisions.min_raise + self.random_state.random_sample(count) * (
+            decisions.max_raise - decisions.min_raise)
+        return actions, np.round(amounts)
+
+
+class RangeAgent(Agent):
+    """Pushes all-in with the combos of the range (calls when it can not raise any more) and
+    folds or checks with everything else."""
+
+    def __init__(self, range):
+        self.combos = _eval.to_weights(range) > 0
+
+    def act(self, decisions):
+        return np.where(self.combos[decisions.combos], RAISE, FOLD), decisions.max_raise
+
+
+def play_hand(agents, stacks, sb, bb, ante=0, button=0, names=None, random_state=None):
+    """Play one hand between the agents (one for every seat) and return what happened with
+    the objects of the library. Seats with an empty stack sit out. Names are 'Seat 1',
+    'Seat 2', ... by default.
+    """
+    stacks = np.asarray(stacks, dtype=np.int64)
+    if names is None:
+        names = ['Seat %d' % (seat + 1) for seat in range(len(stacks))]
+    tables = _Tables(agents, stacks[np.newaxis], np.array([button]), sb, bb, ante,
+                     _make_random_state(random_state), log=True)
+    final = tables.play()[0]
+
+    players = [_Player(names[seat], stacks[seat], seat + 1,
+                       _eval.COMBOS[_eval._COMBO_INDEX[tuple(tables.holes[0, seat])]]
+                       if stacks[seat] > 0 else None) for seat in range(len(stacks))]
+    # seats from the button in preflop order, heads up the button is the small blind
+    seated = sorted(np.flatnonzero(stacks > 0), key=lambda seat: (seat - button) % len(stacks))
+    if len(seated) > 2:
+        seated = seated[3:] + seated[:3]
+    positions = [None] * len(stacks)
+    for position, seat in zip(_POSITIONS[-len(seated):], seated):
+        positions[seat] = position
+    board = tuple(_eval.CARDS[card] for card in tables.board[0, :_BOARD_CARDS[tables.shown[0]]])
+    actions = [(STREETS[street], _PlayerAction(names[seat], action, amount))
+               for street, seat, action, amount in tables.history]
+    return _Hand(tuple(players), tuple(positions), board, tuple(actions), tuple(final))
+
+
+def play_hands(agents, stacks, sb, bb, ante=0, buttons=None, random_state=None):
+    """Play a hand at every table at once, stacks are in the shape of (tables, seats). The
+    buttons are at the first seat of every table by default. Returns the stacks after the
+    hands."""
+    stacks = np.asarray(stacks, dtype=np.int64)
+    if buttons is None:
+        buttons = np.zeros(len(stacks), dtype=np.int64)
+    tables = _Tables(agents, stacks, np.asarray(buttons), sb, bb, ante,
+                     _make_random_state(random_state))
+    return tables.play()
+
+
+def play_match(agents, hands, stack, sb, bb, ante=0, tables=1000, random_state=None):
+    """Play hands between the agents with the button moving every hand and everybody
+    starting every hand with the same stack at as many tables at once. Returns the results of
+    every seat.
+    """
+    random_state = _make_random_state(random_state)
+    players_num = len(agents)
+    winnings = []
+    for start in range(0, hands, tables):
+        count = min(tables, hands - start)
+        stacks = np.full((count, players_num), stack, dtype=np.int64)
+        buttons = (start + np.arange(count)) % players_num
+        final = play_hands(agents, stacks, sb, bb, ante, buttons, random_state)
+        winnings.append((final - stacks) / bb * 100)
+    winnings = np.concatenate(winnings)
+    means = winnings.mean(axis=0)
+    errors = _Z * winnings.std(axis=0, ddof=1) / np.sqrt(len(winnings))
+    return [_MatchResult(mean, (mean - error, mean + error))
+            for mean, error in zip(means, errors)]
+
+
+class _Tables(object):
+    """Array state of a hand at many tables: every array has a row for every table and a
+    column for every seat."""
+
+    def __init__(self, agents, stacks, buttons, sb, bb, ante, random_state, log=False):
+        count, players_num = stacks.shape
+        if len(agents) != players_num:
+            raise ValueError('There should be an agent for every seat!')
+        seated = stacks > 0
+        if (seated.sum(axis=1) < 2).any():
+            raise ValueError('There should be at least 2 players at every table!')
+        self.agents, self.bb = agents, bb
+        self.rows = np.arange(count)
+        self.buttons = buttons
+        self.stacks = stacks.copy()
+        self.folded = ~seated
+        self.bets = np.zeros((count, players_num), dtype=np.int64)
+        self.total = np.zeros((count, players_num), dtype=np.int64)
+
+        cards = _deal(count, players_num * 2 + 5, random_state)
+        self.holes = cards[:, :players_num * 2].reshape(count, players_num, 2)
+        self.board = cards[:, players_num * 2:]
+        self.street = np.zeros(count, dtype=np.int64)
+        # the last street with its board cards dealt
+        self.shown = np.zeros(count, dtype=np.int64)
+        self.done = np.zeros(count, dtype=bool)
+        self.history = [] if log else None
+
+        # heads up the button is the small blind
+        heads_up = seated.sum(axis=1) == 2
+        small_blinds = np.where(heads_up, buttons, _next_alive(buttons, seated))
+        big_blinds = _next_alive(small_blinds, seated)
+        self._put(np.where(seated, np.minimum(self.stacks, ante), 0), bet=False)
+        blinds = np.zeros((count, players_num), dtype=np.int64)
+        blinds[self.rows, small_blinds] = np.minimum(self.stacks[self.rows, small_blinds], sb)
+        blinds[self.rows, big_blinds] = np.minimum(self.stacks[self.rows, big_blinds], bb)
+        self._put(blinds)
+        # a big blind all-in for less is the bet to call, the smallest raise is still a big blind
+        self.current = self.bets.max(axis=1)
+        self.min_raise = np.full(count, bb, dtype=np.int64)
+        # the bet of the last full raise, smaller all-ins over it do not reopen the action
+        self.reopened = self.current.copy()
+        # acted since the last full raise
+        self.acted = np.zeros((count, players_num), dtype=bool)
+        # the next player to act is the first one needing to act after the last actor
+        self.last = big_blinds
+        self.needs = seated & (self.stacks > 0)
+        self._skip_lone_players()
+
+    def _put(self, chips, bet=True):
+        self.stacks -= chips
+        self.total += chips
+        if bet:
+            self.bets += chips
+
+    def _skip_lone_players(self):
+        """Nobody acts when only one player could, unless they have to call."""
+        can_act = ~self.folded & (self.stacks > 0)
+        lone = can_act.sum(axis=1) <= 1
+        self.needs[lone] &= (self.bets < self.current[:, np.newaxis])[lone]
+
+    def play(self):
+        while not self.done.all():
+            live_num = (~self.folded).sum(axis=1)
+            self._finish(np.flatnonzero(~self.done & (live_num == 1)))
+
+            pending = self.needs & ~self.folded & (self.stacks > 0)
+            finished_round = ~self.done & ~pending.any(axis=1)
+            self._finish(np.flatnonzero(finished_round & (self.street == 3)), showdown=True)
+            self._next_street(np.flatnonzero(finished_round & (self.street < 3)))
+
+            pending = self.needs & ~self.folded & (self.stacks > 0)
+            acting = np.flatnonzero(~self.done & pending.any(axis=1))
+            seats = _next_alive(self.last[acting], pending[acting])
+            for seat in np.unique(seats):
+                self._act(acting[seats == seat], seat)
+        return self.stacks
+
+    def _next_street(self, tables):
+        self.street[tables] += 1
+        self.shown[tables] = self.street[tables]
+        self.bets[tables] = 0
+        self.current[tables] = 0
+        self.reopened[tables] = 0
+        self.min_raise[tables] = self.bb
+        self.acted[tables] = False
+        self.last[tables] = self.buttons[tables]
+        self.needs[tables] = ~self.folded[tables] & (self.stacks[tables] > 0)
+        self._skip_lone_players()
+
+    def _decisions(self, tables, seat):
+        stacks, bets = self.stacks[tables], self.bets[tables]
+        current = self.current[tables]
+        max_raise = bets[:, seat] + stacks[:, seat]
+        board = np.where(np.arange(5) < _BOARD_CARDS[self.street[tables], np.newaxis],
+                         self.board[tables], -1)
+        holes = self.holes[tables, seat]
+        return _Decisions(tables, seat, self.street[tables], holes,
+                          _eval._COMBO_INDEX[holes[:, 0], holes[:, 1]], board,
+                          self.total[tables].sum(axis=1), current - bets[:, seat],
+                          np.minimum(current + self.min_raise[tables], max_raise), max_raise,
+                          ~self.acted[tables, seat], stacks, bets, self.folded[tables],
+                          self.buttons[tables])
+
+    def _act(self, tables, seat):
+        decisions = self._decisions(tables, seat)
+        actions, amounts = self.agents[seat].act(decisions)
+        actions = np.asarray(actions)
+        to_call, stacks = decisions.to_call, decisions.stacks[:, seat]
+
+        actions = np.where((actions == RAISE) & ((stacks <= to_call) | ~decisions.can_raise),
+                           CALL, actions)
+        actions = np.where((actions == FOLD) & (to_call <= 0), CHECK, actions)
+        actions = np.where((actions == CALL) & (to_call <= 0), CHECK, actions)
+        actions = np.where((actions == CHECK) & (to_call > 0), FOLD, actions)
+        targets = np.clip(np.asarray(amounts, dtype=np.int64), decisions.min_raise,
+                          decisions.max_raise)
+        bets = decisions.bets[:, seat]
+        chips = np.where(actions == CALL, np.minimum(to_call, stacks),
+                         np.where(actions == RAISE, targets - bets, 0))
+        if self.history is not None:
+            self._log(tables, seat, actions, np.where(actions == RAISE, targets, chips))
+        self.stacks[tables, seat] -= chips
+        self.bets[tables, seat] += chips
+        self.total[tables, seat] += chips
+        self.folded[tables, seat] |= actions == FOLD
+        self.needs[tables, seat] = False
+        self.acted[tables, seat] = True
+        self.last[tables] = seat
+
+        raised = actions == RAISE
+        raises, targets = tables[raised], targets[raised]
+        # only a full raise (or smaller all-ins adding up to one) reopens the action, after an
+        # all-in smaller than that the players who acted already can only call or fold
+        full = targets - self.reopened[raises] >= self.min_raise[raises]
+        # an all-in smaller than a raise does not change the size of the next raise
+        self.min_raise[raises] = np.maximum(self.min_raise[raises],
+                                            targets - self.current[raises])
+        self.current[raises] = targets
+        others = ~self.folded[raises] & (self.stacks[raises] > 0)
+        others[:, seat] = False
+        self.needs[raises] = others
+        reopens = raises[full]
+        self.reopened[reopens] = targets[full]
+        self.acted[reopens] = False
+        self.acted[reopens, seat] = True
+
+    def _log(self, tables, seat, actions, amounts):
+        """Record the street, seat, Action and amount of the actions before they are done."""
+        for table, action, amount in zip(tables, actions, amounts):
+            action = ACTIONS[action]
+            if action == Action.RAISE and self.current[table] == 0:
+                action = Action.BET
+            amount = amount if action in (Action.CALL, Action.RAISE, Action.BET) else None
+            self.history.append((self.street[table], seat, action, amount))
+
+    def _finish(self, tables, showdown=False):
+        if not len(tables):
+            return
+        self.done[tables] = True
+        total = self.total[tables]
+        live = ~self.folded[tables]
+        if not showdown:
+            winners = live.argmax(axis=1)
+            self.stacks[tables, winners] += total.sum(axis=1)
+            return
+
+        self.shown[tables] = 3
+        players_num = total.shape[1]
+        cards = np.empty((len(tables), players_num, 7), dtype=np.int8)
+        cards[:, :, :2] = self.holes[tables]
+        cards[:, :, 2:] = self.board[tables, np.newaxis]
+        values = _eval.evaluate(cards.reshape(-1, 7)).reshape(len(tables), players_num)
+        # side pots between every distinct contribution of the live players
+        levels = np.sort(np.where(live, total, 0), axis=1)
+        lower = np.zeros(len(tables), dtype=np.int64)
+        winnings = np.zeros_like(total)
+        rows = np.arange(len(tables))
+        for upper in levels.T:
+            pots = (np.clip(total, lower[:, np.newaxis], upper[:, np.newaxis]) -
+                    lower[:, np.newaxis]).sum(axis=1)
+            eligible = live & (total >= upper[:, np.newaxis])
+            eligible_values = np.where(eligible, values, -1)
+            winners = eligible & (eligible_values == eligible_values.max(axis=1)[:, np.newaxis])
+            winners_num = winners.sum(axis=1)
+            winnings += winners * (pots // winners_num)[:, np.newaxis]
+            # odd chips go to the first winner after the button
+            winnings[rows, _next_alive(self.buttons[tables], winners)] += pots % winners_num
+            lower = upper
+        self.stacks[tables] += winnings
@@ -0,0 +1,847 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Heads-up Hold'em all-in equity calculation.
+"""
+
+import hashlib
+from collections import namedtuple
+import numpy as np
+from .card import Rank
+from ._common import _make_random_state
+from . import _eval
+
+
+__all__ = ['equity', 'batch_equity', 'sample_equity', 'combo_equities', 'hand_equities',
+           'hand_grid', 'multiway_equity', 'EquitySession']
+
+
+_EquityResult = namedtuple('_EquityResult', 'equity win tie')
+"""Named tuple for equity results. All values are between 0 and 1, ``equity`` is the pot share
+of the first player (win + tie / 2)."""
+
+_SampledEquityResult = namedtuple('_SampledEquityResult',
+                                  'equity win tie stderr effective_samples')
+"""Named tuple for sampled equity results, the same as _EquityResult plus the standard error of
+the equity and the effective sample size: how many plain samples would give the same error."""
+
+SAMPLING_METHODS = ('plain', 'stratified', 'antithetic', 'importance')
+
+# maximum number of elements of temporary arrays when comparing hands in one go
+_CHUNK_SIZE = 1 << 21
+# compare every hero combo with every villain combo below this many pairs, sort above
+_DENSE_LIMIT = 4096
+
+# indexes of the 51 combos containing each card
+_CARD_COMBOS = np.array([np.flatnonzero((_eval.COMBO_MASKS >> card) & 1) for card in range(52)])
+
+# combo indexes of card pairs, pairs of the same card point to index 1326
+_PADDED_COMBO_INDEX = np.where(_eval._COMBO_INDEX >= 0, _eval._COMBO_INDEX, 1326)
+
+
+def equity(hero, villain, board=None, samples=None, random_state=None, dead=None):
+    """Calculate the all-in equity of hero against villain.
+
+    Hero and villain can be Combos, Hands, Ranges or range strings. Combos are weighted equally
+    and card removal is applied between the two holdings, the board and the dead cards
+    (e.g. folded cards shown down or burn cards), which are out of the deck too.
+    If samples is None, every possible runout is enumerated (exact result), otherwise
+    the given number of random runouts are evaluated (Monte Carlo). Random runouts are drawn from
+    random_state, which can be an int seed, a numpy RandomState or None for the global one.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    hero_weights = _eval.to_weights(hero)
+    villain_weights = _eval.to_weights(villain)
+    win, tie, total = _showdown(hero_weights, villain_weights, board, samples, random_state,
+                                dead)
+    return _make_result(win.sum(), tie.sum(), total.sum())
+
+
+def batch_equity(queries, samples=None, random_state=None):
+    """Calculate the equity of many (hero, villain, board) or (hero, villain, board, dead)
+    queries in one go.
+
+    Queries which are the same after renaming suits are calculated only once, and queries
+    on the same board share the runouts and the hand values of every combo on them.
+    With samples, the queries on the same board are estimated from the same random runouts.
+    Returns an _EquityResult for every query in order, None when there is no possible matchup.
+    """
+    random_state = _make_random_state(random_state)
+    weights_cache = {}
+
+    def get_weights(holding):
+        try:
+            return weights_cache[holding]
+        except KeyError:
+            weights = weights_cache[holding] = _eval.to_weights(holding)
+            return weights
+        except TypeError:
+            return _eval.to_weights(holding)
+
+    boards, keys = {}, []
+    for query in queries:
+        hero, villain, board = query[:3]
+        dead = query[3] if len(query) > 3 else None
+        board, dead, key, weights = _canonize(get_weights(hero), get_weights(villain),
+                                              _eval.cards_to_array(board),
+                                              _eval.cards_to_array(dead))
+        boards.setdefault((board, dead), {}).setdefault(key, weights)
+        keys.append(key)
+
+    # single combo against single combo queries are evaluated together for every board,
+    # except enumerating preflop, where sharing the runouts of the same board is better
+    results, combo_pairs = {}, {}
+    for board, dead in sorted(boards):
+        board_queries = {}
+        for key, (hero_weights, villain_weights) in boards[board, dead].items():
+            hero_indexes = np.flatnonzero(hero_weights)
+            villain_indexes = np.flatnonzero(villain_weights)
+            if len(hero_indexes) == len(villain_indexes) == 1 and (samples or len(board) >= 3):
+                combo_pairs.setdefault((len(board), len(dead)), []).append(
+                    (key, board, dead, hero_indexes[0], villain_indexes[0]))
+            else:
+                board_queries[key] = hero_weights, villain_weights
+        board_results = _board_equities(np.array(board, dtype=np.int8),
+                                        np.array(dead, dtype=np.int8), board_queries.values(),
+                                        samples, random_state)
+        results.update(zip(board_queries.keys(), board_results))
+
+    for (board_length, dead_length), pairs in sorted(combo_pairs.items()):
+        pair_keys, pair_boards, pair_deads, heroes, villains = zip(*pairs)
+        pair_boards = np.array(pair_boards, dtype=np.int8).reshape(len(pairs), board_length)
+        pair_deads = np.array(pair_deads, dtype=np.int8).reshape(len(pairs), dead_length)
+        pair_results = _combo_pair_equities(pair_boards, pair_deads, np.array(heroes),
+                                            np.array(villains), samples, random_state)
+        results.update(zip(pair_keys, pair_results))
+
+    return [results[key] for key in keys]
+
+
+def sample_equity(hero, villain, board=None, samples=10000, method='stratified',
+                  random_state=None, dead=None):
+    """Monte Carlo equity of hero against villain from samples number of single deals: a hero
+    combo, a villain combo and a runout, drawn with card removal. For big ranges this needs
+    far fewer hand evaluations for the same error than :func:`equity` with samples, which
+    evaluates every combo on every sampled runout.
+
+    Methods (see ``SAMPLING_METHODS``):
+
+    plain
+        every deal is independent.
+    stratified
+        hero combos are drawn with systematic sampling and villain combos with latin hypercube
+        sampling, so every part of the ranges gets its share of samples. Helps the most when
+        equities of the matchups are very different.
+    antithetic
+        every runout is paired with the same runout with two suits swapped (the suits of hero's
+        and villain's first card), so flushes of one player become flushes of the other.
+        Only pays off when flushes decide a big part of the matchups.
+    importance
+        after a pilot run (a fifth of the samples), hero Hands with more uncertain outcome are
+        sampled more often and weighted back.
+
+    Returns a _SampledEquityResult. ``effective_samples`` compares the methods: it is bigger
+    than samples when the method has a smaller error than plain sampling would have.
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError('Unknown sampling method: %r, should be one of %r' %
+                         (method, SAMPLING_METHODS))
+    random_state = _make_random_state(random_state)
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    dead_mask = _eval.cards_to_mask(dead)
+    live = (_eval.COMBO_MASKS & (_eval.cards_to_mask(board) | dead_mask)) == 0
+    hero_weights = np.where(live, _eval.to_weights(hero), 0)
+    villain_weights = np.where(live, _eval.to_weights(villain), 0)
+
+    hero_indexes = np.flatnonzero(hero_weights)
+    hero_cards = _eval.COMBO_CARDS[hero_indexes].astype(np.intp)
+    matchup_weights = np.zeros(1326)
+    matchup_weights[hero_indexes] = (hero_weights[hero_indexes] *
+                                     _get_possible_weights(villain_weights, hero_cards))
+    if not matchup_weights.any():
+        raise ValueError('There are no possible matchups between the two holdings!')
+    matchup_weights /= matchup_weights.sum()
+
+    if method == 'importance':
+        pilot_samples = max(samples // 5, 1)
+        pilot_heroes, pilot_outcomes = _sample_outcomes(matchup_weights, villain_weights, board,
+                                                        dead_mask, pilot_samples, random_state)
+        proposal = _get_importance_proposal(matchup_weights, pilot_heroes, pilot_outcomes)
+        heroes, outcomes = _sample_outcomes(proposal, villain_weights, board, dead_mask,
+                                            samples - pilot_samples, random_state)
+        sample_weights = np.append(np.ones(pilot_samples),
+                                   matchup_weights[heroes] / proposal[heroes])
+        outcomes = np.append(pilot_outcomes, outcomes, axis=0)
+    else:
+        heroes, outcomes = _sample_outcomes(matchup_weights, villain_weights, board, dead_mask,
+                                            samples, random_state, method)
+        sample_weights = np.ones(len(heroes))
+
+    win, tie = (np.average(outcome, weights=sample_weights) for outcome in outcomes.T)
+    equities = outcomes[:, 0] + outcomes[:, 1] / 2
+    mean = np.average(equities, weights=sample_weights)
+    variance = np.average((equities - mean) ** 2, weights=sample_weights)
+
+    if method == 'stratified':
+        # systematic samples are in order, neighbours estimate the variance within strata
+        squared_error = ((equities[1:] - equities[:-1]) ** 2).sum() / (2 * (len(equities) - 1))
+        squared_error /= len(equities)
+    elif method == 'antithetic':
+        pairs = equities.reshape(2, -1).mean(axis=0)
+        squared_error = pairs.var(ddof=1) / len(pairs)
+    else:
+        squared_error = (((sample_weights * (equities - mean)) ** 2).sum() /
+                         sample_weights.sum() ** 2)
+    stderr = np.sqrt(squared_error)
+
+    effective_samples = variance / squared_error if squared_error > 0 else np.inf
+    return _SampledEquityResult(mean, win, tie, stderr, effective_samples)
+
+
+def combo_equities(hero, villain, board=None, samples=None, random_state=None, dead=None):
+    """Equity of every hero combo against villain, calculated in one pass over the runouts.
+
+    Returns a 1326 long array in the order of Combo indexes, combos not in hero's range or
+    without any possible matchup are NaN.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    win, tie, total = _showdown(_eval.to_weights(hero), _eval.to_weights(villain), board, samples,
+                                random_state, dead)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (win + tie / 2) / total
+
+
+def hand_equities(hero, villain, board=None, samples=None, random_state=None, dead=None):
+    """Equity of every Hand in hero's range against villain as a dict of Hands and equities.
+    Combos of the same Hand are aggregated by their number of possible matchups.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    win, tie, total = _showdown(_eval.to_weights(hero), _eval.to_weights(villain), board, samples,
+                                random_state, dead)
+    hand_wins = np.bincount(_eval.COMBO_HANDS, weights=win + tie / 2, minlength=169)
+    hand_totals = np.bincount(_eval.COMBO_HANDS, weights=total, minlength=169)
+    return {_eval.HANDS[ind]: hand_wins[ind] / hand_totals[ind]
+            for ind in np.flatnonzero(hand_totals)}
+
+
+def hand_grid(hand_values):
+    """Make a 13x13 array from a dict of Hands and values in the same layout as
+    :meth:`poker.hand.Range.to_html`: from aces to deuces, suited hands above the diagonal,
+    offsuit hands below. Missing hands are NaN.
+    """
+    grid = np.full((13, 13), np.nan)
+    for hand, value in hand_values.items():
+        first, second = 12 - list(Rank).index(hand.first), 12 - list(Rank).index(hand.second)
+        row, col = (first, second) if hand.is_suited or hand.is_pair else (second, first)
+        grid[row, col] = value
+    return grid
+
+
+def multiway_equity(players, board=None, samples=None, random_state=None, dead=None):
+    """Calculate the all-in equity of 2-10 players. Pots are split equally between the players
+    tying for the best hand.
+
+    Players can hold anything :func:`equity` accepts. If every player has only one combo and
+    samples is None, every runout is enumerated, otherwise samples number of random deals are
+    evaluated: combos are drawn by their weight with card removal from the previous players
+    (random_state is the same as for :func:`equity`).
+    Returns an _EquityResult for every player, ``win`` is the ratio of not split pots won.
+    """
+    if not 2 <= len(players) <= 10:
+        raise ValueError('Only 2-10 players are supported, not %d' % len(players))
+
+    board = _eval.cards_to_array(board)
+    # dead cards are out of the deck just like the board
+    board_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(_eval.cards_to_array(dead))
+    live = (_eval.COMBO_MASKS & board_mask) == 0
+    weights = [np.where(live, _eval.to_weights(player), 0) for player in players]
+    if any(not player_weights.any() for player_weights in weights):
+        raise ValueError('There are no possible matchups between the holdings!')
+
+    if samples is None:
+        deals = np.array([np.flatnonzero(player_weights) for player_weights in weights]).T
+        if deals.shape[0] != 1:
+            raise ValueError('Exact multiway equity needs one combo for every player, '
+                             'use samples for ranges.')
+        deal_masks = np.bitwise_or.reduce(_eval.COMBO_MASKS[deals], axis=1)
+        if bin(int(deal_masks[0])).count('1') != 2 * len(players):
+            raise ValueError('There are no possible matchups between the holdings!')
+        deck = np.array([card for card in range(52)
+                         if not ((int(deal_masks[0]) | board_mask) >> card) & 1], dtype=np.int8)
+        runouts = deck[_eval.combinations(len(deck), 5 - len(board))]
+        deals = np.broadcast_to(deals, (len(runouts), len(players)))
+        importance = np.ones(len(runouts))
+    else:
+        random_state = _make_random_state(random_state)
+        deals, deal_masks, importance = _sample_deals(weights, samples, random_state)
+        runouts = _sample_runouts(board, deal_masks | board_mask, random_state)
+
+    wins, ties, shares = np.zeros(len(players)), np.zeros(len(players)), np.zeros(len(players))
+    chunk_size = max(1, _CHUNK_SIZE // (len(players) * 7))
+    for start in range(0, len(runouts), chunk_size):
+        chunk_deals = deals[start:start + chunk_size]
+        chunk_runouts = runouts[start:start + chunk_size]
+        chunk_importance = importance[start:start + chunk_size, np.newaxis]
+        cards = np.empty(chunk_deals.shape + (7,), dtype=np.int8)
+        cards[:, :, :2] = _eval.COMBO_CARDS[chunk_deals]
+        cards[:, :, 2:2 + len(board)] = board
+        cards[:, :, 2 + len(board):] = chunk_runouts[:, np.newaxis, :]
+
+        values = _eval.evaluate(cards)
+        winners = values == values.max(axis=1)[:, np.newaxis]
+        winners_num = winners.sum(axis=1)[:, np.newaxis]
+        wins += ((winners & (winners_num == 1)) * chunk_importance).sum(axis=0)
+        ties += ((winners & (winners_num > 1)) * chunk_importance).sum(axis=0)
+        shares += (winners / winners_num * chunk_importance).sum(axis=0)
+
+    total = importance.sum()
+    return [_EquityResult(share / total, win / total, tie / total)
+            for share, win, tie in zip(shares, wins, ties)]
+
+
+def _sample_deals(weights, samples, random_state):
+    """Draw samples number of non-conflicting deals with card removal.
+
+    Players are dealt one after the other, the combo of every player is drawn by its weight from
+    the combos not conflicting with the cards dealt before (drawing again only the conflicting
+    ones). Deals where a player has no possible combo left are rejected right away.
+    To keep the result unbiased, every deal gets an importance weight: the product of the ratio
+    of possible combo weights of every player when it was dealt.
+
+    Returns the combo indexes of the deals in the shape of (deals, players), the card masks
+    and the importance weights of the deals.
+    """
+    order = np.argsort([np.count_nonzero(player_weights) for player_weights in weights])
+    deals = np.zeros((samples, len(weights)), dtype=np.intp)
+    masks = np.zeros(samples, dtype=np.int64)
+    importance = np.ones(samples)
+
+    for dealt_num, player in enumerate(order):
+        player_weights = weights[player]
+        dealt_cards = _eval.COMBO_CARDS[deals[:, order[:dealt_num]]].reshape(samples, -1)
+        possible_weights = _get_possible_weights(player_weights, dealt_cards.astype(np.intp))
+        importance *= possible_weights / player_weights.sum()
+
+        rows = np.flatnonzero(possible_weights > 0)
+        deals[rows, player] = _draw_combos(player_weights, masks[rows], random_state)
+
+        dealt = importance > 0
+        masks[dealt] |= _eval.COMBO_MASKS[deals[dealt, player]]
+
+    dealt = importance > 0
+    if not dealt.any():
+        raise ValueError('Could not deal non-conflicting combos for the players!')
+    return deals[dealt], masks[dealt], importance[dealt]
+
+
+def _sample_outcomes(hero_probabilities, villain_weights, board, dead_mask, samples,
+                     random_state, method='plain'):
+    """Draw samples number of deals; hero combos by hero_probabilities, villain combos by
+    villain_weights not conflicting with the hero combo and a random runout without
+    the dead cards.
+
+    Returns the hero combo indexes and the (win, tie) outcomes in the shape of (samples, 2).
+    With the antithetic method the second half are the swapped suit pairs of the first half.
+    """
+    deals_num = samples // 2 if method == 'antithetic' else samples
+    if method == 'stratified':
+        hero_targets = (np.arange(deals_num) + random_state.random_sample()) / deals_num
+        villain_targets = ((random_state.permutation(deals_num) +
+                            random_state.random_sample(deals_num)) / deals_num)
+    else:
+        hero_targets = random_state.random_sample(deals_num)
+        villain_targets = random_state.random_sample(deals_num)
+
+    heroes = _draw_combos(hero_probabilities, np.zeros(deals_num, dtype=np.int64), random_state,
+                          hero_targets)
+    villains = _draw_combos(villain_weights, _eval.COMBO_MASKS[heroes], random_state,
+                            villain_targets)
+    masks = _eval.COMBO_MASKS[heroes] | _eval.COMBO_MASKS[villains] | dead_mask
+    runouts = _sample_runouts(board, masks, random_state)
+
+    if method == 'antithetic':
+        first_suits = _eval.COMBO_CARDS[heroes, 0] & 3
+        second_suits = _eval.COMBO_CARDS[villains, 0] & 3
+        second_suits = np.where(first_suits == second_suits, (first_suits + 1) & 3, second_suits)
+        suits = runouts & 3
+        swapped_suits = np.where(suits == first_suits[:, np.newaxis], second_suits[:, np.newaxis],
+                                 np.where(suits == second_suits[:, np.newaxis],
+                                          first_suits[:, np.newaxis], suits))
+        swapped = ((runouts & ~3) | swapped_suits).astype(np.int8)
+        # swapping is only possible when the swapped cards are in the deck too,
+        # this way it is a one-to-one mapping of runouts which keeps the estimate unbiased
+        swapped_masks = np.bitwise_or.reduce(np.int64(1) << swapped.astype(np.int64), axis=1)
+        blocked = (swapped_masks & (masks | _eval.cards_to_mask(board))) != 0
+        swapped[blocked] = runouts[blocked]
+        heroes, villains = np.tile(heroes, 2), np.tile(villains, 2)
+        runouts = np.concatenate([runouts, swapped])
+
+    outcomes = np.empty((len(heroes), 2))
+    chunk_size = max(1, _CHUNK_SIZE // 14)
+    for start in range(0, len(heroes), chunk_size):
+        end = start + chunk_size
+        cards = np.empty((len(heroes[start:end]), 2, 7), dtype=np.int8)
+        cards[:, 0, :2] = _eval.COMBO_CARDS[heroes[start:end]]
+        cards[:, 1, :2] = _eval.COMBO_CARDS[villains[start:end]]
+        cards[:, :, 2:2 + len(board)] = board
+        cards[:, :, 2 + len(board):] = runouts[start:end, np.newaxis, :]
+        values = _eval.evaluate(cards)
+        outcomes[start:end, 0] = values[:, 0] > values[:, 1]
+        outcomes[start:end, 1] = values[:, 0] == values[:, 1]
+    return heroes, outcomes
+
+
+def _draw_combos(weights, masks, random_state, targets=None, max_tries=100, combo_masks=None):
+    """Draw a combo by weight for every card mask which doesn't conflict with it.
+
+    The first draw is made with targets (uniform random numbers between 0 and 1) if given,
+    conflicting combos are drawn again. Masks should leave some possible combo.
+    Combos are the 1326 Hold'em combos, unless their card masks are given in combo_masks.
+    """
+    combo_masks = _eval.COMBO_MASKS if combo_masks is None else combo_masks
+    cumulative = np.cumsum(weights)
+    if targets is None:
+        targets = random_state.random_sample(len(masks))
+    combos = np.searchsorted(cumulative, targets * cumulative[-1], side='right')
+
+    rows = np.flatnonzero(masks & combo_masks[combos])
+    for _ in range(max_tries):
+        if not len(rows):
+            break
+        targets = random_state.random_sample(len(rows)) * cumulative[-1]
+        combos[rows] = np.searchsorted(cumulative, targets, side='right')
+        rows = rows[(masks[rows] & combo_masks[combos[rows]]) != 0]
+    else:
+        # very unlikely combos left, draw them from their own possible combos
+        for row in rows:
+            row_cumulative = np.cumsum(np.where(combo_masks & masks[row], 0, weights))
+            target = random_state.random_sample() * row_cumulative[-1]
+            combos[row] = np.searchsorted(row_cumulative, target, side='right')
+    return combos
+
+
+def _get_importance_proposal(matchup_weights, heroes, outcomes):
+    """Probabilities of hero combos for importance sampling: the matchup weight multiplied by
+    the standard deviation of the outcome of the combo's Hand in the pilot samples, so more
+    uncertain Hands are sampled more often (Neyman allocation).
+    """
+    equities = outcomes[:, 0] + outcomes[:, 1] / 2
+    hands = _eval.COMBO_HANDS[heroes]
+    counts = np.bincount(hands, minlength=169)
+    sums = np.bincount(hands, weights=equities, minlength=169)
+    squares = np.bincount(hands, weights=equities ** 2, minlength=169)
+
+    # Hands with only a few samples are pulled towards the overall variance
+    overall = equities.var()
+    variances = (squares - sums ** 2 / np.maximum(counts, 1) + 2 * overall) / (counts + 2)
+    deviations = np.sqrt(np.maximum(variances, 0))
+    deviations = np.maximum(deviations, 0.1 * np.sqrt(overall) + 1e-3)
+
+    proposal = matchup_weights * deviations[_eval.COMBO_HANDS]
+    return proposal / proposal.sum()
+
+
+def _get_possible_weights(weights, cards):
+    """Sum of weights of combos not containing any of the cards in every row.
+
+    Calculated with inclusion-exclusion: total weight minus weights of combos containing any
+    of the cards, plus weights of combos made of two of the cards (they were subtracted twice).
+    """
+    card_weights = weights[_CARD_COMBOS].sum(axis=1)
+    possible = weights.sum() - card_weights[cards].sum(axis=1)
+    first, second = np.triu_indices(cards.shape[1], 1)
+    pair_combos = _PADDED_COMBO_INDEX[cards[:, first], cards[:, second]]
+    possible += np.append(weights, 0)[pair_combos].sum(axis=1)
+    return np.maximum(possible, 0)
+
+
+def _sample_runouts(board, deal_masks, random_state):
+    """One random runout completing the board for every deal, not containing dealt cards."""
+    priorities = random_state.random_sample((len(deal_masks), 52))
+    used = (deal_masks[:, np.newaxis] >> np.arange(52, dtype=np.int64)) & 1
+    priorities[used.astype(bool)] = np.inf
+    priorities[:, board] = np.inf
+    missing = 5 - len(board)
+    return np.argsort(priorities, axis=1)[:, :missing].astype(np.int8)
+
+
+class EquitySession(object):
+    """Equity of hero against villain street by street as the board cards are added.
+
+    The first calculation enumerates every runout and keeps the result of each; equity after
+    adding more board cards is just the sum of results of the runouts containing those cards,
+    so nothing gets evaluated again.
+    """
+
+    def __init__(self, hero, villain, dead=None):
+        self._hero_weights = _eval.to_weights(hero)
+        self._villain_weights = _eval.to_weights(villain)
+        self._dead = _eval.cards_to_array(dead)
+        self.board = ()
+        self._runout_masks = None
+        self._results = None
+
+    @property
+    def equity(self):
+        """Equity on the current board."""
+        if self._results is None:
+            self._enumerate()
+        return _make_result(*(result.sum() for result in self._results))
+
+    def add(self, *cards):
+        """Add board cards (the flop, turn or river) and return the equity on the new board."""
+        cards = _eval.cards_to_array(cards)
+        if len(self.board) + len(cards) > 5:
+            raise ValueError('The board can not be longer than 5 cards!')
+        elif set(cards) & (set(self.board) | set(self._dead)):
+            raise ValueError('Card is already on the board or dead!')
+
+        self.board += tuple(cards)
+        if self._results is not None:
+            cards_mask = _eval.cards_to_mask(cards)
+            containing = (self._runout_masks & cards_mask) == cards_mask
+            self._runout_masks = self._runout_masks[containing]
+            self._results = [result[containing] for result in self._results]
+
+        return self.equity
+
+    def streets(self, board):
+        """Equity on the flop, turn and river of a board (like ``hand_history.board``) as
+        a list of _EquityResults for every street present on the board."""
+        board = list(board)
+        if tuple(_eval.cards_to_array(board[:len(self.board)])) != self.board:
+            raise ValueError('Board should start with the cards already added!')
+
+        results = []
+        for street_end in (3, 4, 5):
+            if len(self.board) < street_end <= len(board):
+                results.append(self.add(*board[len(self.board):street_end]))
+        return results
+
+    def _enumerate(self):
+        board = np.array(self.board, dtype=np.int8)
+        masks, results = [], [[], [], []]
+        showdowns = _iter_showdown(self._hero_weights, self._villain_weights, board,
+                                   dead=self._dead)
+        for _, runouts, chunk_results in showdowns:
+            masks.append(np.bitwise_or.reduce(np.int64(1) << runouts.astype(np.int64), axis=1))
+            for result, chunk_result in zip(results, chunk_results):
+                result.append(chunk_result.sum(axis=1))
+
+        empty = [np.zeros(0)]
+        self._runout_masks = np.concatenate(masks or [np.zeros(0, dtype=np.int64)])
+        self._results = [np.concatenate(result or empty) for result in results]
+
+
+def _make_result(win, tie, total):
+    if total == 0:
+        raise ValueError('There are no possible matchups between the two holdings!')
+    win, tie = win / total, tie / total
+    return _EquityResult(win + tie / 2, win, tie)
+
+
+def _showdown(hero_weights, villain_weights, board, samples=None, random_state=None, dead=None):
+    """Compare every hero combo against every villain combo on every runout.
+
+    Returns the weighted win, tie and total matchup counts for every hero combo
+    as three 1326 long arrays.
+    """
+    win, tie, total = (np.zeros(1326) for _ in range(3))
+    showdowns = _iter_showdown(hero_weights, villain_weights, board, samples, random_state, dead)
+    for hero_indexes, _, results in showdowns:
+        for result, chunk_result in zip((win, tie, total), results):
+            result[hero_indexes] += chunk_result.sum(axis=0)
+    return win, tie, total
+
+
+def _iter_showdown(hero_weights, villain_weights, board, samples=None, random_state=None,
+                   dead=None):
+    """Compare every hero combo against every villain combo on chunks of runouts.
+
+    Yields hero combo indexes, the chunk of runouts and the weighted win, tie and total matchup
+    counts in the shape of (runouts, hero combos).
+    """
+    dead = np.zeros(0, dtype=np.int8) if dead is None else dead
+    board_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    matchup = _Matchup(hero_weights, villain_weights, board_mask)
+    if not matchup.possible.any():
+        return
+
+    runouts = _get_runouts(board, matchup.hero_indexes, matchup.villain_indexes, samples,
+                           random_state, dead)
+    combo_cards = _eval.COMBO_CARDS[matchup.indexes]
+    combo_masks = _eval.COMBO_MASKS[matchup.indexes]
+    chunk_size = max(1, _CHUNK_SIZE // max(matchup.comparisons, len(matchup.indexes) * 7))
+
+    for start in range(0, len(runouts), chunk_size):
+        chunk = runouts[start:start + chunk_size]
+        values, removed = _evaluate_runouts(combo_cards, combo_masks, board, chunk)
+        yield matchup.hero_indexes, chunk, matchup.compare(values, removed)
+
+
+class _Matchup(object):
+    """Live hero and villain combos of a showdown and their positions among the evaluated combos
+    (indexes, by default every hero and villain combo). Combos containing any card of
+    board_mask (board and dead cards) are not live."""
+
+    def __init__(self, hero_weights, villain_weights, board_mask, indexes=None):
+        live = (_eval.COMBO_MASKS & board_mask) == 0
+        self.hero_indexes = np.flatnonzero((hero_weights > 0) & live)
+        self.villain_indexes = np.flatnonzero((villain_weights > 0) & live)
+        self.hero_weights = hero_weights[self.hero_indexes]
+        self.villain_weights = villain_weights[self.villain_indexes]
+        self.possible = ~_eval.conflicts(self.hero_indexes, self.villain_indexes)
+
+        if indexes is None:
+            indexes = np.union1d(self.hero_indexes, self.villain_indexes)
+        self.indexes = indexes
+        self.hero_positions = np.searchsorted(indexes, self.hero_indexes)
+        self.villain_positions = np.searchsorted(indexes, self.villain_indexes)
+
+        # comparing every combo pair is faster for small ranges, sorting for big ones
+        pairs_num = len(self.hero_indexes) * len(self.villain_indexes)
+        self.dense = pairs_num <= _DENSE_LIMIT
+        self.comparisons = pairs_num if self.dense else 52 * 51
+
+    def compare(self, values, removed):
+        """Weighted win, tie and total matchups in the shape of (runouts, hero combos) from
+        hand values of the evaluated combos on every runout."""
+        hero_values = values[:, self.hero_positions]
+        villain_values = values[:, self.villain_positions]
+        hero_weights = np.where(removed[:, self.hero_positions], 0, self.hero_weights)
+        villain_weights = np.where(removed[:, self.villain_positions], 0, self.villain_weights)
+
+        if self.dense:
+            results = _compare_pairs(hero_values, villain_values, villain_weights, self.possible)
+        else:
+            results = _compare_sorted(self.hero_indexes, hero_values, self.villain_indexes,
+                                      villain_values, villain_weights)
+        return [result * hero_weights for result in results]
+
+
+def _canonize(hero_weights, villain_weights, board, dead):
+    """Rename the suits of a query so suit isomorphic queries become the same.
+
+    The suit permutation making the smallest sorted board and dead cards is chosen, ties are
+    broken by the permuted weights. Returns the canonical board and dead cards as tuples,
+    a key of the whole query and the permuted hero and villain weights.
+    """
+    cards = np.concatenate([np.sort(_eval.PERMUTED_CARDS[:, board], axis=1),
+                            np.sort(_eval.PERMUTED_CARDS[:, dead], axis=1)], axis=1)
+    if cards.shape[1]:
+        smallest_cards = cards[np.lexsort(cards.T[::-1])[0]]
+        smallest = np.flatnonzero((cards == smallest_cards).all(axis=1))
+    else:
+        smallest_cards, smallest = cards[0], np.arange(len(cards))
+
+    best = None
+    for permutation in smallest:
+        weights, parts = [], []
+        for player_weights in (hero_weights, villain_weights):
+            permuted = np.zeros(1326)
+            permuted[_eval.PERMUTED_COMBOS[permutation]] = player_weights
+            indexes = np.flatnonzero(permuted)
+            weights.append(permuted)
+            parts.extend([indexes.astype(np.int16).tobytes(), b'|',
+                          permuted[indexes].tobytes(), b'|'])
+        encoding = b''.join(parts)
+        if best is None or encoding < best[0]:
+            best = encoding, weights
+
+    encoding, weights = best
+    board = tuple(int(card) for card in smallest_cards[:len(board)])
+    dead = tuple(int(card) for card in smallest_cards[len(board):])
+    cards_encoding = np.array(board, dtype=np.int8).tobytes() + b'|' + \
+        np.array(dead, dtype=np.int8).tobytes()
+    key = hashlib.sha1(cards_encoding + b'|' + encoding).digest()
+    return board, dead, key, weights
+
+
+def _board_equities(board, dead, queries, samples, random_state):
+    """Equities of (hero weights, villain weights) queries on the same board with the same
+    dead cards. Every combo appearing in any query is evaluated once on every runout."""
+    board_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    live = (_eval.COMBO_MASKS & board_mask) == 0
+    used = np.zeros(1326, dtype=bool)
+    for hero_weights, villain_weights in queries:
+        used |= ((hero_weights > 0) | (villain_weights > 0)) & live
+    indexes = np.flatnonzero(used)
+
+    matchups = [_Matchup(hero_weights, villain_weights, board_mask, indexes)
+                for hero_weights, villain_weights in queries]
+    sums = [np.zeros(3) for _ in matchups]
+    possible_matchups = [(matchup, result_sums) for matchup, result_sums in zip(matchups, sums)
+                         if matchup.possible.any()]
+
+    if possible_matchups:
+        runouts = _get_runouts(board, [], [], samples, random_state, dead)
+        comparisons = max(matchup.comparisons for matchup, _ in possible_matchups)
+        chunk_size = max(1, _CHUNK_SIZE // max(comparisons, len(indexes) * 7))
+        combo_cards, combo_masks = _eval.COMBO_CARDS[indexes], _eval.COMBO_MASKS[indexes]
+
+        for start in range(0, len(runouts), chunk_size):
+            chunk = runouts[start:start + chunk_size]
+            values, removed = _evaluate_runouts(combo_cards, combo_masks, board, chunk)
+            for matchup, result_sums in possible_matchups:
+                result_sums += [result.sum() for result in matchup.compare(values, removed)]
+
+    return [_make_result(*result_sums) if result_sums[2] > 0 else None for result_sums in sums]
+
+
+def _combo_pair_equities(boards, deads, heroes, villains, samples, random_state):
+    """Equities of hero combos against villain combos (combo indexes) on boards of the same
+    length with the same number of dead cards, every query is evaluated at once instead of
+    one by one."""
+    queries_num, board_length = boards.shape
+    known = np.concatenate([_eval.COMBO_CARDS[heroes], _eval.COMBO_CARDS[villains], boards,
+                            deads], axis=1).astype(np.intp)
+    used = np.zeros((queries_num, 52), dtype=bool)
+    used[np.arange(queries_num)[:, np.newaxis], known] = True
+    possible = used.sum(axis=1) == known.shape[1]
+    # unused cards of every query in order
+    decks = np.argsort(used, axis=1, kind='mergesort')[:, :52 - known.shape[1]].astype(np.int8)
+
+    missing = 5 - board_length
+    if samples is None:
+        positions = _eval.combinations(decks.shape[1], missing).astype(np.intp)
+        runouts_num = len(positions)
+    else:
+        runouts_num = samples
+
+    wins, ties = np.zeros(queries_num), np.zeros(queries_num)
+    chunk_size = max(1, _CHUNK_SIZE // (runouts_num * 14))
+    for start in range(0, queries_num, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_decks = decks[chunk]
+        rows = np.arange(len(chunk_decks))[:, np.newaxis, np.newaxis]
+        if samples is not None:
+            priorities = random_state.random_sample((len(chunk_decks), samples, decks.shape[1]))
+            positions = np.argsort(priorities, axis=2)[:, :, :missing]
+            runouts = chunk_decks[rows, positions]
+        else:
+            runouts = chunk_decks[:, positions]
+
+        cards = np.empty((len(chunk_decks), runouts_num, 2, 7), dtype=np.int8)
+        cards[:, :, 0, :2] = _eval.COMBO_CARDS[heroes[chunk]][:, np.newaxis, :]
+        cards[:, :, 1, :2] = _eval.COMBO_CARDS[villains[chunk]][:, np.newaxis, :]
+        cards[:, :, :, 2:2 + board_length] = boards[chunk][:, np.newaxis, np.newaxis, :]
+        cards[:, :, :, 2 + board_length:] = runouts[:, :, np.newaxis, :]
+
+        values = _eval.evaluate(cards)
+        wins[chunk] = (values[:, :, 0] > values[:, :, 1]).mean(axis=1)
+        ties[chunk] = (values[:, :, 0] == values[:, :, 1]).mean(axis=1)
+
+    return [_EquityResult(win + tie / 2, win, tie) if is_possible else None
+            for win, tie, is_possible in zip(wins, ties, possible)]
+
+
+def _compare_pairs(hero_values, villain_values, villain_weights, possible):
+    """Weighted win, tie and total matchups of every hero combo on every runout in the shape of
+    (runouts, hero combos) by comparing every hero combo with every villain combo."""
+    difference = hero_values[:, :, np.newaxis] - villain_values[:, np.newaxis, :]
+    wins = ((difference > 0) & possible).astype(np.float64)
+    ties = ((difference == 0) & possible).astype(np.float64)
+    alls = np.broadcast_to(possible.astype(np.float64), wins.shape)
+    return [np.einsum('rhv,rv->rh', matchups, villain_weights) for matchups in (wins, ties, alls)]
+
+
+def _compare_sorted(hero_indexes, hero_values, villain_indexes, villain_values, villain_weights):
+    """Same as _compare_pairs, but with sorting the villain combos by hand value on every runout,
+    so the weight of weaker villain combos can be looked up with binary search.
+
+    Villain combos sharing a card with the hero combo are subtracted by looking up the same from
+    the 51 combos of both hero cards. The hero combo itself is subtracted twice this way, so its
+    weight is added back.
+    """
+    runouts_num = len(hero_values)
+    villain_positions = np.full(1326, -1)
+    villain_positions[villain_indexes] = np.arange(len(villain_indexes))
+
+    # villain combos of every card, (runouts, 52 cards, 51 combos)
+    card_positions = villain_positions[_CARD_COMBOS]
+    card_values = villain_values[:, card_positions]
+    card_weights = np.where(card_positions >= 0, villain_weights[:, card_positions], 0)
+
+    hero_cards = _eval.COMBO_CARDS[hero_indexes].astype(np.intp)
+    card_rows = np.arange(runouts_num)[:, np.newaxis] * 52
+    first_rows, second_rows = card_rows + hero_cards[:, 0], card_rows + hero_cards[:, 1]
+
+    all_villains = _SortedWeights(villain_values, villain_weights)
+    card_villains = _SortedWeights(card_values.reshape(runouts_num * 52, 51),
+                                   card_weights.reshape(runouts_num * 52, 51))
+    all_rows = np.broadcast_to(np.arange(runouts_num)[:, np.newaxis], hero_values.shape)
+
+    results = []
+    for side in ('left', 'right'):
+        results.append(all_villains.below(all_rows, hero_values, side) -
+                       card_villains.below(first_rows, hero_values, side) -
+                       card_villains.below(second_rows, hero_values, side))
+    less, less_or_equal = results
+
+    hero_positions = villain_positions[hero_indexes]
+    same = np.where(hero_positions >= 0, villain_weights[:, hero_positions], 0)
+    totals = (all_villains.total(all_rows) - card_villains.total(first_rows) -
+              card_villains.total(second_rows) + same)
+    return less, less_or_equal - less + same, totals
+
+
+class _SortedWeights(object):
+    """Cumulative weights of values sorted in every row for looking up the sum of weights
+    below a value in a given row."""
+
+    def __init__(self, values, weights):
+        rows_num, self._columns = values.shape
+        order = np.argsort(values, axis=1)
+        rows = np.arange(rows_num)[:, np.newaxis]
+        self._offsets = np.arange(rows_num, dtype=np.int64) << 32
+        self._values = (values[rows, order] + self._offsets[:, np.newaxis]).ravel()
+        self._cumulative = np.zeros((rows_num, self._columns + 1))
+        np.cumsum(weights[rows, order], axis=1, out=self._cumulative[:, 1:])
+
+    def below(self, rows, values, side='left'):
+        """Sum of weights of values less (or equal with side='right') than values in rows."""
+        positions = np.searchsorted(self._values, values + self._offsets[rows], side)
+        return self._cumulative[rows, positions - rows * self._columns]
+
+    def total(self, rows):
+        return self._cumulative[rows, -1]
+
+
+def _get_runouts(board, hero_indexes, villain_indexes, samples, random_state=None, dead=()):
+    """Card indexes of every runout (or samples random runouts) completing the board,
+    without the dead cards."""
+    # cards which are in every combo of a player are certainly out of the deck
+    known_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    for indexes in (hero_indexes, villain_indexes):
+        if len(indexes):
+            known_mask |= int(np.bitwise_and.reduce(_eval.COMBO_MASKS[indexes]))
+    deck = np.array([card for card in range(52) if not (known_mask >> card) & 1], dtype=np.int8)
+    missing = 5 - len(board)
+
+    if samples is None:
+        return deck[_eval.combinations(len(deck), missing)]
+
+    random_state = _make_random_state(random_state)
+    order = np.argsort(random_state.random_sample((samples, len(deck))), axis=1)
+    return deck[order[:, :missing]]
+
+
+def _evaluate_runouts(combo_cards, combo_masks, board, runouts):
+    """Evaluate every combo with every runout.
+
+    Returns hand values and a boolean array of combos which are impossible because of the runout,
+    both are in the shape of (runouts, combos).
+    """
+    runouts_num, combos_num = len(runouts), len(combo_cards)
+    cards = np.empty((runouts_num, combos_num, 7), dtype=np.int8)
+    cards[:, :, :2] = combo_cards
+    cards[:, :, 2:2 + len(board)] = board
+    cards[:, :, 2 + len(board):] = runouts[:, np.newaxis, :]
+
+    runout_masks = np.zeros(runouts_num, dtype=np.int64)
+    for column in runouts.T:
+        runout_masks |= np.int64(1) << column.astype(np.int64)
+    removed = (runout_masks[:, np.newaxis] & combo_masks[np.newaxis, :]) != 0
+
+    return _eval.evaluate(cards), removed
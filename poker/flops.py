@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Range against range analysis on every strategically different flop.
+"""
+
+import numpy as np
+from . import _eval
+from ._common import _spawn_random_states, _parallel_map
+from .equity import _iter_showdown
+
+
+__all__ = ['canonical_flops', 'FlopTable']
+
+
+def canonical_flops():
+    """The 1755 strategically different flops (every flop is the same as one of them after
+    renaming suits) and how many of the 22100 flops each of them stands for.
+
+    Returns the card indexes of the flops as a (1755, 3) array and their counts.
+    """
+    flops = _eval.combinations(52, 3)
+    permuted = np.sort(_eval.PERMUTED_CARDS[:, flops].astype(np.int32), axis=2)
+    codes = (permuted * np.array([52 * 52, 52, 1])).sum(axis=2).min(axis=0)
+    unique_codes, counts = np.unique(codes, return_counts=True)
+    canonical = np.column_stack([unique_codes // (52 * 52), unique_codes // 52 % 52,
+                                 unique_codes % 52])
+    return canonical.astype(np.int8), counts
+
+
+class FlopTable(object):
+    """Equity, equity distribution and nut advantage of hero's range against villain's range on
+    every canonical flop, optionally the equity on every turn too.
+
+    Arrays are in the order of the flops (by default :func:`canonical_flops`):
+
+    ``flops``, ``counts``
+        card indexes and number of isomorphic flops.
+    ``equity``
+        hero's equity on the flop.
+    ``distribution``
+        ratio of hero's combos (weighted by possible matchups) in every equity bin
+        (``bins`` equal bins between 0 and 1).
+    ``hero_nuts``, ``villain_nuts``
+        ratio of the combos of the players which are among the strongest made hands possible
+        on the flop (``nut_ratio`` of every possible combo by hand value).
+    ``turn_equity``
+        (flops, 52) array of hero's equity after every turn card, NaN for impossible turns
+        (only if turns were calculated).
+    """
+
+    fields = ('flops', 'counts', 'equity', 'distribution', 'hero_nuts', 'villain_nuts',
+              'turn_equity')
+
+    def __init__(self, flops, counts, equity, distribution, hero_nuts, villain_nuts,
+                 turn_equity=None):
+        self.flops = flops
+        self.counts = counts
+        self.equity = equity
+        self.distribution = distribution
+        self.hero_nuts = hero_nuts
+        self.villain_nuts = villain_nuts
+        self.turn_equity = turn_equity
+
+    @property
+    def nut_advantage(self):
+        """Hero's ratio of nut hands minus villain's on every flop."""
+        return self.hero_nuts - self.villain_nuts
+
+    @property
+    def average_equity(self):
+        """Hero's equity averaged over every flop (weighted by counts)."""
+        return np.average(self.equity, weights=self.counts)
+
+    @classmethod
+    def generate(cls, hero, villain, flops=None, turns=False, samples=None, bins=10,
+                 nut_ratio=0.05, processes=1, random_state=None):
+        """Analyze every canonical flop or only the given flops (lists of three cards), which
+        count one each. Canonical flops only stand for their isomorphic flops when both ranges
+        are the same after renaming suits (like ranges of whole hands); with specific combos or
+        arbitrary weights every one of the 22100 flops is analyzed, which takes 13 times longer.
+        Without samples every turn and river is enumerated, otherwise samples number of random
+        runouts are evaluated on every flop.
+        Flops are split between processes number of worker processes.
+        """
+        hero_weights, villain_weights = _eval.to_weights(hero), _eval.to_weights(villain)
+        if flops is None:
+            flops, counts = _every_flop(hero_weights, villain_weights)
+        else:
+            flops = np.array([_eval.cards_to_array(flop) for flop in flops],
+                             dtype=np.int8).reshape(-1, 3)
+            counts = np.ones(len(flops), dtype=np.int64)
+
+        # fixed number of chunks, so every chunk has the same random stream on every run
+        chunks = np.array_split(np.arange(len(flops)), 64)
+        random_states = _spawn_random_states(random_state, len(chunks))
+        arguments = [(flops[chunk], hero_weights, villain_weights, turns, samples, bins,
+                      nut_ratio, chunk_random_state)
+                     for chunk, chunk_random_state in zip(chunks, random_states)]
+        results = _parallel_map(_analyze_flops, arguments, processes)
+
+        columns = [np.concatenate(column) for column in zip(*results)]
+        if not turns:
+            columns[-1] = None
+        return cls(flops, counts, *columns)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(unicode(filename)) as data:
+            arrays = {field: data[field] for field in cls.fields if field in data.files}
+        return cls(**arrays)
+
+    def save(self, filename):
+        """Save every array to a compressed .npz file."""
+        arrays = {field: getattr(self, field) for field in self.fields
+                  if getattr(self, field) is not None}
+        np.savez_compressed(unicode(filename), **arrays)
+
+
+def _every_flop(hero_weights, villain_weights):
+    """Canonical flops and their counts if both ranges are suit symmetric, otherwise every
+    flop counting one."""
+    if all((weights[_eval.PERMUTED_COMBOS] == weights).all()
+           for weights in (hero_weights, villain_weights)):
+        return canonical_flops()
+    flops = _eval.combinations(52, 3).astype(np.int8)
+    return flops, np.ones(len(flops), dtype=np.int64)
+
+
+def _analyze_flops(argument):
+    """Results of a chunk of flops as arrays of equities, distributions, nut ratios and
+    turn equities."""
+    flops, hero_weights, villain_weights, turns, samples, bins, nut_ratio, random_state = argument
+    flops_num = len(flops)
+    equities = np.full(flops_num, np.nan, dtype=np.float32)
+    distributions = np.zeros((flops_num, bins), dtype=np.float32)
+    nuts = np.zeros((2, flops_num), dtype=np.float32)
+    turn_equities = np.full((flops_num, 52 if turns else 0), np.nan, dtype=np.float32)
+
+    for ind, flop in enumerate(flops):
+        nuts[:, ind] = _get_nut_ratios(flop, (hero_weights, villain_weights), nut_ratio)
+
+        combo_results = np.zeros((3, 1326))
+        turn_results = np.zeros((3, 52))
+        showdowns = _iter_showdown(hero_weights, villain_weights, flop, samples, random_state)
+        for hero_indexes, runouts, results in showdowns:
+            for result, combo_result, turn_result in zip(results, combo_results, turn_results):
+                combo_result[hero_indexes] += result.sum(axis=0)
+                if turns:
+                    runout_results = result.sum(axis=1)
+                    for column in runouts.T:
+                        turn_result += np.bincount(column, runout_results, minlength=52)
+
+        win, tie, total = combo_results
+        if not total.any():
+            continue
+        equities[ind] = (win.sum() + tie.sum() / 2) / total.sum()
+
+        played = np.flatnonzero(total)
+        combo_equities = (win[played] + tie[played] / 2) / total[played]
+        histogram = np.histogram(combo_equities, bins, (0, 1), weights=total[played])[0]
+        distributions[ind] = histogram / total.sum()
+
+        if turns:
+            turn_win, turn_tie, turn_total = turn_results
+            with np.errstate(divide='ignore', invalid='ignore'):
+                turn_equities[ind] = (turn_win + turn_tie / 2) / turn_total
+
+    return equities, distributions, nuts[0], nuts[1], turn_equities
+
+
+def _get_nut_ratios(flop, player_weights, nut_ratio):
+    """Ratio of every player's combos which are among the nut_ratio strongest of every possible
+    combo on the flop by made hand value."""
+    live = (_eval.COMBO_MASKS & _eval.cards_to_mask(flop)) == 0
+    live_indexes = np.flatnonzero(live)
+    cards = np.empty((len(live_indexes), 5), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS[live_indexes], flop
+    values = np.zeros(1326, dtype=np.int64)
+    values[live_indexes] = _eval.evaluate(cards)
+
+    threshold = np.percentile(values[live_indexes], 100 * (1 - nut_ratio), interpolation='lower')
+    nuts = live & (values >= threshold)
+    ratios = []
+    for weights in player_weights:
+        live_weights = np.where(live, weights, 0)
+        total = live_weights.sum()
+        ratios.append(live_weights[nuts].sum() / total if total else np.nan)
+    return ratios
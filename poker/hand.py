@@ -2,12 +2,11 @@
 from __future__ import unicode_literals, absolute_import, division, print_function
 
 import re
-import random
 import itertools
 import functools
 from decimal import Decimal
 from cached_property import cached_property
-from ._common import PokerEnum, _ReprMixin
+from ._common import PokerEnum, _ReprMixin, _make_random_state
 from .card import Suit, Rank, Card, BROADWAY_RANKS
 
 
@@ -48,15 +47,16 @@ class _HandMeta(type):
     def __iter__(cls):
         return iter(cls._all_hands)
 
-    def make_random(cls):
+    def make_random(cls, random_state=None):
+        random_state = _make_random_state(random_state)
         obj = object.__new__(cls)
-        first = Rank.make_random()
-        second = Rank.make_random()
+        first = Rank.make_random(random_state)
+        second = Rank.make_random(random_state)
         obj._set_ranks_in_order(first, second)
         if first == second:
             obj._shape = ''
         else:
-            obj._shape = random.choice(['s', 'o'])
+            obj._shape = ('s', 'o')[random_state.randint(2)]
         return obj
 
 
@@ -340,6 +340,27 @@ class Combo(_ReprMixin):
         self._shape = Shape(value).val
 
 
+def _get_heatmap_color(value):
+    """RGB color for a value between 0 (red) and 1 (green) through yellow."""
+    value = min(max(value, 0), 1)
+    if value < 0.5:
+        return 255, int(round(510 * value)), 0
+    return int(round(510 * (1 - value))), 255, 0
+
+
+def _make_combos():
+    cards = tuple(Card)
+    return tuple(Combo.from_cards(cards[second], cards[first])
+                 for first, second in itertools.combinations(range(52), 2))
+
+
+# every combo is a bit of a Range's mask, in the combo index order of poker._eval
+_COMBOS = _make_combos()
+_COMBO_BITS = {combo: 1 << index for index, combo in enumerate(_COMBOS)}
+_HAND_MASKS = {hand: sum(_COMBO_BITS[combo] for combo in hand.to_combos()) for hand in Hand}
+_ALL_MASK = (1 << len(_COMBOS)) - 1
+
+
 class _RegexRangeLexer(object):
     _separator_re = re.compile(r"[, ;\n]")
     _rank = r"([2-9TJQKA])"
@@ -458,20 +479,20 @@ class _RegexRangeLexer(object):
 
 @functools.total_ordering
 class Range(object):
-    """Parses a str range into tuple of Combos (or Hands)."""
-    slots = ('_hands', '_combos')
+    """Parses a str range into tuple of Combos (or Hands).
+
+    The combos are stored as the bits of one 1326 bit integer, so set operations (``|``, ``&``,
+    ``-``, ``^``), membership, length, equality, subset tests and hashing are a few integer
+    operations without making any Combo.
+    """
+    slots = ('_mask',)
 
     def __init__(self, range=''):
-        self._hands = set()
-        self._combos = set()
+        self._mask = 0
 
         for token, value in _RegexRangeLexer(range):
             if token == 'ALL':
-                for card in itertools.combinations('AKQJT98765432', 2):
-                    self._add_offsuit(card)
-                    self._add_suited(card)
-                for rank in 'AKQJT98765432':
-                    self._add_pair(rank)
+                self._mask = _ALL_MASK
 
                 # full range, no need to parse any more token
                 break
@@ -557,7 +578,7 @@ class Range(object):
                             self._add_offsuit(rank1.val + rank2.val)
 
             elif token == 'COMBO':
-                self._combos.add(Combo(value))
+                self._mask |= _COMBO_BITS[Combo(value)]
 
             elif token == 'OFFSUIT_PLUS':
                 smaller, bigger = Rank(value[0]), Rank(value[1])
@@ -606,33 +627,82 @@ class Range(object):
     @classmethod
     def from_objects(cls, iterable):
         """Make an instance from an iterable of Combos, Hands or both."""
-        range_string = ' '.join(unicode(obj) for obj in iterable)
-        return cls(range_string)
+        mask = 0
+        for obj in iterable:
+            if isinstance(obj, Combo):
+                mask |= _COMBO_BITS[obj]
+            elif isinstance(obj, Hand):
+                mask |= _HAND_MASKS[obj]
+            else:
+                mask |= cls(unicode(obj))._mask
+        return cls._from_mask(mask)
+
+    @classmethod
+    def _from_mask(cls, mask):
+        self = cls.__new__(cls)
+        self._mask = mask
+        return self
 
     def __eq__(self, other):
         if self.__class__ is other.__class__:
-            return self._all_combos == other._all_combos
+            return self._mask == other._mask
+        return NotImplemented
+
+    def __ne__(self, other):
+        if self.__class__ is other.__class__:
+            return self._mask != other._mask
         return NotImplemented
 
     def __lt__(self, other):
         if self.__class__ is other.__class__:
-            return len(self._all_combos) < len(other._all_combos)
+            return self._combos_count < other._combos_count
+        return NotImplemented
+
+    def __or__(self, other):
+        if self.__class__ is other.__class__:
+            return self._from_mask(self._mask | other._mask)
+        return NotImplemented
+
+    def __and__(self, other):
+        if self.__class__ is other.__class__:
+            return self._from_mask(self._mask & other._mask)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if self.__class__ is other.__class__:
+            return self._from_mask(self._mask & ~other._mask)
         return NotImplemented
 
+    def __xor__(self, other):
+        if self.__class__ is other.__class__:
+            return self._from_mask(self._mask ^ other._mask)
+        return NotImplemented
+
+    def issubset(self, other):
+        """Every combo of this range is in the other range."""
+        return self._mask & ~other._mask == 0
+
+    def issuperset(self, other):
+        """Every combo of the other range is in this range."""
+        return other._mask & ~self._mask == 0
+
+    def isdisjoint(self, other):
+        """The ranges have no combo in common."""
+        return self._mask & other._mask == 0
+
     def __contains__(self, item):
+        if isinstance(item, unicode):
+            item = Combo(item) if len(item) == 4 else Hand(item)
         if isinstance(item, Combo):
-            return item in self._combos or item.to_hand() in self._hands
+            return self._mask & _COMBO_BITS[item] != 0
         elif isinstance(item, Hand):
-            return item in self._all_hands
-        elif isinstance(item, unicode):
-            if len(item) == 4:
-                combo = Combo(item)
-                return combo in self._combos or combo.to_hand() in self._hands
-            else:
-                return Hand(item) in self._all_hands
+            return self._mask & _HAND_MASKS[item] != 0
 
     def __len__(self):
-        return self._count_combos()
+        return self._combos_count
+
+    def __nonzero__(self):
+        return self._mask != 0
 
     def __unicode__(self):
         return ', '.join(self.rep_pieces)
@@ -645,21 +715,32 @@ class Range(object):
         return "{}('{}')".format(self.__class__.__name__, range).encode('utf-8')
 
     def __getstate__(self):
-        return {'_hands': self._hands, '_combos': self._combos}
+        return {'_mask': self._mask}
 
     def __setstate__(self, state):
-        self._hands, self._combos = state['_hands'], state['_combos']
+        if '_mask' in state:
+            self._mask = state['_mask']
+        else:
+            # pickled as sets of Hands and Combos by older versions
+            self._mask = 0
+            for hand in state['_hands']:
+                self._mask |= _HAND_MASKS[hand]
+            for combo in state['_combos']:
+                self._mask |= _COMBO_BITS[combo]
 
     def __hash__(self):
-        return hash(self.combos)
+        return hash(self._mask)
 
-    def to_html(self):
+    def to_html(self, heatmap=None):
         """Returns a 13x13 HTML table representing the range.
 
         The table's CSS class is ``range``, pair cells (td element) are ``pair``, offsuit hands are
         ``offsuit`` and suited hand cells has ``suited`` css class.
         The HTML contains no extra whitespace at all.
         Calculating it should not take more than 30ms (which takes calculating a 100% range).
+
+        heatmap can be a dict of Hands and values between 0 and 1 (e.g. equities), the cells of
+        those hands will be colored from red (0) through yellow to green (1).
         """
 
         # note about speed: I tried with functools.lru_cache, and the initial call was 3-4x slower
@@ -678,9 +759,15 @@ class Range(object):
                 else:
                     suit, cssclass = '', 'pair'
 
-                html.append('<td class="%s">' % cssclass)
                 hand = Hand(row.val + col.val + suit)
 
+                if heatmap and hand in heatmap and hand in self.hands:
+                    red, green, blue = _get_heatmap_color(heatmap[hand])
+                    html.append('<td class="%s" style="background-color:#%02x%02x%02x">' %
+                                (cssclass, red, green, blue))
+                else:
+                    html.append('<td class="%s">' % cssclass)
+
                 if hand in self.hands:
                     html.append(unicode(hand))
 
@@ -691,8 +778,11 @@ class Range(object):
         html.append('</table>')
         return ''.join(html)
 
-    def to_ascii(self, border=False):
-        """Returns a nicely formatted ASCII table with optional borders."""
+    def to_ascii(self, border=False, heatmap=None):
+        """Returns a nicely formatted ASCII table with optional borders.
+
+        heatmap is the same as for :meth:`to_html`, hands are colored with ANSI escape codes.
+        """
 
         table = []
 
@@ -714,9 +804,14 @@ class Range(object):
                     suit = ''
 
                 hand = Hand(row.val + col.val + suit)
-                hand = unicode(hand) if hand in self.hands else ''
+                hand_str = unicode(hand).ljust(4) if hand in self.hands else '    '
+                if heatmap and hand in heatmap and hand in self.hands:
+                    # nearest color in the 6x6x6 color cube of 256 color terminals
+                    red, green, blue = (round(c / 51) for c in _get_heatmap_color(heatmap[hand]))
+                    color = int(16 + 36 * red + 6 * green + blue)
+                    hand_str = '\x1b[30;48;5;%dm%s\x1b[0m' % (color, hand_str)
                 table.append(border)
-                table.append(hand.ljust(4))
+                table.append(hand_str)
 
             if row.val != '2':
                 table.append(border)
@@ -732,7 +827,7 @@ class Range(object):
     def rep_pieces(self):
         """List of str pieces how the Range is represented."""
 
-        if self._count_combos() == 1326:
+        if self._combos_count == 1326:
             return ['XX']
 
         all_combos = self._all_combos
@@ -819,13 +914,13 @@ class Range(object):
             return '{}-{}'.format(first, last)
 
     def _add_pair(self, rank):
-        self._hands.add(Hand(rank * 2))
+        self._mask |= _HAND_MASKS[Hand(rank * 2)]
 
     def _add_offsuit(self, tok):
-        self._hands.add(Hand(tok[0] + tok[1] + 'o'))
+        self._mask |= _HAND_MASKS[Hand(tok[0] + tok[1] + 'o')]
 
     def _add_suited(self, tok):
-        self._hands.add(Hand(tok[0] + tok[1] + 's'))
+        self._mask |= _HAND_MASKS[Hand(tok[0] + tok[1] + 's')]
 
     @cached_property
     def hands(self):
@@ -845,30 +940,27 @@ class Range(object):
         There are 1326 total combos in Hold'em: 52 * 51 / 2 (because order doesn't matter)
         Precision: 2 decimal point
         """
-        dec_percent = (Decimal(self._count_combos()) / 1326 * 100)
+        dec_percent = (Decimal(self._combos_count) / 1326 * 100)
         # round to two decimal point
         return float(dec_percent.quantize(Decimal('1.00')))
 
-    def _count_combos(self):
-        combo_count = len(self._combos)
-        for hand in self._hands:
-            if hand.is_pair:
-                combo_count += 6
-            elif hand.is_offsuit:
-                combo_count += 12
-            elif hand.is_suited:
-                combo_count += 4
-        return combo_count
+    @cached_property
+    def _combos_count(self):
+        return bin(self._mask).count('1')
 
     @cached_property
     def _all_combos(self):
-        hand_combos = {combo for hand in self._hands for combo in hand.to_combos()}
-        return hand_combos | self._combos
+        return {_COMBOS[index] for index in self._indexes}
 
     @cached_property
     def _all_hands(self):
-        combo_hands = {combo.to_hand() for combo in self._combos}
-        return combo_hands | self._hands
+        return {hand for hand, mask in _HAND_MASKS.items() if self._mask & mask}
+
+    @property
+    def _indexes(self):
+        """Combo indexes (as in poker._eval) of the set bits."""
+        bits = bin(self._mask)[:1:-1]
+        return [index for index, bit in enumerate(bits) if bit == '1']
 
 
 if __name__ == '__main__':
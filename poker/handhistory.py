@@ -31,7 +31,8 @@ class _BaseStreet(object):
         self.cards = None
         self._parse_cards(flop[0])
         self._parse_actions(flop[1:])
-        self._all_combinations = itertools.combinations(self.cards, 2)
+        # a tuple, because every board property iterates over it
+        self._all_combinations = tuple(itertools.combinations(self.cards, 2))
 
     @cached_property
     def is_rainbow(self):
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Independent Chip Model: tournament prize equity of chip stacks.
+"""
+
+from collections import OrderedDict as odict
+import numpy as np
+from ._common import _make_random_state, _spawn_random_states, _parallel_map
+from .equity import _CHUNK_SIZE
+
+
+__all__ = ['finish_probabilities', 'icm', 'hand_history_icm', 'fgs_icm', 'hand_history_fgs']
+
+
+# the exact calculation stores a probability for every subset of the players
+_MAX_EXACT_PLAYERS = 20
+
+# simulated tables in one FGS task, every task has its own random stream
+_FGS_CHUNK_SIZE = 5000
+
+
+def finish_probabilities(stacks, places=None, samples=None, random_state=None):
+    """Probability of every player finishing in every place by the Malmuth-Harville model:
+    a player finishes first with the ratio of their stack to every chip in play, the others
+    finish in the next places the same way among the rest of the players.
+
+    Calculates the first places number of places (by default every place). Without samples the
+    probabilities are exact (for up to 20 players), otherwise samples number of random finishing
+    orders are drawn, which works for fields of any size.
+    Returns an array in the shape of (players, places).
+    """
+    stacks = _to_stacks(stacks)
+    places = len(stacks) if places is None else min(places, len(stacks))
+    if samples is None:
+        if len(stacks) > _MAX_EXACT_PLAYERS:
+            raise ValueError('Exact ICM is supported for up to %d players, not %d, use samples.'
+                             % (_MAX_EXACT_PLAYERS, len(stacks)))
+        return _exact_probabilities(stacks, places)
+    return _sample_probabilities(stacks, places, samples, _make_random_state(random_state))
+
+
+def icm(stacks, payouts, samples=None, random_state=None):
+    """Prize equity ($EV) of every player's stack.
+
+    Payouts are the prizes from the first place; places without prize can be left out and
+    payouts for more places than players are ignored (they were paid to players already out).
+    See :func:`finish_probabilities` for samples.
+    Returns an array of the $EV of every player.
+    """
+    payouts = np.array(payouts, dtype=np.float64)
+    if payouts.ndim != 1 or not len(payouts):
+        raise ValueError('Payouts should be a list of prizes, not %r' % (payouts,))
+    probabilities = finish_probabilities(stacks, len(payouts), samples, random_state)
+    return probabilities.dot(payouts[:probabilities.shape[1]])
+
+
+def hand_history_icm(hand_histories, payouts, samples=None, random_state=None):
+    """$EV of every player at the start of every hand of a tournament by their starting stack.
+
+    Hand histories are parsed if they were not yet. The players seated at the table are taken
+    as the whole field (like in a single table tournament), so payouts are shared by them
+    (see :func:`icm`). Stacks seen before are not calculated again.
+    Returns a list of OrderedDicts of player names and $EVs in seat order for every hand.
+    """
+    random_state = _make_random_state(random_state)
+    results, calculated = [], {}
+    for hand_history in hand_histories:
+        if not hand_history.parsed:
+            hand_history.parse()
+        players = [player for player in hand_history.players if player.stack > 0]
+        stacks = tuple(player.stack for player in players)
+        if stacks not in calculated:
+            calculated[stacks] = icm(stacks, payouts, samples, random_state)
+        results.append(odict((player.name, equity)
+                             for player, equity in zip(players, calculated[stacks])))
+    return results
+
+
+def fgs_icm(stacks, payouts, strategies, blinds, button=0, hands=2, samples=10000, calls=None,
+            processes=1, random_state=None, cache=None):
+    """Prize equity of every player's stack by future game simulation (FGS): the next hands
+    are played by push/fold charts and the ICM $EV of the stacks after them is averaged, so
+    the blinds to be paid and the positions count, not only the chips.
+
+    Stacks are in seat order with the button of the next hand, which moves after every hand.
+    Blinds are (small blind, big blind, ante) for every simulated hand; strategies are one
+    :class:`poker.strategy.Strategy` for every player or one per seat and are played the same
+    way as in :func:`poker.sng.simulate_sng`. Players busting in the simulated hands get the
+    prize of their place, the rest share the prizes left by :func:`icm`.
+    Samples number of tables are simulated in chunks with their own random streams (also in
+    parallel processes). The ICM of every different stack configuration is calculated once and
+    kept in the cache dict, which can be shared by calls with the same payouts.
+    Returns an array of the $EV of every player.
+    """
+    from .sng import _compile_charts
+    stacks = _to_stacks(stacks)
+    charts, seat_charts = _compile_charts(strategies, len(stacks), calls)
+    return _fgs(stacks, payouts, charts, seat_charts, blinds, button, hands, samples, processes,
+                random_state, {} if cache is None else cache)
+
+
+def hand_history_fgs(hand_histories, payouts, strategies, ante=0, hands=2, samples=10000,
+                     calls=None, processes=1, random_state=None):
+    """$EV of every player at the start of every hand of a tournament by future game simulation
+    (see :func:`fgs_icm`) with the blinds and the button of the hand.
+
+    Hand histories are parsed if they were not yet; antes are not parsed, so the ante is given.
+    The players seated at the table are the whole field, as in :func:`hand_history_icm`.
+    Returns a list of OrderedDicts of player names and $EVs in seat order for every hand.
+    """
+    from .sng import _compile_charts
+    random_state = _make_random_state(random_state)
+    results, compiled, cache = [], {}, {}
+    for hand_history in hand_histories:
+        if not hand_history.parsed:
+            hand_history.parse()
+        players = [player for player in hand_history.players if player.stack > 0]
+        if len(players) not in compiled:
+            compiled[len(players)] = _compile_charts(strategies, len(players), calls)
+        charts, seat_charts = compiled[len(players)]
+        button = next(index for index, player in enumerate(players)
+                      if player.name == hand_history.button.name)
+        blinds = float(hand_history.sb), float(hand_history.bb), ante
+        equities = _fgs(_to_stacks([player.stack for player in players]), payouts, charts,
+                        seat_charts, blinds, button, hands, samples, processes, random_state,
+                        cache)
+        results.append(odict((player.name, equity) for player, equity in zip(players, equities)))
+    return results
+
+
+def _fgs(stacks, payouts, charts, seat_charts, blinds, button, hands, samples, processes,
+         random_state, cache):
+    payouts = np.array(payouts, dtype=np.float64)
+    counts = [_FGS_CHUNK_SIZE] * (samples // _FGS_CHUNK_SIZE)
+    if samples % _FGS_CHUNK_SIZE:
+        counts.append(samples % _FGS_CHUNK_SIZE)
+    random_states = _spawn_random_states(random_state, len(counts))
+    arguments = [(charts, seat_charts, stacks, blinds, button, hands, count, chunk_random_state)
+                 for count, chunk_random_state in zip(counts, random_states)]
+    results = _parallel_map(_play_future_hands, arguments, processes)
+
+    # a few hands of push/fold leave only some stack configurations
+    configurations, frequencies = np.unique(np.concatenate(results), axis=0, return_counts=True)
+    equities = np.zeros(len(stacks))
+    for configuration, frequency in zip(configurations, frequencies):
+        key = tuple(configuration)
+        if key not in cache:
+            cache[key] = _configuration_icm(configuration, payouts)
+        equities += frequency * cache[key]
+    return equities / samples
+
+
+def _play_future_hands(argument):
+    """Stacks and places (zero for the players still in) after the hands at every table, in the
+    shape of (tables, 2 * players)."""
+    from .sng import _play_hand, _next_alive
+    charts, seat_charts, stacks, blinds, button, hands, count, random_state = argument
+    players_num = len(stacks)
+    stacks = np.tile(stacks, (count, 1))
+    places = np.zeros((count, players_num))
+    buttons = np.full(count, button, dtype=np.int64)
+    for hand in range(hands):
+        before, stacks = stacks, _play_hand(stacks, buttons, charts, seat_charts, blinds,
+                                            random_state)
+        # players busting in the same hand are ranked by their stacks before it
+        busted = (before > 0) & (stacks <= 0)
+        left = (stacks > 0).sum(axis=1)
+        ranks = np.argsort(np.argsort(np.where(busted, -before, np.inf), axis=1), axis=1)
+        places = np.where(busted, left[:, np.newaxis] + 1 + ranks, places)
+        buttons = _next_alive(buttons, stacks > 0)
+    return np.concatenate([np.maximum(stacks, 0), places], axis=1)
+
+
+def _configuration_icm(configuration, payouts):
+    stacks, places = np.split(configuration, 2)
+    alive = stacks > 0
+    equities = np.zeros(len(stacks))
+    equities[alive] = icm(stacks[alive], payouts)
+    prizes = np.concatenate([payouts, np.zeros(len(stacks))])
+    equities[~alive] = prizes[places[~alive].astype(np.int64) - 1]
+    return equities
+
+
+def _to_stacks(stacks):
+    stacks = np.array(stacks, dtype=np.float64)
+    if stacks.ndim != 1 or not len(stacks):
+        raise ValueError('Stacks should be a list of chip counts, not %r' % (stacks,))
+    if (stacks <= 0).any():
+        raise ValueError('Every stack should be positive, players without chips are out.')
+    return stacks
+
+
+def _exact_probabilities(stacks, places):
+    """Finishing place probabilities by dynamic programming over the subsets of players.
+
+    The probability of a set of players taking the first places (in any order) is the sum of
+    the probabilities of its subsets without one of them, times that player's chance to finish
+    next, so every subset is calculated once instead of every finishing order (which would be
+    factorial time). Only subsets smaller than places are needed.
+    """
+    players_num = len(stacks)
+    subsets = np.arange(1 << players_num)
+    sizes = np.zeros(len(subsets), dtype=np.int8)
+    remaining = np.full(len(subsets), stacks.sum())
+    for player, stack in enumerate(stacks):
+        finished = (subsets >> player) & 1
+        sizes += finished.astype(np.int8)
+        remaining -= finished * stack
+
+    subset_probabilities = np.zeros(len(subsets))
+    subset_probabilities[0] = 1
+    probabilities = np.zeros((players_num, places))
+    for place in range(places):
+        # probability of the subsets of this size is complete after the previous place
+        subset = subsets[sizes == place]
+        chances = (subset_probabilities[subset] / remaining[subset])[:, np.newaxis] * stacks
+        chances[((subset[:, np.newaxis] >> np.arange(players_num)) & 1).astype(bool)] = 0
+        probabilities[:, place] = chances.sum(axis=0)
+        if place + 1 < places:
+            for player in range(players_num):
+                bit = 1 << player
+                finished = chances[:, player] > 0
+                subset_probabilities[subset[finished] | bit] += chances[finished, player]
+    return probabilities
+
+
+def _sample_probabilities(stacks, places, samples, random_state):
+    """Finishing place frequencies of random finishing orders.
+
+    Exponential random keys with the stacks as rates in increasing order are a Malmuth-Harville
+    finishing order: the smallest one is every player's with the ratio of their stack and,
+    the exponential distribution being memoryless, the rest are the same among the others.
+    """
+    players_num = len(stacks)
+    counts = np.zeros((players_num, places))
+    chunk_size = max(1, _CHUNK_SIZE // players_num)
+    for start in range(0, samples, chunk_size):
+        chunk_samples = min(chunk_size, samples - start)
+        keys = random_state.standard_exponential((chunk_samples, players_num)) / stacks
+        if places < players_num:
+            finishers = np.argpartition(keys, places - 1, axis=1)[:, :places]
+            order = np.argsort(np.take_along_axis(keys, finishers, axis=1), axis=1)
+            finishers = np.take_along_axis(finishers, order, axis=1)
+        else:
+            finishers = np.argsort(keys, axis=1)
+        for place, column in enumerate(finishers.T):
+            counts[:, place] += np.bincount(column, minlength=players_num)
+    return counts / samples
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Bayesian narrowing of players' ranges by their actions in a hand.
+"""
+
+import re
+from collections import namedtuple, Mapping, OrderedDict as odict
+from decimal import Decimal
+import numpy as np
+from .constants import Action
+from .handhistory import _PlayerAction
+from . import _eval
+
+
+__all__ = ['ActionModel', 'narrow_range', 'hand_history_ranges', 'STREETS']
+
+
+STREETS = ('preflop', 'flop', 'turn', 'river')
+
+_Decision = namedtuple('_Decision', 'street action weights')
+"""Named tuple for the posterior range (a 1326 long weight array) after an action."""
+
+# actions telling something about the player's holding
+_DECISIONS = frozenset([Action.FOLD, Action.CHECK, Action.CALL, Action.BET, Action.RAISE])
+
+
+class ActionModel(object):
+    """Likelihood of every action of a player depending on the strength of the combos: their
+    weighted percentile in the player's current range, from 0 (the worst) to 1 (the best).
+
+    Likelihoods are given at evenly spaced strengths from 0 to 1 for every action, between them
+    they are interpolated. The given ones replace the defaults, which assume linear ranges with
+    some bluffs and slowplays. Actions without likelihoods do not change the range.
+    Any callable with the same signature can be used as a model.
+    """
+
+    DEFAULTS = {
+        Action.FOLD: (1, 0.5, 0),
+        Action.CHECK: (1, 0.8, 0.3),
+        Action.CALL: (0.2, 1, 0.6),
+        Action.BET: (0.3, 0.2, 1),
+        Action.RAISE: (0.2, 0.1, 1),
+    }
+
+    def __init__(self, likelihoods=None):
+        self.likelihoods = dict(self.DEFAULTS)
+        if likelihoods:
+            self.likelihoods.update((Action(action), points)
+                                    for action, points in likelihoods.items())
+
+    def __call__(self, action, strengths):
+        """Likelihood of the :class:`poker.handhistory._PlayerAction` for every combo."""
+        points = self.likelihoods.get(action.action)
+        if points is None:
+            return np.ones(len(strengths))
+        return np.interp(strengths, np.linspace(0, 1, len(points)), points)
+
+
+def narrow_range(prior, streets, name, models=None, table=None, dead=None):
+    """Update the prior range of the named player after every one of their actions.
+
+    Streets are (board, actions) pairs from preflop (with an empty board) to the river with every
+    board card dealt until then and the :class:`poker.handhistory._PlayerAction` s of the street.
+    Every action multiplies the weights by its likelihood from the model (an
+    :class:`ActionModel` by default, or a dict of street names and models) and combos conflicting
+    with the board or dead cards are removed.
+    Postflop combos are ranked by their hand value on the board, preflop by their equity against
+    a random hand from the :class:`poker.preflop.PreflopTable`; preflop actions do not change the
+    range without a table.
+
+    Returns a list of the player's decisions with the posterior weights after each.
+    """
+    weights = _eval.to_weights(prior)
+    dead_mask = _eval.cards_to_mask(_eval.cards_to_array(dead)) if dead else 0
+    if models is None:
+        models = ActionModel()
+
+    decisions = []
+    for street, (board, actions) in zip(STREETS, streets):
+        board = _eval.cards_to_array(board) if board else np.empty(0, dtype=np.int8)
+        removed = (_eval.COMBO_MASKS & (dead_mask | _eval.cards_to_mask(board))) != 0
+        # a new array, decisions keep their weights
+        weights = np.where(removed, 0, weights)
+        model = models.get(street) if isinstance(models, Mapping) else models
+        values = _combo_values(board, table)
+
+        for action in actions or ():
+            if action.name != name or action.action not in _DECISIONS:
+                continue
+            if values is not None and model is not None:
+                weights = weights * model(action, _range_strengths(values, weights))
+            decisions.append(_Decision(street, action, weights))
+    return decisions
+
+
+def hand_history_ranges(hand_history, priors=None, models=None, table=None):
+    """Posterior ranges of every player but the hero at each of their decisions in a hand
+    history (see :func:`narrow_range`). Priors are one range for every player or a dict of
+    player names and ranges, any two cards by default. The hero's cards are dead.
+
+    Returns an OrderedDict of player names in the order of their first action and their
+    decisions.
+    """
+    if not hand_history.parsed:
+        hand_history.parse()
+    hero = getattr(hand_history, 'hero', None)
+    hero_name = hero.name if hero else None
+    dead = hero.combo if hero and hero.combo else None
+    dead = [dead.first, dead.second] if dead else None
+
+    streets = _hand_streets(hand_history)
+    names = []
+    for board, actions in streets:
+        names.extend(action.name for action in actions
+                     if action.name != hero_name and action.action in _DECISIONS and
+                     action.name not in names)
+
+    results = odict()
+    for name in names:
+        if priors is None:
+            prior = np.ones(1326)
+        elif isinstance(priors, Mapping):
+            prior = priors.get(name, np.ones(1326))
+        else:
+            prior = priors
+        results[name] = narrow_range(prior, streets, name, models, table, dead)
+    return results
+
+
+def _hand_streets(hand_history):
+    """(board, actions) pairs of every street, the flop has the room parser's actions, the
+    action lines of the other streets are parsed the same way."""
+    board = hand_history.board or ()
+    names = sorted((player.name for player in hand_history.players), key=len, reverse=True)
+    streets = [((), _parse_actions(hand_history.preflop_actions, names))]
+    if hand_history.flop:
+        streets.append((board[:3], hand_history.flop.actions or ()))
+    for street, cards_num in (('turn', 4), ('river', 5)):
+        if len(board) >= cards_num:
+            lines = getattr(hand_history, '%s_actions' % street, None)
+            streets.append((board[:cards_num], _parse_actions(lines, names)))
+    return streets
+
+
+def _parse_actions(lines, names):
+    """Actions of the players from action lines like ``'name: raises 40 to 60'`` or
+    ``'name raises to $1.25'``; other lines (dealt cards, uncalled bets) are skipped."""
+    actions = []
+    for line in lines or ():
+        name = next((name for name in names if line.startswith(name)), None)
+        if name is None:
+            continue
+        word, _, rest = line[len(name):].lstrip(': ').partition(' ')
+        try:
+            action = Action(word)
+        except ValueError:
+            continue
+        # the last number is the amount raised to
+        amounts = re.findall(r'\d+(?:\.\d+)?', rest)
+        actions.append(_PlayerAction(name, action, Decimal(amounts[-1]) if amounts else None))
+    return tuple(actions)
+
+
+def _combo_values(board, table):
+    """Value of every combo, the bigger the better, None if unknown."""
+    if len(board):
+        cards = np.empty((1326, 2 + len(board)), dtype=np.int8)
+        cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS, board
+        return _eval.evaluate(cards).astype(np.float64)
+    elif table is None:
+        return None
+    from .preflop import _hand_matchups
+    matchups = _hand_matchups()[2]
+    equities = (matchups * table.hands).sum(axis=1) / matchups.sum(axis=1)
+    return equities[_eval.COMBO_HANDS]
+
+
+def _range_strengths(values, weights):
+    """Weighted percentile of every combo's value in the range, ties count half."""
+    total = weights.sum()
+    if total == 0:
+        return np.full(len(values), 0.5)
+    order = np.argsort(values, kind='mergesort')
+    sorted_values = values[order]
+    cumulative = np.concatenate([[0], np.cumsum(weights[order])])
+    below = cumulative[np.searchsorted(sorted_values, values, 'left')]
+    upto = cumulative[np.searchsorted(sorted_values, values, 'right')]
+    return (below + (upto - below) / 2) / total
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Omaha and Omaha Hi/Lo all-in equity calculation.
+"""
+
+from collections import namedtuple, Mapping
+import numpy as np
+from .card import Card
+from .constants import Game
+from ._common import _make_random_state
+from . import _eval
+from .equity import _EquityResult, _CHUNK_SIZE, _draw_combos, _sample_runouts
+
+
+__all__ = ['omaha_equity']
+
+
+_HiLoResult = namedtuple('_HiLoResult', 'equity scoop high low')
+"""Named tuple for Omaha Hi/Lo results. ``high`` and ``low`` are the average shares of the high
+and low half of the pot (when nobody has a qualifying low, the high winners get the low half
+too), ``equity`` is the pot share ((high + low) / 2), ``scoop`` is the ratio of pots won whole.
+"""
+
+# the two hole cards and three board cards every Omaha hand is made of
+_HOLE_PAIRS = _eval.combinations(4, 2).astype(np.intp)
+_BOARD_TRIPLES = _eval.combinations(5, 3).astype(np.intp)
+
+# rank bits for lows: ace is the lowest, ranks above eight are all the same invalid bit
+_LOW_RANKS = np.where(np.arange(52) >> 2 == 12, 0, (np.arange(52) >> 2) + 1)
+_LOW_BITS = np.where(_LOW_RANKS <= 7, 1 << _LOW_RANKS, 1 << 8).astype(np.int32)
+_NO_LOW = 1 << 9
+
+
+def omaha_equity(players, board=None, game=Game.OMAHA, samples=None, random_state=None,
+                 dead=None):
+    """Calculate the all-in equity of 2-10 Omaha players.
+
+    Every player can have a hand (four Cards or a string like ``'AsKsQhJh'``), a range:
+    a list of hands or a dict of hands and weights, or None for a random hand.
+    If every player has one hand and samples is None, every runout is enumerated (that takes
+    long preflop), otherwise samples number of random deals are evaluated.
+    Returns an _EquityResult (Omaha) or a _HiLoResult (Omaha Hi/Lo) for every player.
+    """
+    game = Game(game)
+    if game not in (Game.OMAHA, Game.OHILO):
+        raise ValueError('Only Omaha and Omaha Hi/Lo are supported, not %s' % game)
+    if not 2 <= len(players) <= 10:
+        raise ValueError('Only 2-10 players are supported, not %d' % len(players))
+
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    known_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    holdings = [_to_hands(player, known_mask) for player in players]
+
+    if samples is None:
+        if any(holding is None or len(holding[0]) != 1 for holding in holdings):
+            raise ValueError('Exact Omaha equity needs one hand for every player, '
+                             'use samples for ranges.')
+        hands = np.array([holding[0][0] for holding in holdings])
+        hands_mask = _eval.cards_to_mask(hands.ravel())
+        if bin(hands_mask).count('1') != 4 * len(players):
+            raise ValueError('There are no possible matchups between the holdings!')
+        used_mask = hands_mask | known_mask
+        deck = np.array([card for card in range(52) if not (used_mask >> card) & 1],
+                        dtype=np.int8)
+        runouts = deck[_eval.combinations(len(deck), 5 - len(board))]
+        deals = np.broadcast_to(hands, (len(runouts),) + hands.shape)
+        importance = np.ones(len(runouts))
+    else:
+        random_state = _make_random_state(random_state)
+        deals, importance = _sample_deals(holdings, known_mask, samples, random_state)
+        deal_masks = np.bitwise_or.reduce(np.int64(1) << deals.reshape(len(deals), -1)
+                                          .astype(np.int64), axis=1)
+        runouts = _sample_runouts(board, deal_masks | known_mask, random_state)
+
+    players_num = len(players)
+    shares, wins, ties = np.zeros(players_num), np.zeros(players_num), np.zeros(players_num)
+    highs, lows = np.zeros(players_num), np.zeros(players_num)
+    chunk_size = max(1, _CHUNK_SIZE // (players_num * 60 * 5))
+    for start in range(0, len(runouts), chunk_size):
+        chunk_deals = deals[start:start + chunk_size]
+        chunk_importance = importance[start:start + chunk_size, np.newaxis]
+        boards = np.empty((len(chunk_deals), 5), dtype=np.int8)
+        boards[:, :len(board)] = board
+        boards[:, len(board):] = runouts[start:start + chunk_size]
+
+        high_values = _evaluate_high(chunk_deals, boards)
+        high_winners = high_values == high_values.max(axis=1)[:, np.newaxis]
+        high_shares = high_winners / high_winners.sum(axis=1)[:, np.newaxis]
+
+        if game == Game.OMAHA:
+            pot_shares = high_shares
+            winners_num = high_winners.sum(axis=1)[:, np.newaxis]
+            wins += ((high_winners & (winners_num == 1)) * chunk_importance).sum(axis=0)
+            ties += ((high_winners & (winners_num > 1)) * chunk_importance).sum(axis=0)
+        else:
+            low_values = _evaluate_low(chunk_deals, boards)
+            best_lows = low_values.min(axis=1)[:, np.newaxis]
+            has_low = best_lows != _NO_LOW
+            low_winners = (low_values == best_lows) & has_low
+            low_winners_num = np.maximum(low_winners.sum(axis=1), 1)[:, np.newaxis]
+            low_shares = np.where(has_low, low_winners / low_winners_num, high_shares)
+            pot_shares = (high_shares + low_shares) / 2
+            highs += (high_shares * chunk_importance).sum(axis=0)
+            lows += (low_shares * chunk_importance).sum(axis=0)
+            wins += ((pot_shares == 1) * chunk_importance).sum(axis=0)
+
+        shares += (pot_shares * chunk_importance).sum(axis=0)
+
+    total = importance.sum()
+    if game == Game.OMAHA:
+        return [_EquityResult(share / total, win / total, tie / total)
+                for share, win, tie in zip(shares, wins, ties)]
+    return [_HiLoResult(share / total, scoop / total, high / total, low / total)
+            for share, scoop, high, low in zip(shares, wins, highs, lows)]
+
+
+def _to_hands(holding, known_mask):
+    """Convert a player's holding to an array of hands (card indexes), their weights and card
+    masks, without hands containing known cards. None stays None (random hand)."""
+    if holding is None:
+        return None
+
+    if isinstance(holding, Mapping):
+        hands, weights = list(holding.keys()), list(holding.values())
+    elif isinstance(holding, basestring) or _is_hand(holding):
+        hands, weights = [holding], [1]
+    else:
+        hands = list(holding)
+        weights = [1] * len(hands)
+
+    hands = np.array([_to_hand(hand) for hand in hands], dtype=np.int8).reshape(-1, 4)
+    weights = np.array(weights, dtype=np.float64)
+    masks = np.bitwise_or.reduce(np.int64(1) << hands.astype(np.int64), axis=1)
+
+    valid = ((masks & known_mask) == 0) & (weights > 0)
+    if not valid.any():
+        raise ValueError('Every hand of a player is conflicting with the board or dead cards!')
+    return hands[valid], weights[valid], masks[valid]
+
+
+def _is_hand(holding):
+    """Whether holding is one hand as an iterable of four Cards or card strings."""
+    try:
+        return len(holding) == 4 and all(isinstance(card, Card) or len(card) == 2
+                                         for card in holding)
+    except TypeError:
+        return False
+
+
+def _to_hand(hand):
+    if isinstance(hand, basestring):
+        hand = hand.replace(' ', '')
+        hand = [hand[ind:ind + 2] for ind in range(0, len(hand), 2)]
+    hand = [_eval.card_index(card) for card in hand]
+    if len(hand) != 4 or len(set(hand)) != 4:
+        raise ValueError('An Omaha hand should have 4 different cards, not %r' % (hand,))
+    return hand
+
+
+def _sample_deals(holdings, known_mask, samples, random_state):
+    """Draw samples number of non-conflicting deals of hands for every player.
+
+    Players with one hand are dealt first, then players with ranges: their hands are drawn by
+    weight from the ones not conflicting with the cards dealt before and the deal gets an
+    importance weight of the ratio of possible hand weights (like for Hold'em multiway deals).
+    Random hands are dealt last from the rest of the deck; all of them are equally likely in
+    every deal, so they don't need importance weights.
+
+    Returns the card indexes of the deals in the shape of (deals, players, 4) and the importance
+    weights of the deals.
+    """
+    deals = np.zeros((samples, len(holdings), 4), dtype=np.int8)
+    masks = np.full(samples, known_mask, dtype=np.int64)
+    importance = np.ones(samples)
+
+    specified = [player for player, holding in enumerate(holdings) if holding is not None]
+    for player in sorted(specified, key=lambda player: len(holdings[player][0])):
+        hands, weights, hand_masks = holdings[player]
+        possible_weights = np.zeros(samples)
+        chunk_size = max(1, _CHUNK_SIZE // len(hands))
+        for start in range(0, samples, chunk_size):
+            chunk_masks = masks[start:start + chunk_size, np.newaxis]
+            possible = (chunk_masks & hand_masks[np.newaxis, :]) == 0
+            possible_weights[start:start + chunk_size] = possible.dot(weights)
+        importance *= possible_weights / weights.sum()
+
+        rows = np.flatnonzero(importance > 0)
+        drawn = _draw_combos(weights, masks[rows], random_state, combo_masks=hand_masks)
+        deals[rows, player] = hands[drawn]
+        masks[rows] |= hand_masks[drawn]
+
+    randoms = [player for player, holding in enumerate(holdings) if holding is None]
+    if randoms:
+        priorities = random_state.random_sample((samples, 52))
+        used = (masks[:, np.newaxis] >> np.arange(52, dtype=np.int64)) & 1
+        priorities[used.astype(bool)] = np.inf
+        cards = np.argsort(priorities, axis=1)[:, :4 * len(randoms)]
+        deals[:, randoms] = cards.reshape(samples, len(randoms), 4)
+
+    dealt = importance > 0
+    if not dealt.any():
+        raise ValueError('Could not deal non-conflicting hands for the players!')
+    return deals[dealt], importance[dealt]
+
+
+def _evaluate_high(hands, boards):
+    """Best high hand value of every player made of exactly two hole cards and three board
+    cards. Hands are in the shape of (deals, players, 4), boards (deals, 5)."""
+    deals_num, players_num = hands.shape[:2]
+    cards = np.empty((deals_num, players_num, 6, 10, 5), dtype=np.int8)
+    cards[..., :2] = hands[:, :, _HOLE_PAIRS][:, :, :, np.newaxis, :]
+    cards[..., 2:] = boards[:, _BOARD_TRIPLES][:, np.newaxis, np.newaxis, :, :]
+    return _eval.evaluate(cards).reshape(deals_num, players_num, 60).max(axis=2)
+
+
+def _evaluate_low(hands, boards):
+    """Best eight or better low of every player as a rank mask (the smaller the better),
+    _NO_LOW for players without a qualifying low."""
+    deals_num, players_num = hands.shape[:2]
+    hole_bits = np.bitwise_or.reduce(_LOW_BITS[hands[:, :, _HOLE_PAIRS]], axis=3)
+    board_bits = np.bitwise_or.reduce(_LOW_BITS[boards[:, _BOARD_TRIPLES]], axis=2)
+    lows = hole_bits[:, :, :, np.newaxis] | board_bits[:, np.newaxis, np.newaxis, :]
+    # five different low ranks, no pairs and no card above eight
+    qualifying = (lows < (1 << 8)) & (_eval._POPCOUNT[lows] == 5)
+    lows = np.where(qualifying, lows, _NO_LOW)
+    return lows.reshape(deals_num, players_num, 60).min(axis=2)
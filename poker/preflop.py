@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Precomputed preflop all-in equity tables.
+"""
+
+from pathlib import Path
+import numpy as np
+from . import _eval
+from ._common import _spawn_random_states, _parallel_map
+from .equity import _showdown
+
+
+__all__ = ['PreflopTable']
+
+
+# made on the first use of _hand_matchups, not when the module is imported
+_hand_matchups_cache = None
+
+
+def _hand_matchups():
+    """Non-conflicting combo pairs (1326x1326), the Hand of every combo as a 1326x169 matrix
+    and the number of non-conflicting combo pairs of every Hand pair (169x169)."""
+    global _hand_matchups_cache
+    if _hand_matchups_cache is None:
+        possible = ~_eval.conflicts(np.arange(1326), np.arange(1326))
+        hand_combos = np.zeros((1326, 169))
+        hand_combos[np.arange(1326), _eval.COMBO_HANDS] = 1
+        matchups = hand_combos.T.dot(possible).dot(hand_combos)
+        _hand_matchups_cache = possible, hand_combos, matchups
+    return _hand_matchups_cache
+
+
+class PreflopTable(object):
+    """Preflop all-in equities between every pair of Combos (1326x1326) and every pair of
+    Hands (169x169), stored as uint16 fixed point numbers.
+
+    Tables loaded from a directory are memory-mapped, so only the looked up parts are read.
+    Conflicting combo pairs (sharing a card) have an equity of 0 in the combo table.
+    """
+
+    combos_filename = 'preflop_combos.npy'
+    hands_filename = 'preflop_hands.npy'
+    scale = 65535
+
+    def __init__(self, combos, hands=None):
+        self.combos = combos
+        self.hands = hands if hands is not None else self._make_hands_table(combos)
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map previously saved tables from the directory."""
+        directory = Path(directory)
+        combos = np.load(unicode(directory / cls.combos_filename), mmap_mode='r')
+        hands = np.load(unicode(directory / cls.hands_filename), mmap_mode='r')
+        return cls(combos, hands)
+
+    def save(self, directory):
+        directory = Path(directory)
+        np.save(unicode(directory / self.combos_filename), np.asarray(self.combos))
+        np.save(unicode(directory / self.hands_filename), np.asarray(self.hands))
+
+    @classmethod
+    def generate(cls, samples=None, processes=1, random_state=None):
+        """Calculate the tables. Without samples every board is enumerated for every matchup
+        which is exact, but takes very long (run it with as many processes as you can),
+        otherwise every matchup is estimated from the given number of random boards.
+        With an int random_state the tables are the same for any number of processes.
+
+        Only one matchup is calculated from every suit isomorphic group, e.g. for
+        AsKs vs QhQd and AhKh vs QsQc only one of them.
+        """
+        first, second, keys, reverse = _get_canonical_pairs()
+        pairs = np.unique(keys)
+
+        # fixed number of chunks, so every chunk has the same random stream on every run
+        chunks = np.array_split(pairs, 256)
+        random_states = _spawn_random_states(random_state, len(chunks))
+        arguments = [(chunk, samples, chunk_random_state)
+                     for chunk, chunk_random_state in zip(chunks, random_states)]
+        results = _parallel_map(_calculate_pairs, arguments, processes)
+        equities = np.concatenate(results)[pairs.searchsorted(keys)]
+
+        combos = np.zeros((1326, 1326), dtype=np.uint16)
+        combos[first, second] = np.where(reverse, cls.scale - equities, equities)
+        combos[second, first] = cls.scale - combos[first, second]
+        return cls(combos)
+
+    def combo_equity(self, hero, villain):
+        """Equity of hero Combo against villain Combo."""
+        hero, villain = _eval.combo_index(hero), _eval.combo_index(villain)
+        if _eval.conflicts([hero], [villain])[0, 0]:
+            raise ValueError('Combos are conflicting (sharing a card)!')
+        return self.combos[hero, villain] / self.scale
+
+    def hand_equity(self, hero, villain):
+        """Equity of hero Hand against villain Hand, every possible combo matchup weighted
+        equally."""
+        return self.hands[_eval.hand_index(hero), _eval.hand_index(villain)] / self.scale
+
+    def range_equity(self, hero, villain):
+        """Equity of hero against villain, both can be anything :func:`poker.equity.equity`
+        accepts. Calculated as the weighted sum of every possible combo matchup.
+        """
+        hero_weights, villain_weights = _eval.to_weights(hero), _eval.to_weights(villain)
+        hero_indexes = np.flatnonzero(hero_weights)
+        villain_indexes = np.flatnonzero(villain_weights)
+
+        weights = np.outer(hero_weights[hero_indexes], villain_weights[villain_indexes])
+        weights[_eval.conflicts(hero_indexes, villain_indexes)] = 0
+        total = weights.sum()
+        if total == 0:
+            raise ValueError('There are no possible matchups between the two holdings!')
+
+        equities = self.combos[np.ix_(hero_indexes, villain_indexes)] / self.scale
+        return (equities * weights).sum() / total
+
+    def _make_hands_table(self, combos):
+        possible, hand_combos, matchups = _hand_matchups()
+        equities = np.where(possible, np.asarray(combos) / self.scale, 0)
+        equity_sums = hand_combos.T.dot(equities).dot(hand_combos)
+        return np.round(equity_sums / matchups * self.scale).astype(np.uint16)
+
+
+def _get_canonical_pairs():
+    """Find suit isomorphic representatives of every non-conflicting combo pair.
+
+    Returns first and second combo indexes of every pair (first < second), the representative
+    of every pair encoded as ``first * 1326 + second`` and whether the representative has
+    the two combos in reversed order.
+    """
+    first, second = np.triu_indices(1326, 1)
+    possible = (_eval.COMBO_MASKS[first] & _eval.COMBO_MASKS[second]) == 0
+    first, second = first[possible], second[possible]
+
+    permuted_first = _eval.PERMUTED_COMBOS[:, first].astype(np.int64)
+    permuted_second = _eval.PERMUTED_COMBOS[:, second].astype(np.int64)
+    in_order = (permuted_first * 1326 + permuted_second).min(axis=0)
+    reversed_ = (permuted_second * 1326 + permuted_first).min(axis=0)
+
+    keys = np.minimum(in_order, reversed_)
+    return first, second, keys, reversed_ < in_order
+
+
+def _calculate_pairs(argument):
+    """Equities of the encoded combo pairs as fixed point numbers."""
+    pairs, samples, random_state = argument
+    equities = np.empty(len(pairs), dtype=np.uint16)
+    board = _eval.cards_to_array(None)
+    for ind, (hero, villain) in enumerate(zip(*np.divmod(pairs, 1326))):
+        hero_weights, villain_weights = np.zeros(1326), np.zeros(1326)
+        hero_weights[hero] = villain_weights[villain] = 1
+        win, tie, total = _showdown(hero_weights, villain_weights, board, samples, random_state)
+        equity = (win.sum() + tie.sum() / 2) / total.sum()
+        equities[ind] = round(equity * PreflopTable.scale)
+    return equities
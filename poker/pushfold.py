@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Push/fold Nash equilibrium solver writing .strategy files.
+"""
+
+import re
+from collections import namedtuple, Mapping, OrderedDict as odict
+import numpy as np
+from .hand import Range
+from .icm import icm
+from .equity import hand_grid
+from .preflop import _hand_matchups
+from . import _eval
+
+
+__all__ = ['PushFoldSolution', 'solve_push_fold', 'push_fold_strategy', 'evaluate_strategy',
+           'POSITIONS']
+
+
+# strategy file positions in preflop order, tables with fewer players use the last ones
+POSITIONS = ('utg', 'utg1', 'utg2', 'utg3', 'utg4', 'co', 'btn', 'sb', 'bb')
+
+# number of combos of every hand
+_HAND_COMBOS = np.bincount(_eval.COMBO_HANDS, minlength=169).astype(np.float64)
+_HAND_PRIOR = _HAND_COMBOS / 1326
+
+
+class PushFoldSolution(object):
+    """Push/fold equilibrium of a preflop situation.
+
+    ``positions``
+        strategy file position names of the players in preflop order.
+    ``push``
+        OrderedDict of positions (without the big blind) and the probability of pushing every
+        Hand (in the order of :class:`poker.hand.Hand`) when everybody folded before.
+    ``call``
+        OrderedDict of (pusher, caller) position pairs and the probability of calling the
+        pusher's all-in with every Hand when everybody folded between them.
+    ``ev``
+        OrderedDict of positions and their expected chips (or prize with payouts) of the hand.
+    """
+
+    def __init__(self, positions, push, call, ev):
+        self.positions = positions
+        self.push = push
+        self.call = call
+        self.ev = ev
+
+    def push_range(self, position):
+        """Range of Hands pushed at least half the time."""
+        return _to_range(self.push[position])
+
+    def call_range(self, pusher, caller):
+        """Range of Hands calling the pusher's all-in at least half the time."""
+        return _to_range(self.call[pusher, caller])
+
+
+def solve_push_fold(table, stacks, sb=0.5, bb=1, ante=0, payouts=None, iterations=1000,
+                    tolerance=1e-5):
+    """Calculate the push/fold equilibrium between 2-9 players by (weighted) fictitious play.
+
+    Every player either folds or pushes all-in when first in, and calls or folds against an
+    all-in; after a call everybody else folds. Hand equities come from the hand table of a
+    :class:`poker.preflop.PreflopTable`, card removal is only considered between the players in
+    a showdown.
+    Stacks are in preflop order (the last two are the blinds) before posting antes and blinds.
+    Without payouts chip EV is maximized, otherwise prize equity by :func:`poker.icm.icm` with
+    the players at the table as the whole field.
+    Iterates until no player can win more than tolerance times the chips (or prizes) in play by
+    deviating or for iterations number of times.
+    """
+    stacks = np.array(stacks, dtype=np.float64)
+    if not 2 <= len(stacks) <= len(POSITIONS):
+        raise ValueError('Only 2-%d players are supported, not %d'
+                         % (len(POSITIONS), len(stacks)))
+    if (stacks <= 0).any():
+        raise ValueError('Every stack should be positive!')
+
+    game = _PushFoldGame(table, stacks, sb, bb, ante, payouts)
+    players_num = len(stacks)
+    push = np.full((players_num - 1, 169), 0.5)
+    call = np.full((players_num, players_num, 169), 0.5)
+    scale = stacks.sum() if payouts is None else np.sum(payouts)
+    for iteration in range(iterations):
+        evs = game.action_evs(push, call)
+        push_best, call_best, regret = game.best_responses(push, call, *evs)
+        if regret < tolerance * scale:
+            break
+        # weighted fictitious play: later best responses count more, which converges much
+        # faster than the plain average
+        step = 3 / (iteration + 3)
+        push += (push_best - push) * step
+        call += (call_best - call) * step
+
+    ev = game.values(push, call)
+    positions = POSITIONS[-players_num:]
+    push = odict((position, push[player]) for player, position in enumerate(positions[:-1]))
+    call = odict(((positions[pusher], positions[caller]), call[pusher, caller])
+                 for pusher in range(players_num - 1)
+                 for caller in range(pusher + 1, players_num))
+    return PushFoldSolution(positions, push, call, odict(zip(positions, ev)))
+
+
+def push_fold_strategy(solutions, name='Preflop PUSH', calls=False):
+    """Text of a .strategy file from an OrderedDict of situation names (like ``'10 BB'``) and
+    :class:`PushFoldSolution` s, which can be loaded with :class:`poker.strategy.Strategy`.
+
+    Every situation has the push ranges of the positions; with calls, situations of the calling
+    ranges against every position's push are added after them (named like ``'10 BB vs CO'``).
+    """
+    lines = ['[strategy]', 'name = %s' % name, 'inaction = PUSH', 'outaction = FOLD', '']
+    for situation, solution in solutions.items():
+        lines.append('[%s]' % situation)
+        lines.extend(_range_line(position, solution.push_range(position))
+                     for position in solution.positions[:-1])
+        lines.append('')
+        if not calls:
+            continue
+        for pusher in solution.positions[:-1]:
+            lines.extend(['[%s vs %s]' % (situation, pusher.upper()), 'inaction = CALL'])
+            lines.extend(_range_line(caller, solution.call_range(pusher, caller))
+                         for pusher_, caller in solution.call if pusher_ == pusher)
+            lines.append('')
+    return '\n'.join(lines)
+
+
+_PositionEV = namedtuple('_PositionEV', 'grid gain ev')
+
+
+def evaluate_strategy(table, strategy, calls=None, stacks=None, sb=0.5, bb=1, ante=0,
+                      payouts=None):
+    """Evaluate the push ranges of every situation of a :class:`poker.strategy.Strategy`
+    against calling ranges, in the same model as :func:`solve_push_fold`.
+
+    The players are the positions from the first one with a range to the big blind. Calling
+    ranges are either one range for every caller, a dict of caller positions and ranges or
+    without them the ``'<situation> vs <PUSHER>'`` situations of the strategy (see
+    :func:`push_fold_strategy`). Stacks are the same for every situation, either one depth for
+    every player or one per player; without them every player has the depth at the start of the
+    situation name (like ``'10 BB'``).
+
+    Returns an OrderedDict of push situation names and OrderedDicts of first in positions and
+    their results: ``grid`` is the EV gain of pushing every hand instead of folding
+    (see :func:`poker.equity.hand_grid`), ``gain`` is the average of it over the combos of the
+    position's range and ``ev`` is the position's expected chips (or prize with payouts)
+    of the hand.
+    """
+    results = odict()
+    for name, situation in strategy.items():
+        if situation.inaction == 'CALL':
+            continue
+        ranges = [getattr(situation, position) for position in POSITIONS]
+        first = next((index for index, pushed in enumerate(ranges) if pushed is not None), None)
+        if first is None:
+            continue
+        positions = POSITIONS[first:]
+        players_num = len(positions)
+        if players_num < 2:
+            raise ValueError('There should be at least 2 players in situation %r' % name)
+
+        game = _PushFoldGame(table, _situation_stacks(name, stacks, players_num), sb, bb, ante,
+                             payouts)
+        push = np.array([_to_probabilities(pushed) for pushed in ranges[first:-1]])
+        call = np.zeros((players_num, players_num, 169))
+        for pusher in range(players_num - 1):
+            for caller in range(pusher + 1, players_num):
+                call[pusher, caller] = _to_probabilities(
+                    _call_range(strategy, name, calls, positions[pusher], positions[caller]))
+
+        push_evs = game.action_evs(push, call)[0]
+        gains = push_evs[1] - push_evs[0]
+        ev = game.values(push, call)
+        results[name] = odict()
+        for player, position in enumerate(positions[:-1]):
+            weights = _HAND_COMBOS * push[player]
+            gain = weights.dot(gains[player]) / weights.sum() if weights.any() else 0.
+            grid = hand_grid(odict(zip(_eval.HANDS, gains[player])))
+            results[name][position] = _PositionEV(grid, gain, ev[player])
+    return results
+
+
+def _situation_depth(name):
+    """Stack depth at the start of a situation name like ``'10 BB'``."""
+    match = re.match(r'\s*(\d+(?:\.\d+)?)', name)
+    if match is None:
+        raise ValueError('No stack depth in situation name %r!' % name)
+    return float(match.group(1))
+
+
+def _situation_stacks(name, stacks, players_num):
+    if stacks is None:
+        stacks = _situation_depth(name)
+    stacks = np.array(np.broadcast_to(np.asarray(stacks, dtype=np.float64), players_num))
+    if (stacks <= 0).any():
+        raise ValueError('Every stack should be positive!')
+    return stacks
+
+
+def _call_range(strategy, name, calls, pusher, caller):
+    if calls is None:
+        situation = strategy.get('%s vs %s' % (name, pusher.upper()))
+        return None if situation is None else getattr(situation, caller)
+    elif isinstance(calls, Mapping):
+        return calls.get(caller)
+    return calls
+
+
+def _to_probabilities(range):
+    """Part of the combos of every Hand in the range."""
+    if range is None:
+        return np.zeros(169)
+    weights = _eval.to_weights(range)
+    return np.bincount(_eval.COMBO_HANDS, weights=weights, minlength=169) / _HAND_COMBOS
+
+
+def _range_line(position, range):
+    return '%s = %s' % (position.upper(), ' '.join(range.rep_pieces))
+
+
+def _to_range(probabilities):
+    return Range.from_objects(_eval.HANDS[hand] for hand in np.flatnonzero(probabilities >= 0.5))
+
+
+class _PushFoldGame(object):
+    """Payoffs of every outcome of a push/fold hand and the EV of every action against given
+    strategies. Strategies are arrays of probabilities of pushing (pusher, hand) and calling
+    (pusher, caller, hand), values are arrays of every player's payoff."""
+
+    def __init__(self, table, stacks, sb, bb, ante, payouts):
+        self.players_num = players_num = len(stacks)
+        hand_equities = np.asarray(table.hands) / table.scale
+        self.matchups = _hand_matchups()[2]
+        self.equity_matchups = self.matchups * hand_equities
+        # number of villain combos not conflicting with every hand
+        self.possible = _HAND_COMBOS * 1225
+
+        posted = np.minimum(stacks, ante)
+        posted[-2:] += np.minimum(stacks[-2:] - posted[-2:], [sb, bb])
+        start = stacks - posted
+        payoff = self._get_payoff(payouts)
+
+        # the pusher winning every pot uncalled, the last one is the big blind's walk
+        self.steal = np.empty((players_num, players_num))
+        # the first player winning the all-in against the second one
+        self.showdown = np.zeros((players_num, players_num, players_num))
+        for player in range(players_num):
+            final = start.copy()
+            final[player] += posted.sum()
+            self.steal[player] = payoff(final)
+            for other in range(players_num):
+                if other == player:
+                    continue
+                final = start.copy()
+                risked = min(stacks[player], stacks[other])
+                final[player] += posted.sum() + risked - posted[other]
+                final[other] -= risked - posted[other]
+                self.showdown[player, other] = payoff(final)
+
+    @staticmethod
+    def _get_payoff(payouts):
+        if payouts is None:
+            return lambda final: final
+
+        payouts = np.array(payouts, dtype=np.float64)
+
+        def payoff(final):
+            alive = final > 0
+            values = np.zeros(len(final))
+            values[alive] = icm(final[alive], payouts)
+            # a busted player finishes below everybody still in
+            if (~alive).any() and alive.sum() < len(payouts):
+                values[~alive] = payouts[alive.sum()]
+            return values
+        return payoff
+
+    def _pushed_values(self, pusher, call):
+        """Payoffs after the pusher's all-in for every pusher hand, starting from every caller
+        (callers before them folded) in the shape of (players + 1, hands, players), the
+        probability of nobody calling before every caller and the equity against every caller.
+        """
+        players_num = self.players_num
+        called = (self.matchups.dot(call[pusher].T) / self.possible[:, np.newaxis]).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            equities = (self.equity_matchups.dot(call[pusher].T) /
+                        self.matchups.dot(call[pusher].T)).T
+        equities = np.nan_to_num(equities)
+
+        values = np.zeros((players_num + 1, 169, players_num))
+        values[players_num] = self.steal[pusher]
+        for caller in range(players_num - 1, pusher, -1):
+            showdown = (equities[caller, :, np.newaxis] * self.showdown[pusher, caller] +
+                        (1 - equities[caller, :, np.newaxis]) * self.showdown[caller, pusher])
+            values[caller] = (called[caller, :, np.newaxis] * showdown +
+                              (1 - called[caller, :, np.newaxis]) * values[caller + 1])
+        reach = np.ones((players_num, 169))
+        for caller in range(pusher + 2, players_num):
+            reach[caller] = reach[caller - 1] * (1 - called[caller - 1])
+        return values, reach
+
+    def values(self, push, call):
+        """Every player's payoff with the strategies from every first in position, the
+        first one is the value of the whole hand."""
+        folded = self.steal[-1]
+        for pusher in range(self.players_num - 2, -1, -1):
+            pushed = self._pushed_values(pusher, call)[0][pusher + 1]
+            weights = _HAND_PRIOR * push[pusher]
+            folded = weights.dot(pushed) + (1 - weights.sum()) * folded
+        return folded
+
+    def action_evs(self, push, call):
+        """EV of pushing and folding for every first in player and EV of calling and folding
+        against every pusher for every caller, (fold, push) pairs in the shape of
+        (2, pushers, hands) and (fold, call) pairs in the shape of (2, players, players, hands),
+        and the probability of getting to every push and call decision.
+        """
+        players_num = self.players_num
+        push_evs = np.zeros((2, players_num - 1, 169))
+        call_evs = np.zeros((2, players_num, players_num, 169))
+        call_reach = np.zeros((players_num, players_num))
+        folded = self.steal[-1]
+        for pusher in range(players_num - 2, -1, -1):
+            values, reach = self._pushed_values(pusher, call)
+            push_evs[0, pusher] = folded[pusher]
+            push_evs[1, pusher] = values[pusher + 1, :, pusher]
+            weights = _HAND_PRIOR * push[pusher]
+            folded = weights.dot(values[pusher + 1]) + (1 - weights.sum()) * folded
+
+            # pusher hands weighted by pushing and nobody calling before every caller
+            callers = np.arange(pusher + 1, players_num)
+            pusher_weights = push[pusher] * reach[callers]
+            call_reach[pusher, callers] = pusher_weights.dot(_HAND_PRIOR)
+            matchups = self.matchups.dot(pusher_weights.T).T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                equities = self.equity_matchups.dot(pusher_weights.T).T / matchups
+                folded_values = pusher_weights * values[callers + 1, :, callers]
+                fold_evs = self.matchups.dot(folded_values.T).T / matchups
+            win = self.showdown[callers, pusher, callers][:, np.newaxis]
+            lose = self.showdown[pusher, callers, callers][:, np.newaxis]
+            call_evs[0, pusher, callers] = np.nan_to_num(fold_evs)
+            call_evs[1, pusher, callers] = np.nan_to_num(equities * win + (1 - equities) * lose)
+
+        push_reach = np.cumprod(np.concatenate([[1], 1 - push.dot(_HAND_PRIOR)]))[:-1]
+        call_reach[:-1] *= push_reach[:, np.newaxis]
+        return push_evs, call_evs, push_reach, call_reach
+
+    def best_responses(self, push, call, push_evs, call_evs, push_reach, call_reach):
+        """Best response strategies and the biggest EV gain of a player by playing them
+        instead of the given strategies."""
+        push_best = (push_evs[1] > push_evs[0]).astype(np.float64)
+        call_best = (call_evs[1] > call_evs[0]).astype(np.float64)
+        push_regret = (np.maximum(*push_evs) - (push * push_evs[1] + (1 - push) * push_evs[0]))
+        call_regret = (np.maximum(*call_evs) - (call * call_evs[1] + (1 - call) * call_evs[0]))
+        regrets = (call_regret.dot(_HAND_PRIOR) * call_reach).sum(axis=0)
+        regrets[:-1] += push_regret.dot(_HAND_PRIOR) * push_reach
+        return push_best, call_best, regrets.max()
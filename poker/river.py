@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    River subgame solver by counterfactual regret minimization.
+"""
+
+from collections import OrderedDict as odict
+import numpy as np
+from . import _eval
+
+
+__all__ = ['RiverSolution', 'RiverNode', 'solve_river']
+
+
+class RiverNode(object):
+    """Node of the river bet tree.
+
+    ``player``
+        0 (out of position) or 1 (in position) acting in the node, None for terminal nodes.
+    ``children``
+        OrderedDict of actions (like ``'check'``, ``'bet 50'``, ``'raise 150'``, ``'call'``,
+        ``'fold'``, the amounts are what the player put in the pot on the river) and nodes.
+    ``contributions``
+        chips put in the pot by the players on the river before the node.
+    ``strategy``
+        (actions, 1326) array of the acting player's average strategy of every combo.
+    ``ev``
+        (2, 1326) array of the expected chips of every combo of both players reaching the node
+        (the starting pot counts as won chips), NaN for combos not in the ranges.
+    """
+
+    def __init__(self, player, contributions, raises=0, folded=None):
+        self.player = player
+        self.contributions = contributions
+        self.raises = raises
+        self.folded = folded
+        self.children = odict()
+        self.strategy = self.ev = None
+
+    @property
+    def actions(self):
+        return tuple(self.children)
+
+    @property
+    def is_terminal(self):
+        return self.player is None
+
+
+class RiverSolution(object):
+    """Strategies and EVs of a river spot solved by :func:`solve_river`.
+
+    Nodes are found by the actions leading to them from the root, like
+    ``solution.node('check', 'bet 50')``. Weight arrays are 1326 long like every equity
+    function accepts them, so weighted ranges can be analyzed further.
+    """
+
+    def __init__(self, root, weights, pot, exploitability):
+        self.root = root
+        self.weights = weights
+        self.pot = pot
+        self.exploitability = exploitability
+
+    @property
+    def ev(self):
+        """(2, 1326) array of the EV of every combo of both players."""
+        return self.root.ev
+
+    def node(self, *actions):
+        node = self.root
+        for action in actions:
+            node = node.children[action]
+        return node
+
+    def ranges(self, *actions):
+        """Weighted ranges of both players reaching the node after the actions."""
+        weights = self.weights.copy()
+        node = self.root
+        for action in actions:
+            weights[node.player] *= node.strategy[node.actions.index(action)]
+            node = node.children[action]
+        return weights
+
+    def strategy(self, *actions):
+        """OrderedDict of the actions of the node after the given actions and the weighted
+        ranges of the acting player taking them."""
+        node = self.node(*actions)
+        weights = self.ranges(*actions)[node.player]
+        return odict((action, weights * strategy)
+                     for action, strategy in zip(node.actions, node.strategy))
+
+
+def solve_river(oop, ip, board, pot, stack, bet_sizes=(0.5, 1), raise_sizes=(1,), max_raises=2,
+                allin=True, iterations=1000, tolerance=0.001, dead=None):
+    """Solve a river spot between the out of position (oop) and in position (ip) player's
+    ranges (anything :func:`poker.equity.equity` accepts, weight arrays too) by CFR+.
+
+    Bets are bet_sizes fractions of the pot, raises raise_sizes fractions of the pot after
+    calling, at most max_raises times; sizes are capped at the effective stack and all-in is
+    always possible with allin. Iterates until the exploitability (checked every 50 iterations)
+    is less than tolerance times the pot or iterations number of times.
+    Returns a :class:`RiverSolution`.
+    """
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    if len(board) != 5:
+        raise ValueError('River solving needs 5 board cards, not %d' % len(board))
+    known_mask = _eval.cards_to_mask(board) | _eval.cards_to_mask(dead)
+    weights = np.array([_eval.to_weights(oop), _eval.to_weights(ip)])
+    weights[:, (_eval.COMBO_MASKS & known_mask) != 0] = 0
+    indexes = [np.flatnonzero(player_weights) for player_weights in weights]
+    if not all(len(player_indexes) for player_indexes in indexes):
+        raise ValueError('Every combo of a range is conflicting with the board or dead cards!')
+
+    cards = np.empty((1326, 7), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS, board
+    values = _eval.evaluate(cards)
+    matchups = [_Matchups(indexes[0], values[indexes[0]], indexes[1], values[indexes[1]]),
+                _Matchups(indexes[1], values[indexes[1]], indexes[0], values[indexes[0]])]
+    if not matchups[0].compare(weights[1, indexes[1]])[2].dot(weights[0, indexes[0]]):
+        raise ValueError('There are no possible matchups between the two ranges!')
+
+    root = _build_tree(pot, stack, bet_sizes, raise_sizes, max_raises, allin)
+    solver = _Solver(root, [weights[0, indexes[0]], weights[1, indexes[1]]], matchups, pot)
+    exploitability = None
+    for iteration in range(1, iterations + 1):
+        solver.iterate(iteration)
+        if iteration % 50 == 0 or iteration == iterations:
+            exploitability = solver.exploitability()
+            if exploitability < tolerance * pot:
+                break
+
+    solver.finish(indexes)
+    return RiverSolution(root, weights, pot, exploitability)
+
+
+def _build_tree(pot, stack, bet_sizes, raise_sizes, max_raises, allin):
+    root = RiverNode(0, (0, 0))
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        player, opponent = node.player, 1 - node.player
+        contributions = node.contributions
+        to_call = contributions[opponent] - contributions[player]
+        current_pot = pot + sum(contributions)
+
+        if to_call:
+            node.children['fold'] = RiverNode(None, contributions, folded=player)
+            node.children['call'] = RiverNode(None, (contributions[opponent],) * 2)
+            amounts = [contributions[opponent] + size * (current_pot + to_call)
+                       for size in raise_sizes]
+        else:
+            # checking back ends the hand
+            if player == 1:
+                node.children['check'] = RiverNode(None, contributions)
+            else:
+                node.children['check'] = RiverNode(1, contributions)
+                nodes.append(node.children['check'])
+            amounts = [size * current_pot for size in bet_sizes]
+
+        if contributions[opponent] >= stack or (to_call and node.raises >= max_raises):
+            continue
+        amounts = sorted({min(amount, stack) for amount in amounts
+                          if amount > contributions[opponent]})
+        if allin and stack not in amounts:
+            amounts.append(stack)
+        for amount in amounts:
+            if amount >= stack:
+                name = 'allin'
+            else:
+                name = '%s %g' % ('raise' if to_call else 'bet', amount)
+            new_contributions = list(contributions)
+            new_contributions[player] = amount
+            child = RiverNode(opponent, tuple(new_contributions), node.raises + bool(to_call))
+            node.children[name] = child
+            nodes.append(child)
+    return root
+
+
+class _Solver(object):
+    """Vectorized CFR+ over the combos of both players' ranges. Reaches and counterfactual
+    values are arrays over the combos of the player they belong to."""
+
+    def __init__(self, root, weights, matchups, pot):
+        self.root = root
+        self.weights = weights
+        self.matchups = matchups
+        self.pot = pot
+        self._init_node(root)
+
+    def _init_node(self, node):
+        if node.is_terminal:
+            return
+        shape = (len(node.children), len(self.weights[node.player]))
+        node.regrets, node.strategy_sum = np.zeros(shape), np.zeros(shape)
+        for child in node.children.values():
+            self._init_node(child)
+
+    @staticmethod
+    def _current_strategy(node):
+        positive = np.maximum(node.regrets, 0)
+        total = positive.sum(axis=0)
+        return np.where(total > 0, positive / np.where(total > 0, total, 1),
+                        1 / len(positive))
+
+    @staticmethod
+    def _average_strategy(node):
+        total = node.strategy_sum.sum(axis=0)
+        return np.where(total > 0, node.strategy_sum / np.where(total > 0, total, 1),
+                        1 / len(node.strategy_sum))
+
+    def _terminal_values(self, node, player, opponent_reach):
+        """Counterfactual values of the player's combos in a terminal node."""
+        win, tie, total = self.matchups[player].compare(opponent_reach)
+        contributions = node.contributions
+        if node.folded is not None:
+            if node.folded == player:
+                return -contributions[player] * total
+            return (self.pot + contributions[1 - player]) * total
+        lose = total - win - tie
+        return ((self.pot + contributions[1 - player]) * win - contributions[player] * lose +
+                self.pot / 2 * tie)
+
+    def _walk(self, node, player, reaches, iteration):
+        if node.is_terminal:
+            return self._terminal_values(node, player, reaches[1 - player])
+
+        strategy = self._current_strategy(node)
+        children = list(node.children.values())
+        if node.player != player:
+            values = 0
+            for child, action_strategy in zip(children, strategy):
+                child_reaches = list(reaches)
+                child_reaches[node.player] = reaches[node.player] * action_strategy
+                values = values + self._walk(child, player, child_reaches, iteration)
+            return values
+
+        action_values = np.empty(strategy.shape)
+        for ind, (child, action_strategy) in enumerate(zip(children, strategy)):
+            child_reaches = list(reaches)
+            child_reaches[player] = reaches[player] * action_strategy
+            action_values[ind] = self._walk(child, player, child_reaches, iteration)
+        values = (strategy * action_values).sum(axis=0)
+        node.regrets = np.maximum(node.regrets + action_values - values, 0)
+        node.strategy_sum += iteration * reaches[player] * strategy
+        return values
+
+    def iterate(self, iteration):
+        for player in (0, 1):
+            self._walk(self.root, player, self.weights, iteration)
+
+    def _best_response(self, node, player, opponent_reach):
+        if node.is_terminal:
+            return self._terminal_values(node, player, opponent_reach)
+        children = list(node.children.values())
+        if node.player == player:
+            return np.max([self._best_response(child, player, opponent_reach)
+                           for child in children], axis=0)
+        strategy = self._average_strategy(node)
+        return sum(self._best_response(child, player, opponent_reach * action_strategy)
+                   for child, action_strategy in zip(children, strategy))
+
+    def exploitability(self):
+        """Average of what the players could win more than the pot by best responses."""
+        values = [self._best_response(self.root, player, self.weights[1 - player])
+                  .dot(self.weights[player]) for player in (0, 1)]
+        matchups = self.matchups[0].compare(self.weights[1])[2].dot(self.weights[0])
+        return (sum(values) / matchups - self.pot) / 2
+
+    def _evaluate(self, node, reaches, indexes):
+        """Counterfactual values of both players with the average strategies and save the
+        strategies and EVs to 1326 long arrays."""
+        if node.is_terminal:
+            values = [self._terminal_values(node, player, reaches[1 - player])
+                      for player in (0, 1)]
+        else:
+            strategy = self._average_strategy(node)
+            values = [0, 0]
+            for child, action_strategy in zip(node.children.values(), strategy):
+                child_reaches = list(reaches)
+                child_reaches[node.player] = reaches[node.player] * action_strategy
+                child_values = self._evaluate(child, child_reaches, indexes)
+                # the acting player's own reach is not part of their counterfactual values
+                child_values[node.player] = child_values[node.player] * action_strategy
+                values = [values[0] + child_values[0], values[1] + child_values[1]]
+            node.strategy = np.zeros((len(strategy), 1326))
+            node.strategy[:, indexes[node.player]] = strategy
+            del node.regrets, node.strategy_sum
+
+        node.ev = np.full((2, 1326), np.nan)
+        for player in (0, 1):
+            total = self.matchups[player].compare(reaches[1 - player])[2]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                node.ev[player, indexes[player]] = np.where(total > 0, values[player] / total,
+                                                            np.nan)
+        return values
+
+    def finish(self, indexes):
+        self._evaluate(self.root, self.weights, indexes)
+
+
+class _Matchups(object):
+    """Win, tie and total weight of the villain combos not conflicting with every hero combo,
+    calculated from cumulative sums of the villain weights in hand value order.
+
+    Villain combos sharing a card with the hero combo are removed by cumulative sums of the
+    villain combos containing every card; the villain combo which is the same as the hero
+    combo contains both of its cards and is removed twice, so it is added back once.
+    """
+
+    def __init__(self, hero_indexes, hero_values, villain_indexes, villain_values):
+        self.order = np.argsort(villain_values, kind='mergesort')
+        sorted_values = villain_values[self.order]
+        self.lower = np.searchsorted(sorted_values, hero_values, 'left')
+        self.not_higher = np.searchsorted(sorted_values, hero_values, 'right')
+
+        # positions of the villain combos containing every card in value order, padded with
+        # the position of an extra zero weight
+        villains_num = len(villain_indexes)
+        sorted_cards = _eval.COMBO_CARDS[villain_indexes[self.order]]
+        card_positions = [np.flatnonzero((sorted_cards == card).any(axis=1))
+                          for card in range(52)]
+        width = max(len(positions) for positions in card_positions)
+        self.card_positions = np.full((52, width), villains_num)
+        self.hero_cards = _eval.COMBO_CARDS[hero_indexes].astype(np.intp)
+        self.card_lower = np.zeros(self.hero_cards.shape, dtype=np.intp)
+        self.card_not_higher = np.zeros(self.hero_cards.shape, dtype=np.intp)
+        for card, positions in enumerate(card_positions):
+            self.card_positions[card, :len(positions)] = positions
+            for slot in (0, 1):
+                heroes = self.hero_cards[:, slot] == card
+                card_values = sorted_values[positions]
+                self.card_lower[heroes, slot] = np.searchsorted(card_values, hero_values[heroes],
+                                                                'left')
+                self.card_not_higher[heroes, slot] = np.searchsorted(
+                    card_values, hero_values[heroes], 'right')
+
+        villain_positions = np.full(1326, villains_num)
+        villain_positions[villain_indexes[self.order]] = np.arange(villains_num)
+        self.same = villain_positions[hero_indexes]
+
+    def compare(self, villain_weights):
+        sorted_weights = np.append(villain_weights[self.order], 0)
+        cumulative = np.concatenate([[0], np.cumsum(sorted_weights)])
+        card_cumulative = np.zeros((52, self.card_positions.shape[1] + 1))
+        np.cumsum(sorted_weights[self.card_positions], axis=1, out=card_cumulative[:, 1:])
+        same = sorted_weights[self.same]
+        first, second = self.hero_cards.T
+
+        def count(positions, card_positions):
+            return (cumulative[positions] - card_cumulative[first, card_positions[:, 0]] -
+                    card_cumulative[second, card_positions[:, 1]])
+
+        win = count(self.lower, self.card_lower)
+        not_higher = count(self.not_higher, self.card_not_higher) + same
+        total = (cumulative[-1] - card_cumulative[first, -1] - card_cumulative[second, -1] +
+                 same)
+        return win, not_higher - win, total
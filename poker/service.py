@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Non-blocking equity calculations in a shared worker process pool.
+"""
+
+import threading
+import multiprocessing
+from multiprocessing import TimeoutError
+from . import _eval
+from ._common import _spawn_random_states
+from .card import Card
+from .cache import make_key
+from .equity import equity
+
+
+__all__ = ['EquityService', 'EquityRequest', 'CancelledError', 'TimeoutError']
+
+
+class CancelledError(Exception):
+    """Raised when the result of a cancelled request is asked for."""
+
+
+class EquityService(object):
+    """Calculate equities in a process pool without blocking the caller.
+
+    Every submitted calculation returns an :class:`EquityRequest` immediately. Identical
+    (or suit isomorphic) calculations already running are not started again, their requests
+    get the result of the running one.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def submit(self, hero, villain, board=None, samples=None, random_state=None, dead=None,
+               deadline=None):
+        """Start calculating :func:`poker.equity.equity` with the same arguments.
+        If deadline (seconds) is given and the calculation is not done by then, the request
+        fails with TimeoutError.
+        The random_state is an int seed (it is part of the key of the request). Sampled
+        calculations without one get a stream of their own, the workers are forked with the
+        same global random state.
+        """
+        hero, villain = _eval.to_weights(hero), _eval.to_weights(villain)
+        board = [unicode(Card(card)) for card in board] if board else None
+        dead = [unicode(Card(card)) for card in dead] if dead else None
+        key = make_key(hero, villain, board, dead, samples=samples, random_state=random_state)
+
+        request = EquityRequest(self, key)
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.processes)
+            job = self._in_flight.get(key)
+            if job is None:
+                job = self._in_flight[key] = [request]
+                if samples is not None and random_state is None:
+                    random_state = _spawn_random_states(None, 1)[0]
+                argument = (hero, villain, board, samples, random_state, dead)
+                self._pool.apply_async(_calculate, (argument,),
+                                       callback=lambda result: self._finish(key, job, result))
+            else:
+                job.append(request)
+
+        if deadline is not None:
+            timer = threading.Timer(deadline, self._timeout, (request, deadline))
+            timer.daemon = True
+            timer.start()
+        return request
+
+    def close(self):
+        """Stop the worker processes, running requests fail with CancelledError."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            jobs, self._in_flight = list(self._in_flight.values()), {}
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        for job in jobs:
+            for request in list(job):
+                request._set(None, CancelledError('Equity service has been closed!'))
+
+    def _finish(self, key, job, result):
+        with self._lock:
+            # a new job with the same key might have been started after this one was dropped
+            if self._in_flight.get(key) is job:
+                del self._in_flight[key]
+            requests = list(job)
+        for request in requests:
+            request._set(*result)
+
+    def _timeout(self, request, deadline):
+        if request._set(None, TimeoutError('Equity calculation did not finish in %s seconds!'
+                                           % deadline)):
+            self._cancel(request)
+
+    def _cancel(self, request):
+        """Remove the request from its job, a job nobody waits for is not joined any more."""
+        with self._lock:
+            job = self._in_flight.get(request.key, [])
+            if request in job:
+                job.remove(request)
+                if not job:
+                    del self._in_flight[request.key]
+
+
+class EquityRequest(object):
+    """Result of an equity calculation which will be available later."""
+
+    def __init__(self, service, key):
+        self.key = key
+        self._service = service
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = self._exception = None
+        self._cancelled = False
+        self._callbacks = []
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """Stop waiting for the result. The calculation itself goes on if other requests
+        are waiting for it too. Returns False if the request is already done.
+        """
+        if not self._set(None, CancelledError('Equity request has been cancelled!')):
+            return False
+        self._cancelled = True
+        self._service._cancel(self)
+        return True
+
+    def result(self, timeout=None):
+        """Wait for the result (_EquityResult) at most timeout seconds. Raises the exception
+        the calculation raised, CancelledError or TimeoutError.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError('Equity request is not done in %s seconds!' % timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def add_done_callback(self, callback):
+        """Call callback with this request when it is done (from a background thread)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set(self, result, exception):
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self._result, self._exception = result, exception
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+        return True
+
+
+def _calculate(argument):
+    """Run in the worker processes. Returns (result, exception), because Python 2 pools
+    can't report failed tasks to the callback."""
+    hero, villain, board, samples, random_state, dead = argument
+    try:
+        return equity(hero, villain, board, samples, random_state, dead), None
+    except Exception as e:
+        return None, e
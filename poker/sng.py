@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Sit-and-go tournament simulator with push/fold charts.
+"""
+
+from collections import namedtuple
+import numpy as np
+from .pushfold import POSITIONS as _POSITIONS, _situation_depth, _call_range
+from ._common import _spawn_random_states, _parallel_map, _Z
+from . import _eval
+
+
+__all__ = ['simulate_sng']
+
+
+_SeatResult = namedtuple('_SeatResult', 'finishes roi roi_interval itm itm_interval')
+"""Named tuple for the results of a seat.
+
+``finishes`` is the probability of finishing in every place from the first, ``roi`` the average
+prize per buyin minus one and ``itm`` the probability of finishing in the money; the intervals
+are their 95% confidence intervals.
+"""
+
+_Chart = namedtuple('_Chart', 'depths push call')
+"""Push/fold chart as combo membership arrays: push in the shape of (situations, positions,
+combos) and call in the shape of (situations, pushers, callers, combos)."""
+
+# tournaments in one task, every task has its own random stream
+_CHUNK_SIZE = 5000
+
+
+def simulate_sng(strategies, stacks, levels, payouts, tournaments=10000, hands_per_level=10,
+                 calls=None, buyin=None, max_hands=1000, processes=1, random_state=None):
+    """Play sit-and-go tournaments where every player follows a push/fold chart.
+
+    Strategies are one :class:`poker.strategy.Strategy` for every player or one per seat. Every
+    hand a player uses the situation with the depth (like ``'10 BB'``) closest to their stack in
+    big blinds: pushes first in with the combos of their position's range and calls with the
+    combos of the calling ranges (calls as in :func:`poker.pushfold.evaluate_strategy`). After
+    a call everybody else folds, as in :func:`poker.pushfold.solve_push_fold`.
+    Levels are (small blind, big blind, ante) triples, each played for hands_per_level hands,
+    the last one until the end. The button starts at a random seat. Tournaments not finished in
+    max_hands hands are ranked by the stacks.
+    Tournaments run in chunks with their own random streams, so with an int random_state the
+    results are the same for any number of processes.
+
+    Returns a list of the results of every seat. The buyin is the prize pool divided by the
+    number of players by default.
+    """
+    charts, seat_charts = _compile_charts(strategies, len(stacks), calls)
+    stacks = np.asarray(stacks, dtype=np.float64)
+    if (stacks <= 0).any():
+        raise ValueError('Every stack should be positive!')
+    prizes = np.zeros(len(stacks))
+    payouts = np.asarray(payouts, dtype=np.float64)[:len(stacks)]
+    prizes[:len(payouts)] = payouts
+    if buyin is None:
+        buyin = prizes.sum() / len(stacks)
+
+    counts = [_CHUNK_SIZE] * (tournaments // _CHUNK_SIZE)
+    if tournaments % _CHUNK_SIZE:
+        counts.append(tournaments % _CHUNK_SIZE)
+    random_states = _spawn_random_states(random_state, len(counts))
+    arguments = [(charts, seat_charts, stacks, levels, hands_per_level, max_hands, count,
+                  chunk_random_state)
+                 for count, chunk_random_state in zip(counts, random_states)]
+    results = _parallel_map(_play_tournaments, arguments, processes)
+    places = np.concatenate(results)
+    return [_seat_result(places[:, seat], prizes, buyin) for seat in range(len(stacks))]
+
+
+def _seat_result(places, prizes, buyin):
+    count = len(places)
+    finishes = np.bincount(places, minlength=len(prizes) + 1)[1:] / count
+    returns = prizes[places - 1] / buyin - 1
+    roi = returns.mean()
+    roi_error = _Z * returns.std(ddof=1) / np.sqrt(count) if count > 1 else np.inf
+    itm = finishes[prizes > 0].sum()
+    itm_error = _Z * np.sqrt(itm * (1 - itm) / count)
+    return _SeatResult(finishes, roi, (roi - roi_error, roi + roi_error), itm,
+                       (itm - itm_error, itm + itm_error))
+
+
+def _compile_charts(strategies, players_num, calls):
+    """Charts of the different strategies and the index of every seat's chart, strategies are
+    one for every player or one per seat."""
+    if not isinstance(strategies, (list, tuple)):
+        strategies = [strategies] * players_num
+    if not 2 <= players_num <= len(_POSITIONS) or len(strategies) != players_num:
+        raise ValueError('There should be 2-%d players with a strategy each!' % len(_POSITIONS))
+    # the same Strategy is compiled only once
+    compiled, charts, seat_charts = [], [], []
+    for strategy in strategies:
+        if not any(strategy is other for other in compiled):
+            compiled.append(strategy)
+            charts.append(_compile_chart(strategy, calls))
+        seat_charts.append(next(index for index, other in enumerate(compiled)
+                                if other is strategy))
+    return charts, seat_charts
+
+
+def _compile_chart(strategy, calls):
+    """Combo membership arrays of the ranges of every push situation in depth order."""
+    # the same range is usually looked up for many positions, keep the range to keep its id
+    memberships = {}
+
+    def membership(range):
+        if id(range) not in memberships:
+            weights = np.zeros(1326) if range is None else _eval.to_weights(range)
+            memberships[id(range)] = range, weights > 0
+        return memberships[id(range)][1]
+
+    depths, push, call = [], [], []
+    for name, situation in strategy.items():
+        if situation.inaction == 'CALL' or strategy.get_first_spot(name) is None:
+            continue
+        depths.append(_situation_depth(name))
+        push.append([membership(getattr(situation, position)) for position in _POSITIONS])
+        call.append([[membership(_call_range(strategy, name, calls, pusher, caller))
+                      for caller in _POSITIONS] for pusher in _POSITIONS])
+    if not depths:
+        raise ValueError('There are no push situations in the strategy!')
+    order = np.argsort(depths)
+    return _Chart(np.array(depths)[order], np.array(push)[order], np.array(call)[order])
+
+
+def _play_tournaments(argument):
+    """Finishing places of every seat in the shape of (tournaments, seats)."""
+    charts, seat_charts, stacks, levels, hands_per_level, max_hands, count, random_state = \
+        argument
+    players_num = len(stacks)
+    stacks = np.tile(stacks, (count, 1))
+    places = np.zeros((count, players_num), dtype=np.int64)
+    buttons = random_state.randint(players_num, size=count)
+    active = np.arange(count)
+    for hand in range(max_hands):
+        blinds = levels[min(hand // hands_per_level, len(levels) - 1)]
+        before = stacks[active]
+        after = _play_hand(before, buttons[active], charts, seat_charts, blinds, random_state)
+        stacks[active] = after
+
+        # players busting in the same hand are ranked by their stacks before it
+        busted = (before > 0) & (after <= 0)
+        left = (after > 0).sum(axis=1)
+        ranks = np.argsort(np.argsort(np.where(busted, -before, np.inf), axis=1), axis=1)
+        places[active] = np.where(busted, left[:, np.newaxis] + 1 + ranks, places[active])
+
+        finished = left == 1
+        places[active[finished]] = np.where(after[finished] > 0, 1, places[active[finished]])
+        active, after = active[~finished], after[~finished]
+        if not len(active):
+            break
+        buttons[active] = _next_alive(buttons[active], after > 0)
+
+    # rank unfinished tournaments by the stacks
+    alive = stacks[active] > 0
+    ranks = np.argsort(np.argsort(np.where(alive, -stacks[active], np.inf), axis=1), axis=1)
+    places[active] = np.where(alive, ranks + 1, places[active])
+    return places
+
+
+def _next_alive(seats, alive):
+    players_num = alive.shape[1]
+    offsets = (np.arange(players_num) - seats[:, np.newaxis] - 1) % players_num
+    offsets = np.where(alive, offsets, players_num)
+    return (seats + 1 + offsets.min(axis=1)) % players_num
+
+
+def _play_hand(stacks, buttons, charts, seat_charts, blinds, random_state):
+    """Stacks after a push/fold hand at every table."""
+    small_blind, big_blind, ante = blinds
+    count, players_num = stacks.shape
+    rows = np.arange(count)
+    alive = stacks > 0
+    alive_num = alive.sum(axis=1)[:, np.newaxis]
+
+    # preflop order from the first player after the big blind, heads up the button is the
+    # small blind and acts first
+    offsets = np.where(alive, (np.arange(players_num) - buttons[:, np.newaxis]) % players_num,
+                       players_num)
+    ranks = np.argsort(np.argsort(offsets, axis=1), axis=1)
+    order = np.where(alive_num == 2, ranks, (ranks - 3) % alive_num)
+    order = np.where(alive, order, players_num)
+    positions = np.clip(len(_POSITIONS) - alive_num + order, 0, len(_POSITIONS) - 1)
+
+    posted = np.where(alive, np.minimum(stacks, ante), 0)
+    for blind, distance in ((small_blind, 2), (big_blind, 1)):
+        posted += np.where(order == alive_num - distance, np.minimum(stacks - posted, blind), 0)
+
+    cards = _deal(count, players_num * 2 + 5, random_state)
+    holes = cards[:, :players_num * 2].reshape(count, players_num, 2)
+    combos = _eval._COMBO_INDEX[holes[:, :, 0], holes[:, :, 1]]
+    board = cards[:, players_num * 2:]
+
+    # every seat of a chart is looked up at once, in the situation of the closest depth
+    seat_charts = np.asarray(seat_charts)
+    situations = np.empty((count, players_num), dtype=np.int64)
+    pushes = np.empty((count, players_num), dtype=bool)
+    for index, chart in enumerate(charts):
+        seats = seat_charts == index
+        middles = (chart.depths[1:] + chart.depths[:-1]) / 2
+        situations[:, seats] = np.searchsorted(middles, stacks[:, seats] / big_blind)
+        pushes[:, seats] = chart.push[situations[:, seats], positions[:, seats], combos[:, seats]]
+    # the big blind can only win the blinds when everybody folds
+    pushes &= alive & (order < alive_num - 1)
+    pushed = pushes.any(axis=1)
+    pusher = np.where(pushes, order, players_num).argmin(axis=1)
+
+    calls = np.empty((count, players_num), dtype=bool)
+    pusher_positions = positions[rows, pusher][:, np.newaxis]
+    for index, chart in enumerate(charts):
+        seats = seat_charts == index
+        calls[:, seats] = chart.call[situations[:, seats], pusher_positions, positions[:, seats],
+                                     combos[:, seats]]
+    calls &= alive & pushed[:, np.newaxis] & (order > order[rows, pusher][:, np.newaxis])
+    called = calls.any(axis=1)
+    caller = np.where(calls, order, players_num).argmin(axis=1)
+
+    # the pusher and the caller risk the smaller stack, the rest of the blinds is returned
+    contributions = posted
+    showdowns = np.flatnonzero(called)
+    pushers, callers = pusher[showdowns], caller[showdowns]
+    risked = np.minimum(stacks[showdowns, pushers], stacks[showdowns, callers])
+    contributions[showdowns, pushers] = contributions[showdowns, callers] = risked
+    pots = contributions.sum(axis=1)
+    stacks = stacks - contributions
+
+    winners = np.where(pushed, pusher, np.argmax(order == alive_num - 1, axis=1))
+    shares = np.ones(count)
+    if len(showdowns):
+        pusher_values = _showdown_values(holes[showdowns, pushers], board[showdowns])
+        caller_values = _showdown_values(holes[showdowns, callers], board[showdowns])
+        winners[showdowns] = np.where(caller_values > pusher_values, callers, pushers)
+        ties = showdowns[pusher_values == caller_values]
+        shares[ties] = 0.5
+        stacks[ties, caller[ties]] += pots[ties] / 2
+    stacks[rows, winners] += pots * shares
+    return stacks
+
+
+def _deal(count, cards_num, random_state):
+    """Random cards without replacement for every table by a partial Fisher-Yates shuffle of
+    the decks, much faster than sorting random keys of every card."""
+    rows = np.arange(count)
+    decks = np.tile(np.arange(52, dtype=np.int8), (count, 1))
+    for card in range(cards_num):
+        swaps = card + (random_state.random_sample(count) * (52 - card)).astype(np.int64)
+        decks[rows, card], decks[rows, swaps] = decks[rows, swaps], decks[rows, card]
+    return decks[:, :cards_num]
+
+
+def _showdown_values(holes, board):
+    cards = np.empty((len(holes), 7), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = holes, board
+    return _eval.evaluate(cards)
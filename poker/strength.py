@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+"""
+    Hand strength, hand potential and strength buckets of every combo on a board.
+"""
+
+from collections import namedtuple
+import numpy as np
+from . import _eval
+from .equity import _CHUNK_SIZE, _CARD_COMBOS, _get_runouts, _evaluate_runouts
+
+
+__all__ = ['hand_strengths', 'range_strength', 'strength_buckets']
+
+
+_HandStrength = namedtuple('_HandStrength', 'hs ehs ehs2 ppot npot histogram')
+"""Named tuple for hand strength results.
+
+``hs`` is the ratio of villain combos beaten now (ties count half), ``ppot`` and ``npot`` are the
+positive and negative potential: the chance of getting ahead when behind and falling behind
+when ahead by the river. ``ehs`` is the expected hand strength ``hs * (1 - npot) + (1 - hs) *
+ppot``, ``ehs2`` the average of the squared hand strength on every river and ``histogram`` is the
+distribution of the hand strength on the river in equal bins between 0 and 1.
+"""
+
+BUCKETING_METHODS = ('ehs2', 'histogram')
+
+# current classes of villain combos against a hero combo and final outcomes of the hero combo
+_AHEAD, _TIED, _BEHIND = range(3)
+_WIN, _TIE, _TOTAL = range(3)
+# hand value of combos removed by the runout, above every real hand value
+_REMOVED = np.iinfo(np.int32).max
+
+
+def hand_strengths(board, hero=None, villain=None, bins=10, samples=None, random_state=None,
+                   dead=None):
+    """Hand strength and potential of every hero combo (every combo by default) against
+    villain's range (a random hand by default) on a flop, turn or river.
+
+    Without samples every runout is enumerated, otherwise samples number of random runouts are
+    evaluated. Returns a _HandStrength of arrays for all 1326 combos, NaN for the ones not
+    calculated; ``histogram`` is in the shape of (1326, bins).
+    """
+    board, dead, hero_weights, villain_weights = _prepare(board, dead, hero, villain)
+    hero_indexes = np.flatnonzero(hero_weights > 0)
+    counts = _strength_counts(hero_indexes, villain_weights, board, dead, bins, samples,
+                              random_state)
+
+    strengths = []
+    for strength in _to_strengths(*counts):
+        result = np.full((1326,) + strength.shape[1:], np.nan)
+        result[hero_indexes] = strength
+        strengths.append(result)
+    return _HandStrength(*strengths)
+
+
+def range_strength(hero, board, villain=None, bins=10, samples=None, random_state=None,
+                   dead=None):
+    """Hand strength and potential of a whole range against villain's range (a random hand by
+    default). Counts of every hero combo are summed by weight, so the result is the same as
+    the one of a combo which is any of the hero combos.
+    """
+    board, dead, hero_weights, villain_weights = _prepare(board, dead, hero, villain)
+    hero_indexes = np.flatnonzero(hero_weights > 0)
+    counts = _strength_counts(hero_indexes, villain_weights, board, dead, bins, samples,
+                              random_state)
+
+    weights = hero_weights[hero_indexes]
+    counts = [np.tensordot(weights, count, axes=1)[np.newaxis] for count in counts]
+    return _HandStrength(*[strength[0] for strength in _to_strengths(*counts)])
+
+
+def strength_buckets(board, buckets, villain=None, method='ehs2', bins=10, samples=None,
+                     random_state=None, dead=None):
+    """Cluster every possible combo into buckets number of strength buckets with k-means.
+
+    With the ``'ehs2'`` method combos are clustered by EHS², with ``'histogram'`` by their hand
+    strength histograms (compared by the cumulative histograms, so a combo is closer to the
+    ones with similar chances of every strength). Buckets are ordered by average EHS, 0 is the
+    weakest. Returns the bucket of all 1326 combos, -1 for combos conflicting with the board.
+    """
+    if method not in BUCKETING_METHODS:
+        raise ValueError('Unknown bucketing method %r, use one of %s' % (method,
+                                                                        BUCKETING_METHODS))
+    strengths = hand_strengths(board, None, villain, bins, samples, random_state, dead)
+    possible = np.flatnonzero(~np.isnan(strengths.ehs))
+
+    if method == 'ehs2':
+        points = strengths.ehs2[possible, np.newaxis]
+    else:
+        points = np.cumsum(strengths.histogram[possible], axis=1)
+    labels = _kmeans(points, strengths.ehs[possible], buckets)
+
+    # rename buckets by average EHS
+    bucket_ehs = np.bincount(labels, strengths.ehs[possible], buckets)
+    bucket_ehs /= np.maximum(np.bincount(labels, minlength=buckets), 1)
+    ranks = np.empty(buckets, dtype=np.int16)
+    ranks[np.argsort(bucket_ehs, kind='mergesort')] = np.arange(buckets)
+
+    result = np.full(1326, -1, dtype=np.int16)
+    result[possible] = ranks[labels]
+    return result
+
+
+def _prepare(board, dead, hero, villain):
+    board, dead = _eval.cards_to_array(board), _eval.cards_to_array(dead)
+    if not 3 <= len(board) <= 5:
+        raise ValueError('Hand strength needs a flop, turn or river, not %d board cards!'
+                         % len(board))
+    hero_weights = np.ones(1326) if hero is None else _eval.to_weights(hero)
+    villain_weights = np.ones(1326) if villain is None else _eval.to_weights(villain)
+
+    live = (_eval.COMBO_MASKS & (_eval.cards_to_mask(board) | _eval.cards_to_mask(dead))) == 0
+    hero_weights, villain_weights = hero_weights * live, villain_weights * live
+    if not hero_weights.any() or not villain_weights.any():
+        raise ValueError('Every combo of a player is conflicting with the board or dead cards!')
+    return board, dead, hero_weights, villain_weights
+
+
+def _strength_counts(hero_indexes, villain_weights, board, dead, bins, samples, random_state):
+    """Weighted villain combo counts of every hero combo.
+
+    Returns the current counts in the shape of (hero combos, 3 current classes: villain
+    combos hero is ahead of, tied with and behind), the counts summed over every runout in the
+    shape of (hero combos, 3 current classes, 3: final wins, ties and totals), the sum of the
+    squared final hand strengths and the final hand strength histograms, both weighted by the
+    final totals.
+
+    Villain combos are grouped by their current hand value. On every runout a table of the
+    cumulative villain weights by group and by final hand value order makes the weights of
+    the villain combos in a group range with weaker (or not stronger) final hands a lookup.
+    Villain combos sharing a card with the hero combo are subtracted after comparing them
+    one by one.
+    """
+    villain_indexes = np.flatnonzero(villain_weights > 0)
+    weights = villain_weights[villain_indexes]
+    heroes_num, villains_num = len(hero_indexes), len(villain_indexes)
+    indexes = np.union1d(hero_indexes, villain_indexes)
+    hero_positions = np.searchsorted(indexes, hero_indexes)
+    villain_positions = np.searchsorted(indexes, villain_indexes)
+
+    cards = np.empty((len(indexes), 2 + len(board)), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS[indexes], board
+    current_values = _eval.evaluate(cards)
+    group_values, villain_groups = np.unique(current_values[villain_positions],
+                                             return_inverse=True)
+    groups_num = len(group_values)
+    hero_values = current_values[hero_positions]
+    bounds = np.array([np.searchsorted(group_values, hero_values, 'left'),
+                       np.searchsorted(group_values, hero_values, 'right'),
+                       np.full(heroes_num, groups_num)])
+
+    # villain combos sharing a card with the hero combo (the hero combo itself once),
+    # padded with the position villains_num, and their current classes
+    padded_positions = np.full(1327, villains_num)
+    padded_positions[villain_indexes] = np.arange(villains_num)
+    hero_cards = _eval.COMBO_CARDS[hero_indexes]
+    second_combos = _CARD_COMBOS[hero_cards[:, 1]]
+    second_combos = np.where(second_combos == hero_indexes[:, np.newaxis], 1326, second_combos)
+    conflicting = padded_positions[np.hstack([_CARD_COMBOS[hero_cards[:, 0]], second_combos])]
+    conflicting_groups = np.append(villain_groups, 0)[conflicting]
+    conflicting_classes = ((conflicting_groups >= bounds[0, :, np.newaxis]).astype(np.intp) +
+                           (conflicting_groups >= bounds[1, :, np.newaxis]))
+    # weights of the conflicting villain combos by class, (hero combos, 3 classes, combos)
+    class_weights = ((conflicting_classes[:, np.newaxis, :] == np.arange(3)[:, np.newaxis]) *
+                     np.append(weights, 0)[conflicting][:, np.newaxis, :])
+
+    cumulative = np.zeros(groups_num + 1)
+    np.cumsum(np.bincount(villain_groups, weights, groups_num), out=cumulative[1:])
+    current = (np.diff(np.vstack([np.zeros(heroes_num), cumulative[bounds]]), axis=0).T -
+               class_weights.sum(axis=2))
+
+    runouts = _get_runouts(board, hero_indexes, villain_indexes, samples, random_state, dead)
+    potentials = np.zeros((heroes_num, 3, 3))
+    squares, histograms = np.zeros(heroes_num), np.zeros((heroes_num, bins))
+    chunk_size = max(1, _CHUNK_SIZE // max((groups_num + 1) * (villains_num + 1),
+                                           3 * conflicting.size))
+    for start in range(0, len(runouts), chunk_size):
+        chunk = runouts[start:start + chunk_size]
+        values, removed = _evaluate_runouts(_eval.COMBO_CARDS[indexes],
+                                            _eval.COMBO_MASKS[indexes], board, chunk)
+        runouts_num = len(chunk)
+        rows = np.arange(runouts_num)[:, np.newaxis]
+        final_values = values[:, hero_positions]
+        villain_values = np.zeros((runouts_num, villains_num + 1), dtype=values.dtype)
+        villain_values[:, :-1] = values[:, villain_positions]
+        villain_weights = np.zeros((runouts_num, villains_num + 1))
+        villain_weights[:, :-1] = np.where(removed[:, villain_positions], 0, weights)
+
+        # order of the final hand values of hero combos among the villain combos
+        order = np.argsort(villain_values[:, :-1], axis=1)
+        offsets = np.arange(runouts_num, dtype=np.int64)[:, np.newaxis] << 32
+        sorted_values = (villain_values[rows, order] + offsets).ravel()
+        positions = [np.searchsorted(sorted_values, final_values + offsets, side) -
+                     rows * villains_num for side in ('left', 'right')]
+        positions.append(np.full(final_values.shape, villains_num))
+
+        table = np.zeros((runouts_num, groups_num + 1, villains_num + 1))
+        table[rows, villain_groups[order] + 1, np.arange(1, villains_num + 1)] = \
+            villain_weights[rows, order]
+        np.cumsum(table, axis=1, out=table)
+        np.cumsum(table, axis=2, out=table)
+
+        # (runouts, hero combos, 3 group bounds, 3: weaker, not stronger, all final values)
+        below = np.stack([np.stack([table[rows, bound, position] for position in positions],
+                                   axis=2) for bound in bounds], axis=2)
+        results = np.diff(np.concatenate([np.zeros_like(below[:, :, :1]), below], axis=2),
+                          axis=2)
+        results[:, :, :, 1] -= results[:, :, :, 0]
+
+        # conflicting villain combos summed by current class with batched matrix products over
+        # hero combos; removed villain combos get a value above every hand, so they are never
+        # counted as beaten or tied
+        conflicting_values = np.where(villain_weights > 0, villain_values, _REMOVED).T[conflicting]
+        hero_final = final_values.T[:, np.newaxis, :]
+        matchups = np.empty(conflicting.shape + (3, runouts_num))
+        np.less(conflicting_values, hero_final, out=matchups[:, :, _WIN])
+        np.equal(conflicting_values, hero_final, out=matchups[:, :, _TIE])
+        np.not_equal(conflicting_values, _REMOVED, out=matchups[:, :, _TOTAL])
+        conflicting_results = np.matmul(class_weights, matchups.reshape(heroes_num, -1,
+                                                                        3 * runouts_num))
+        results -= conflicting_results.reshape(heroes_num, 3, 3, runouts_num).transpose(3, 0, 1, 2)
+        results *= ~removed[:, hero_positions, np.newaxis, np.newaxis]
+        potentials += results.sum(axis=0)
+
+        wins, ties, totals = results.sum(axis=2).transpose(2, 0, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            strengths = np.where(totals > 0, (wins + ties / 2) / totals, 0)
+        squares += (totals * strengths ** 2).sum(axis=0)
+        strength_bins = np.minimum((strengths * bins).astype(np.intp), bins - 1)
+        histograms += np.bincount((np.arange(heroes_num) * bins + strength_bins).ravel(),
+                                  totals.ravel(), heroes_num * bins).reshape(heroes_num, bins)
+
+    return current, potentials, squares, histograms
+
+
+def _to_strengths(current, potentials, squares, histograms):
+    """Hand strength, potentials, EHS, EHS² and histograms from the counts of _strength_counts
+    (along the first axis)."""
+    wins, ties, totals = potentials[..., _WIN], potentials[..., _TIE], potentials[..., _TOTAL]
+    losses = totals - wins - ties
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hs = (current[:, _AHEAD] + current[:, _TIED] / 2) / current.sum(axis=1)
+        ppot = ((wins[:, _BEHIND] + ties[:, _BEHIND] / 2 + wins[:, _TIED] / 2) /
+                (totals[:, _BEHIND] + totals[:, _TIED] / 2))
+        npot = ((losses[:, _AHEAD] + losses[:, _TIED] / 2 + ties[:, _AHEAD] / 2) /
+                (totals[:, _AHEAD] + totals[:, _TIED] / 2))
+        runout_totals = totals.sum(axis=1)
+        ehs2 = squares / runout_totals
+        histogram = histograms / runout_totals[:, np.newaxis]
+
+    # nobody to get ahead of (or fall behind) means no potential
+    ppot, npot = np.nan_to_num(ppot), np.nan_to_num(npot)
+    ehs = hs * (1 - npot) + (1 - hs) * ppot
+    return hs, ehs, ehs2, ppot, npot, histogram
+
+
+def _kmeans(points, ehs, clusters_num, iterations=100):
+    """Cluster points with Lloyd's algorithm. Initial centers are the averages of clusters_num
+    equal slices of the points ordered by ehs, so results are deterministic."""
+    order = np.argsort(ehs, kind='mergesort')
+    labels = np.empty(len(points), dtype=np.intp)
+    labels[order] = np.arange(len(points)) * clusters_num // len(points)
+
+    centers = np.zeros((clusters_num, points.shape[1]))
+    for _ in range(iterations):
+        counts = np.bincount(labels, minlength=clusters_num)
+        for dimension in range(points.shape[1]):
+            sums = np.bincount(labels, points[:, dimension], clusters_num)
+            centers[:, dimension] = np.where(counts > 0, sums / np.maximum(counts, 1),
+                                             centers[:, dimension])
+        distances = ((points[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+        new_labels = np.argmin(distances, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+from poker.bankroll import hand_results
+from poker.room.pokerstars import PokerStarsHandHistory
+from poker.room.fulltiltpoker import FullTiltPokerHandHistory
+from . import stars_hands, ftp_hands
+
+
+def test_hand_results():
+    hands = [PokerStarsHandHistory(getattr(stars_hands, 'HAND%d' % num)) for num in (4, 2, 1, 3)]
+    # in date order: won the blinds with a raise and a bet on the flop, folded without
+    # posting anything, folded after posting an ante, then lost every chip all-in preflop
+    assert hand_results(hands, big_blinds=False).tolist() == [90, 0, -50, -11815]
+    assert hand_results(hands).tolist() == [90 / 20, 0, -50 / 600, -11815 / 800]
+
+
+def test_busting_in_the_last_hand_at_the_table_is_counted():
+    hand = PokerStarsHandHistory(stars_hands.HAND2)
+    assert hand_results([hand], big_blinds=False).tolist() == [-11815]
+
+
+def test_full_tilt_hand_results():
+    hand = FullTiltPokerHandHistory(ftp_hands.TURBO_SNG)
+    # folded the big blind to a raise
+    assert hand_results([hand], big_blinds=False).tolist() == [-30]
+
+
+def test_hands_of_unknown_rooms_are_skipped():
+    hand = PokerStarsHandHistory(stars_hands.HAND1)
+    hand.parse()
+    hand.raw = hand.raw.replace('PokerStars', 'Unknown Room', 1)
+    assert hand_results([hand]).tolist() == []
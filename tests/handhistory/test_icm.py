@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import pytest
+from poker import Strategy
+from poker.icm import icm, hand_history_icm, hand_history_fgs
+from poker.room.pokerstars import PokerStarsHandHistory
+from . import stars_hands
+
+
+def test_hand_history_icm():
+    hands = [PokerStarsHandHistory(stars_hands.HAND1), PokerStarsHandHistory(stars_hands.HAND4)]
+    results = hand_history_icm(hands, [50, 30, 20])
+    assert len(results) == 2
+    for hand, equities in zip(hands, results):
+        assert list(equities) == [player.name for player in hand.players]
+        assert sum(equities.values()) == pytest.approx(100)
+        stacks = [player.stack for player in hand.players]
+        assert list(equities.values()) == pytest.approx(icm(stacks, [50, 30, 20]))
+
+    first, second = results
+    # flavio766 more than tripled the starting stack, but chips are worth less the more you have
+    assert first['flavio766'] < second['flavio766'] < 3 * first['flavio766']
+    assert first['santy312'] == first['flavio766']
+
+
+def test_hand_history_fgs():
+    hands = [PokerStarsHandHistory(stars_hands.HAND2), PokerStarsHandHistory(stars_hands.HAND3)]
+    push = Strategy('[strategy]\ninaction = PUSH\n[10 BB]\nBTN = 22+ A2+\nSB = 22+ A2+ K2+\n')
+    results = hand_history_fgs(hands, [50, 30, 20], push, ante=75, samples=2000, random_state=0)
+    assert len(results) == 2
+    for hand, equities in zip(hands, results):
+        assert list(equities) == [player.name for player in hand.players if player.stack > 0]
+        assert sum(equities.values()) == pytest.approx(100)
+        icm_equities = icm([player.stack for player in hand.players if player.stack > 0],
+                           [50, 30, 20])
+        assert list(equities.values()) == pytest.approx(icm_equities, abs=1.5)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+from poker import _eval
+from poker.constants import Action
+from poker.room.pokerstars import PokerStarsHandHistory
+from poker.narrowing import hand_history_ranges
+from . import stars_hands
+
+
+def test_hand_history_ranges():
+    hand_history = PokerStarsHandHistory(stars_hands.HAND4)
+    ranges = hand_history_ranges(hand_history, priors={'flettl2': 'TT+ AQ+'})
+    assert 'W2lkm2n' not in ranges
+    assert list(ranges)[:3] == ['sinus91', 'STBIJUJA', 'flettl2']
+
+    decisions = ranges['flettl2']
+    assert [(decision.street, decision.action.action) for decision in decisions] == [
+        ('preflop', Action.RAISE), ('flop', Action.BET), ('turn', Action.BET),
+        ('river', Action.BET)]
+    river = decisions[-1].weights
+    # barreling every street narrows towards the made hands
+    assert river[_eval.combo_index('KcKs')] > river[_eval.combo_index('AcQh')] > 0
+    # the hero's J5 and the river king are dead
+    assert river[_eval.combo_index('KdKs')] == river[_eval.combo_index('AcJc')] == 0
+    assert not river[_eval.to_weights('TT+ AQ+') == 0].any()
+
+    calls = ranges['blak_douglas']
+    assert [decision.action.action for decision in calls][-2:] == [Action.CHECK, Action.FOLD]
+    assert np.all(np.diff([decision.weights.sum() for decision in calls]) < 0)
@@ -141,6 +141,12 @@ class TestHandWithFlopOnly:
     def test_flop_attributes(self, hand, attribute, expected_value):
         assert getattr(hand.flop, attribute) == expected_value
 
+    def test_flop_board_attributes_together(self, hand):
+        flop = hand.flop
+        assert (flop.is_rainbow, flop.is_monotone, flop.is_triplet, flop.has_pair,
+                flop.has_straightdraw, flop.has_gutshot, flop.has_flushdraw) == \
+            (True, False, False, True, False, True, False)
+
     def test_flop(self, hand):
         assert isinstance(hand.flop, _Street)
 
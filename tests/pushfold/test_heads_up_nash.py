@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker.preflop import PreflopTable
+from poker.pushfold import solve_push_fold, _HAND_COMBOS
+
+
+@pytest.fixture
+def table(testdir):
+    # hand table of PreflopTable.generate(samples=400, random_state=0)
+    hands = np.load(str(testdir.joinpath('pushfold/preflop_hands.npy')))
+    return PreflopTable(None, hands)
+
+
+def _played(probabilities):
+    return probabilities.dot(_HAND_COMBOS) / 1326
+
+
+def test_heads_up_10bb_nash_ranges(table):
+    # the known equilibrium: the small blind pushes about 58%, the big blind calls about 37%
+    solution = solve_push_fold(table, [10, 10])
+    assert _played(solution.push['sb']) == pytest.approx(0.58, abs=0.015)
+    assert _played(solution.call['sb', 'bb']) == pytest.approx(0.37, abs=0.015)
+    push, call = solution.push_range('sb'), solution.call_range('sb', 'bb')
+    assert 'Q7o' in push and 'K2o' in push and '72o' not in push
+    assert 'A2o' in call and 'K9o' in call and 'K2o' not in call
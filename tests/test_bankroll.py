@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker.bankroll import winrate, simulate_bankroll, risk_of_ruin
+
+
+def test_winrate():
+    results = [1, -1, 3, -3]
+    rate = winrate(results)
+    assert rate.winrate == 0
+    assert rate.std == pytest.approx(np.sqrt(20 / 3) * 10)
+    assert rate.interval == pytest.approx((-1.959963984540054 * rate.std / np.sqrt(0.04),
+                                           1.959963984540054 * rate.std / np.sqrt(0.04)))
+    assert rate.hands == 4
+
+    per_hand = winrate([2, 4], per=1)
+    assert (per_hand.winrate, per_hand.std) == pytest.approx((3, np.sqrt(2)))
+
+    with pytest.raises(ValueError):
+        winrate([1])
+
+
+def test_simulate_bankroll():
+    simulation = simulate_bankroll(5, 100, 50000, 1000, paths=20000, steps=200, random_state=0)
+    assert len(simulation.results) == len(simulation.downswings) == 20000
+    # 500 times 100 hands
+    assert simulation.results.mean() == pytest.approx(2500, abs=50)
+    assert simulation.results.std() == pytest.approx(100 * np.sqrt(500), rel=0.03)
+    assert (simulation.downswings >= 0).all()
+    assert (simulation.downswings >= -simulation.results).all()
+    # paths losing the bankroll are a part of the ones losing it forever
+    assert 0 < simulation.ruin < risk_of_ruin(5, 100, 1000)
+
+    same = simulate_bankroll(5, 100, 50000, 1000, paths=20000, steps=200, random_state=0)
+    assert (same.downswings == simulation.downswings).all()
+    assert simulate_bankroll(5, 100, 50000, paths=10).ruin is None
+
+
+def test_simulate_bankroll_without_variance():
+    simulation = simulate_bankroll(-1, 0, 1000, 5, paths=3, steps=1000)
+    assert simulation.results.tolist() == pytest.approx([-10] * 3)
+    assert simulation.downswings.tolist() == pytest.approx([10] * 3)
+    assert simulation.ruin == 1
+
+
+def test_risk_of_ruin():
+    assert risk_of_ruin(0, 100, 1000) == risk_of_ruin(-1, 100, 1000) == 1
+    assert risk_of_ruin(5, 100, 1000) == pytest.approx(np.exp(-1))
+    # the same per hand
+    assert risk_of_ruin(0.05, 10, 1000) == pytest.approx(np.exp(-1))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import time
+import numpy as np
+import pytest
+from poker.hand import Range
+from poker.cache import EquityCache, make_key
+
+
+BOARD = 'Ks 7s 2d'.split()
+
+
+class TestKey:
+    def test_suit_isomorphic_situations_have_the_same_key(self):
+        assert make_key('AsJs', 'QQ', BOARD) == make_key('AhJh', 'QQ', 'Kh 7h 2c'.split())
+        assert make_key('AsJs', 'QQ', BOARD, ['2h']) == \
+            make_key('AhJh', 'QQ', 'Kh 7h 2c'.split(), ['2s'])
+        assert make_key('AsJs', 'QQ', BOARD, ['2h']) != make_key('AsJs', 'QQ', BOARD, ['3s'])
+
+    def test_board_order_does_not_matter(self):
+        assert make_key('AsJs', 'QQ', BOARD) == make_key('AsJs', 'QQ', reversed(BOARD))
+
+    def test_different_situations(self):
+        assert make_key('AsJs', 'QQ', BOARD) != make_key('AsJs', 'QQ', 'Ks 7s 2s'.split())
+        assert make_key('AsJs', 'QQ', BOARD) != make_key('QQ', 'AsJs', BOARD)
+        assert make_key('AsJs', 'QQ') != make_key('AsJs', 'QQ', samples=100)
+
+    def test_range_string_and_object_are_the_same(self):
+        assert make_key('AK', 'QQ') == make_key(Range('AK'), Range('QQ'))
+
+    def test_random_state_objects_are_rejected(self):
+        assert make_key('AK', 'QQ', samples=10, random_state=1) == \
+            make_key('AK', 'QQ', samples=10, random_state=1)
+        with pytest.raises(ValueError):
+            make_key('AK', 'QQ', samples=10, random_state=np.random.RandomState(1))
+
+
+class TestCache:
+    def test_memory_hits_and_misses(self):
+        cache = EquityCache()
+        first = cache.equity('AsJs', 'QQ', BOARD)
+        assert cache.equity('AhJh', 'QQ', 'Kh 7h 2c'.split()) == first
+        assert cache.info.hits == 1
+        assert cache.info.misses == 1
+        assert cache.info.memory_size == 1
+
+    def test_lru_eviction(self):
+        cache = EquityCache(maxsize=2)
+        cache.get_or_calculate('a', lambda: 1)
+        cache.get_or_calculate('b', lambda: 2)
+        cache.get_or_calculate('a', lambda: 1)
+        cache.get_or_calculate('c', lambda: 3)
+        assert cache.get_or_calculate('a', lambda: None) == 1
+        assert cache.get_or_calculate('b', lambda: None) is None
+
+    def test_persistent(self, tmpdir):
+        filename = tmpdir / 'equity.sqlite'
+        cache = EquityCache(filename)
+        result = cache.equity('AsJs', 'QQ', BOARD)
+        cache.close()
+
+        cache = EquityCache(filename)
+        assert cache.equity('AsJs', 'QQ', BOARD) == result
+        assert cache.info.disk_hits == 1
+        assert cache.info.misses == 0
+
+    def test_evicts_least_recently_used_by_size(self, tmpdir):
+        cache = EquityCache(tmpdir / 'equity.sqlite', maxsize=0, max_bytes=300)
+        for key in 'abcdef':
+            cache.get_or_calculate(key, lambda: 'x' * 50)
+        assert 0 < cache.info.disk_size <= 300
+        assert cache.get_or_calculate('f', lambda: None) is not None
+        assert cache.get_or_calculate('a', lambda: None) is None
+
+    def test_memory_hits_keep_entries_on_disk(self, tmpdir):
+        cache = EquityCache(tmpdir / 'equity.sqlite', max_bytes=300)
+        for key in 'abcd':
+            cache.get_or_calculate(key, lambda: 'x' * 50)
+            time.sleep(0.001)
+        # only in memory, but the disk entry is used too
+        cache.get_or_calculate('a', lambda: None)
+        time.sleep(0.001)
+        for key in 'ef':
+            cache.get_or_calculate(key, lambda: 'x' * 50)
+        keys = {key for key, in cache._db.execute('SELECT key FROM equity')}
+        assert 'a' in keys and 'b' not in keys
+
+    def test_disk_hits_do_not_write(self, tmpdir):
+        cache = EquityCache(tmpdir / 'equity.sqlite', maxsize=0)
+        cache.get_or_calculate('a', lambda: 1)
+        changes = cache._db.total_changes
+        assert cache.get_or_calculate('a', lambda: None) == 1
+        assert cache._db.total_changes == changes
+        assert cache.info.disk_hits == 1
+
+    def test_seeded_calculations_are_cached(self):
+        cache = EquityCache()
+        first = cache.equity('AK', 'QQ', samples=100, random_state=1)
+        assert cache.equity('AK', 'QQ', samples=100, random_state=1) == first
+        assert cache.info.hits == 1
+
+    def test_evicts_by_age(self, tmpdir):
+        cache = EquityCache(tmpdir / 'equity.sqlite', maxsize=0, max_age=0.01)
+        cache.get_or_calculate('a', lambda: 1)
+        time.sleep(0.02)
+        assert cache.get_or_calculate('a', lambda: None) is None
+        assert cache.info.misses == 2
+
+    def test_expired_memory_entries_are_not_returned(self):
+        cache = EquityCache(max_age=0.01)
+        cache.get_or_calculate('a', lambda: 1)
+        assert cache.get_or_calculate('a', lambda: 2) == 1
+        time.sleep(0.02)
+        assert cache.get_or_calculate('a', lambda: 3) == 3
+        assert (cache.info.hits, cache.info.misses) == (1, 2)
+
+    def test_clear(self, tmpdir):
+        cache = EquityCache(tmpdir / 'equity.sqlite')
+        cache.get_or_calculate('a', lambda: 1)
+        cache.clear()
+        assert cache.info == (0, 0, 0, 0, 0)
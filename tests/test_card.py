@@ -3,6 +3,7 @@ from __future__ import unicode_literals, absolute_import, division, print_functi
 
 import pickle
 import pytest
+import numpy as np
 from poker.card import Card, Rank, Suit
 
 
@@ -126,6 +127,13 @@ def test_make_random_is_instance_of_Card_Rank_and_Suit():
     assert isinstance(card.suit, Suit)
 
 
+def test_make_random_with_random_state_is_reproducible():
+    first, second = np.random.RandomState(42), np.random.RandomState(42)
+    cards = [Card.make_random(first) for _ in range(10)]
+    assert cards == [Card.make_random(second) for _ in range(10)]
+    assert len(set(cards)) > 1
+
+
 def test_invalid_rank_or_card_raises_ValueError():
     with pytest.raises(ValueError):
         Card('Lh')
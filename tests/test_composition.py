@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import pytest
+import numpy as np
+from poker import _eval
+from poker.composition import (range_composition, combo_outs, range_outs, MADE_HANDS, DRAWS,
+                               HAND_CATEGORIES)
+from poker.hand import Range
+
+
+def _categories(range, board, dead=None):
+    composition = range_composition(range, board, dead)
+    made = {category: count.combos for category, count in composition.made.items()
+            if count.combos}
+    draws = {category: count.combos for category, count in composition.draws.items()
+             if count.combos}
+    return made, draws
+
+
+def test_every_combo_is_in_one_made_category():
+    composition = range_composition(Range('XX'), ['Ks', '8h', '3h'])
+    assert composition.combos == 1176
+    assert list(composition.made) == list(MADE_HANDS)
+    assert list(composition.draws) == list(DRAWS)
+    assert sum(count.combos for count in composition.made.values()) == 1176
+    assert sum(count.ratio for count in composition.made.values()) == pytest.approx(1)
+    assert composition.made['set'].combos == 9
+    assert composition.made['two_pair'].combos == 27
+    assert composition.made['overpair'].combos == 6
+    # no two ranks make four to a straight with a king, an eight and a three
+    assert composition.draws['oesd'].combos == composition.draws['gutshot'].combos == 0
+
+
+@pytest.mark.parametrize('combo, made, draws', [
+    ('AdKd', 'top_pair_top_kicker', []),
+    ('KcQd', 'top_pair_good_kicker', []),
+    ('Kc4h', 'top_pair_weak_kicker', ['backdoor_flush_draw']),
+    ('AhAd', 'overpair', ['backdoor_flush_draw']),
+    ('QcQd', 'underpair', []),
+    ('8c7c', 'second_pair', []),
+    ('4c4d', 'weak_pair', []),
+    ('8d3d', 'two_pair', []),
+    ('3c3d', 'set', []),
+    ('AcJc', 'ace_high', ['backdoor_straight_draw']),
+    ('7h6h', 'nothing', ['flush_draw', 'backdoor_straight_draw']),
+    ('Ah5d', 'ace_high', ['backdoor_flush_draw', 'backdoor_straight_draw']),
+])
+def test_combo_categories(combo, made, draws):
+    assert _categories(combo, ['Ks', '8h', '3h']) == ({made: 1}, {draw: 1 for draw in draws})
+
+
+@pytest.mark.parametrize('combo, draws', [
+    ('QcJd', ['oesd', 'two_overcards']),
+    ('8c7d', ['oesd']),
+    ('KcQd', ['gutshot', 'two_overcards']),
+    ('JhQh', ['flush_draw', 'oesd', 'combo_draw', 'two_overcards']),
+    ('Ah6h', ['flush_draw', 'backdoor_straight_draw']),
+])
+def test_straight_draws(combo, draws):
+    made, combo_draws = _categories(combo, ['Ts', '9h', '2h'])
+    assert combo_draws == {draw: 1 for draw in draws}
+
+
+def test_made_hands_and_no_draws_on_the_river():
+    made, draws = _categories('AKs QQ+ 98s', ['Ks', '8h', '3h', 'Td', '2c'])
+    assert made == {'set': 3, 'overpair': 6, 'underpair': 6, 'top_pair_top_kicker': 3,
+                    'weak_pair': 3}
+    assert draws == {}
+
+    made, draws = _categories('QJs', ['Ts', '9s', '8d', '2c'])
+    assert made == {'straight': 4}
+    assert draws == {'flush_draw': 1}
+
+
+def test_card_removal():
+    composition = range_composition('KK AA', ['Ks', '8h', '3h'], dead=['Ac'])
+    assert composition.combos == 6
+    assert composition.made['set'].combos == 3
+    assert composition.made['overpair'].ratio == pytest.approx(0.5)
+
+    with pytest.raises(ValueError):
+        range_composition('KsKh', ['Ks', '8h', '3h'])
+    with pytest.raises(ValueError):
+        range_composition('KK', ['Ks', '8h'])
+
+
+def _outs(combo, board, dead=None):
+    return {category: ''.join(unicode(card) for card in cards)
+            for category, cards in combo_outs(combo, board, dead).items() if cards}
+
+
+def test_flush_draw_outs():
+    assert _outs('AhKh', ['Qh', '7h', '2c']) == {
+        'pair': 'K♣K♦K♠A♣A♦A♠',
+        'flush': '2♥3♥4♥5♥6♥8♥9♥T♥J♥',
+    }
+    # dead cards are not outs
+    outs = _outs('AhKh', ['Qh', '7h', '2c'], dead=['Th', 'Ac'])
+    assert outs['flush'] == '2♥3♥4♥5♥6♥8♥9♥J♥'
+    assert outs['pair'] == 'K♣K♦K♠A♦A♠'
+
+
+def test_straight_draw_outs():
+    outs = _outs('9c8c', ['Ts', '7d', '2h'])
+    assert outs['straight'] == '6♣6♦6♥6♠J♣J♦J♥J♠'
+    # the flush card is an out to the flush, not to the straight
+    outs = _outs('7h6h', ['9h', '8d', '2h'])
+    assert outs['straight'] == '5♣5♦5♠T♣T♦T♠'
+    assert len(outs['flush']) == 9 * 2
+
+
+def test_counterfeit_cards_are_not_outs():
+    # pairing the board doesn't make a better hand with the hole cards
+    assert _outs('AsKd', ['Ks', '8h', '3h']) == {
+        'two_pair': '3♣3♦3♠8♣8♦8♠A♣A♦A♥',
+        'trips': 'K♣K♥',
+    }
+    assert _outs('AsKd', ['Ks', '8h', '3h', '8c']) == {'full_house': '8♦8♠K♣K♥'}
+    # the fourth heart plays the board flush
+    assert 'flush' not in _outs('2c2d', ['Ah', 'Kh', 'Qh', 'Jh'])
+
+
+def test_range_outs():
+    outs = range_outs(Range('XX'), ['Ks', '8h', '3h'], dead=['2c'])
+    assert outs.shape == (1326, len(HAND_CATEGORIES))
+    assert outs.dtype == np.int64
+    # conflicting combos have no outs
+    assert not outs[_eval.combo_index('KsQs')].any()
+    assert not outs[_eval.combo_index('2c2d')].any()
+    assert outs[_eval.combo_index('AsKd')].tolist() == [
+        0, 0, int(_eval.cards_to_mask(_eval.cards_to_array(['3c', '3d', '3s', '8c', '8d', '8s', 'Ac', 'Ad', 'Ah']))),
+        int(_eval.cards_to_mask(_eval.cards_to_array(['Kc', 'Kh']))), 0, 0, 0, 0, 0]
+
+    with pytest.raises(ValueError):
+        range_outs('AK', ['Ks', '8h', '3h', '8c', '2d'])
+    with pytest.raises(ValueError):
+        combo_outs('AK', ['Ks', '8h', '3h'])
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker import _eval
+from poker.card import Card
+from poker.hand import Combo
+from poker.constants import Action, Position
+from poker.dealer import (Agent, CallingStation, RandomAgent, RangeAgent, play_hand, play_hands,
+                          play_match, CHECK, RAISE)
+from poker.sng import _deal
+
+
+class Checker(Agent):
+    def act(self, decisions):
+        return np.full(len(decisions.tables), CHECK), np.zeros(len(decisions.tables))
+
+
+class MinRaiser(Agent):
+    def act(self, decisions):
+        return np.full(len(decisions.tables), RAISE), np.zeros(len(decisions.tables))
+
+
+def _side_pots(stacks, holes, board):
+    """Final stacks after everybody went all-in, pot by pot."""
+    values = [_eval.evaluate(np.concatenate([hole, board])[np.newaxis])[0] for hole in holes]
+    final = np.zeros(len(stacks), dtype=np.int64)
+    lower = 0
+    for upper in sorted(set(stacks)):
+        pot = sum(min(stack, upper) - lower for stack in stacks if stack > lower)
+        eligible = [seat for seat, stack in enumerate(stacks) if stack >= upper]
+        best = max(values[seat] for seat in eligible)
+        winners = [seat for seat in eligible if values[seat] == best]
+        for seat in winners:
+            final[seat] += pot // len(winners)
+        final[winners[0]] += pot % len(winners)
+        lower = upper
+    return final
+
+
+def test_side_pots():
+    random_state = np.random.RandomState(0)
+    stacks = random_state.randint(1, 500, size=(2000, 4))
+    # pushes go around from the first seat after the big blind, the button is the last seat
+    final = play_hands([RangeAgent('XX')] * 4, stacks, 1, 2, buttons=np.full(2000, 3),
+                       random_state=1)
+    assert (final.sum(axis=1) == stacks.sum(axis=1)).all()
+    cards = _deal(2000, 13, np.random.RandomState(1))
+    for table in range(200):
+        holes = cards[table, :8].reshape(4, 2)
+        assert final[table].tolist() == _side_pots(stacks[table], holes, cards[table, 8:]).tolist()
+
+
+def test_hand():
+    hand = play_hand([CallingStation(), CallingStation(), Checker()], [200, 200, 150], 1, 2,
+                     button=0, names=['btn', 'sb', 'bb'], random_state=3)
+    assert [player.name for player in hand.players] == ['btn', 'sb', 'bb']
+    assert [player.stack for player in hand.players] == [200, 200, 150]
+    assert all(isinstance(player.combo, Combo) for player in hand.players)
+    assert hand.positions == (Position.BTN, Position.SB, Position.BB)
+    assert len(hand.board) == 5 and all(isinstance(card, Card) for card in hand.board)
+    assert [(street, action.name, action.action, action.amount)
+            for street, action in hand.actions[:4]] == [
+        ('preflop', 'btn', Action.CALL, 2), ('preflop', 'sb', Action.CALL, 1),
+        ('preflop', 'bb', Action.CHECK, None), ('flop', 'sb', Action.CHECK, None)]
+    assert len(hand.actions) == 3 + 3 * 3
+    assert sum(hand.stacks) == 550
+
+
+def test_heads_up_and_corrections():
+    hand = play_hand([MinRaiser(), Checker()], [100, 100], 1, 2, button=0, random_state=0)
+    assert hand.positions == (Position.SB, Position.BB)
+    # the small blind raises first preflop, the big blind can not check a raise
+    assert [(street, action.name, action.action, action.amount)
+            for street, action in hand.actions] == [
+        ('preflop', 'Seat 1', Action.RAISE, 4), ('preflop', 'Seat 2', Action.FOLD, None)]
+    assert hand.stacks == (102, 98)
+    assert hand.board == ()
+
+    hand = play_hand([Checker(), MinRaiser()], [100, 100], 1, 2, button=0, random_state=0)
+    # checking the big blind is a fold
+    assert [(street, action.name, action.action) for street, action in hand.actions] == [
+        ('preflop', 'Seat 1', Action.FOLD)]
+    assert hand.stacks == (99, 101)
+
+
+def test_betting_rounds():
+    hand = play_hand([MinRaiser(), CallingStation(), CallingStation()], [30, 30, 30], 1, 2,
+                     button=0, random_state=5)
+    actions = [(street, action.name, action.action, action.amount)
+               for street, action in hand.actions]
+    assert actions[:3] == [('preflop', 'Seat 1', Action.RAISE, 4),
+                           ('preflop', 'Seat 2', Action.CALL, 3),
+                           ('preflop', 'Seat 3', Action.CALL, 2)]
+    # the first postflop bet is a bet of the big blind
+    assert ('flop', 'Seat 1', Action.BET, 2) in actions
+    assert sum(hand.stacks) == 90
+
+
+class RaiseRecorder(MinRaiser):
+    def __init__(self):
+        self.can_raise = []
+
+    def act(self, decisions):
+        self.can_raise.extend(decisions.can_raise.tolist())
+        return super(RaiseRecorder, self).act(decisions)
+
+
+def _preflop_actions(hand):
+    return [(action.name, action.action, action.amount)
+            for street, action in hand.actions if street == 'preflop']
+
+
+def test_incomplete_all_in_does_not_reopen_action():
+    # the small blind's all-in to 5 is less than a full raise over 4
+    raiser = RaiseRecorder()
+    hand = play_hand([raiser, RangeAgent('XX'), CallingStation()], [100, 5, 100], 1, 2,
+                     button=0, random_state=0)
+    assert _preflop_actions(hand) == [
+        ('Seat 1', Action.RAISE, 4), ('Seat 2', Action.RAISE, 5),
+        ('Seat 3', Action.CALL, 3), ('Seat 1', Action.CALL, 1)]
+    assert raiser.can_raise[:2] == [True, False]
+    assert sum(hand.stacks) == 205
+
+    # an all-in to 6 is a full raise, the first raiser can raise again
+    hand = play_hand([MinRaiser(), RangeAgent('XX'), CallingStation()], [100, 6, 100], 1, 2,
+                     button=0, random_state=0)
+    assert _preflop_actions(hand)[:4] == [
+        ('Seat 1', Action.RAISE, 4), ('Seat 2', Action.RAISE, 6),
+        ('Seat 3', Action.CALL, 4), ('Seat 1', Action.RAISE, 8)]
+
+
+def test_big_blind_all_in_for_less():
+    # the big blind posts its only chip, that is the bet to call
+    hand = play_hand([CallingStation(), Checker(), Checker()], [100, 100, 1], 1, 2, button=0,
+                     random_state=0)
+    assert _preflop_actions(hand) == [('Seat 1', Action.CALL, 1), ('Seat 2', Action.CHECK, None)]
+    assert sum(hand.stacks) == 201
+
+    # the smallest raise is still a big blind over it
+    hand = play_hand([MinRaiser(), Checker(), Checker()], [100, 100, 1], 1, 2, button=0,
+                     random_state=0)
+    assert _preflop_actions(hand)[0] == ('Seat 1', Action.RAISE, 3)
+
+
+def test_sitting_out():
+    hand = play_hand([CallingStation(), RangeAgent('XX'), CallingStation()], [100, 0, 50], 1, 2,
+                     button=2, random_state=0)
+    assert hand.players[1].combo is None and hand.positions[1] is None
+    assert hand.positions == (Position.BB, None, Position.SB)
+    assert all(action.name != 'Seat 2' for street, action in hand.actions)
+    assert hand.stacks[1] == 0 and sum(hand.stacks) == 150
+
+
+def test_match():
+    results = play_match([RandomAgent(random_state=0), CallingStation(),
+                          RangeAgent('JJ+ AK')], 3000, 200, 1, 2, tables=1000, random_state=0)
+    assert sum(result.winnings for result in results) == pytest.approx(0)
+    for result in results:
+        assert result.interval[0] < result.winnings < result.interval[1]
+
+
+def test_invalid_tables():
+    with pytest.raises(ValueError):
+        play_hand([CallingStation()] * 3, [100, 100], 1, 2)
+    with pytest.raises(ValueError):
+        play_hand([CallingStation()] * 2, [100, 0], 1, 2)
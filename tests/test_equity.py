@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import multiprocessing
+import numpy as np
+import pytest
+from poker.hand import Hand, Combo, Range
+from poker.card import Card
+from poker.equity import (equity, batch_equity, sample_equity, combo_equities, hand_equities,
+                          hand_grid, multiway_equity, EquitySession)
+from poker import _eval, equity as equity_module
+from poker._common import _spawn_random_states, _parallel_map
+
+
+def _value(cards):
+    return _eval.evaluate(_eval.cards_to_array(cards.split()))
+
+
+class TestEvaluate:
+    @pytest.mark.parametrize('cards, category', (
+        ('As Ks Qs Js Ts 2d 3c', _eval.STRAIGHT_FLUSH),
+        ('7c 7d 7h 7s Ks 2d 3c', _eval.QUADS),
+        ('7c 7d 7h Ks Kd 2d 3c', _eval.FULL_HOUSE),
+        ('7c 7d 7h Ks Kd Kh 3c', _eval.FULL_HOUSE),
+        ('2h 7h 9h Jh Kh Kd 3c', _eval.FLUSH),
+        ('Ah 2c 3d 4s 5h Kd Qc', _eval.STRAIGHT),
+        ('7c 7d 7h 2s 3d 9h Jc', _eval.TRIPS),
+        ('7c 7d 8h 8s 3d 3h Jc', _eval.TWO_PAIR),
+        ('7c 7d 8h 9s Jd Ah 2c', _eval.PAIR),
+        ('2c 4d 6h 8s Td Qh Kc', _eval.HIGH_CARD),
+        ('2c 4d 6h 8s Td', _eval.HIGH_CARD),
+    ))
+    def test_categories(self, cards, category):
+        assert _value(cards) >> _eval.CATEGORY_SHIFT == category
+
+    def test_wheel_is_the_lowest_straight(self):
+        assert _value('Ah 2c 3d 4s 5h') < _value('2c 3d 4s 5h 6c')
+
+    def test_kickers(self):
+        assert _value('Ac Ad Kh Qs 9d 3c 2c') > _value('Ac Ad Kh Qs 8d 3c 2c')
+        assert _value('Ac Ad Kh Qs 9d 3c 2c') == _value('Ah As Kd Qc 9h 4c 2c')
+
+    def test_two_pairs_kicker_can_be_the_third_pair(self):
+        assert _value('Kc Kd 7h 7s 5d 5c 2c') < _value('Kc Kd 7h 7s 6d 5c 2c')
+
+    def test_shape_is_kept(self):
+        cards = _eval.cards_to_array('As Ks Qs Js Ts 2d 3c'.split())
+        assert _eval.evaluate(np.tile(cards, (3, 2, 1))).shape == (3, 2)
+
+
+def test_combinations():
+    assert _eval.combinations(6, 3).tolist() == [list(c) for c in
+                                                 __import__('itertools').combinations(range(6), 3)]
+    assert _eval.combinations(48, 5).shape == (1712304, 5)
+
+
+def test_indexes():
+    assert len(set(_eval.COMBOS)) == 1326
+    assert _eval.COMBOS[_eval.combo_index('AsAh')] == Combo('AsAh')
+    assert _eval.HANDS[_eval.COMBO_HANDS[_eval.combo_index('AsKs')]] == Combo('AsKs').to_hand()
+    assert _eval.to_weights(Range('AKs 22')).sum() == 10
+
+
+class TestEquity:
+    def test_river(self):
+        board = 'Ah Kd 7c 2s 3d'.split()
+        assert equity('AsQs', 'KsQh', board).equity == 1
+        assert equity('KsQh', 'AsQs', board).equity == 0
+        assert equity('Qc6c', 'Qh6h', board) == (0.5, 0, 1)
+
+    def test_turn_outs(self):
+        # 7 spades give a flush, 3s a full house and Qs quads to villain
+        result = equity('AsKs', 'QdQc', 'Qh 7s 2s 3d'.split())
+        assert result.equity == pytest.approx(7 / 44)
+
+    def test_exact_preflop(self):
+        assert equity('AsAh', 'KdKc').equity == pytest.approx(0.81255, abs=1e-5)
+
+    def test_range_against_itself_is_even(self):
+        assert equity('XX', 'XX', 'Ah Kd 7c 2s 3d'.split()).equity == pytest.approx(0.5)
+        assert equity('QQ+ AK', 'QQ+ AK', 'Jh Td 3c'.split()).equity == pytest.approx(0.5)
+
+    def test_card_removal_between_ranges(self):
+        # AsKs can only be against QQ-JJ on this board
+        assert equity('AsKs', 'AA QQ JJ', 'Ac Ad 2c'.split()).equity == \
+            equity('AsKs', 'QQ JJ', 'Ac Ad 2c'.split()).equity
+
+    def test_monte_carlo(self):
+        np.random.seed(7)
+        assert equity('AA', 'KK', samples=20000).equity == pytest.approx(0.82, abs=0.01)
+
+    def test_impossible_matchup_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            equity('AsAh', 'AsKs')
+
+    def test_sorted_and_pairwise_comparison_give_the_same_results(self, monkeypatch):
+        board = _eval.cards_to_array('As Kd 7c 2h'.split())
+        hero, villain = _eval.to_weights('QQ+ AK 76s'), _eval.to_weights('XX')
+        villain *= np.linspace(0.1, 1, 1326)
+        sorted_results = equity_module._showdown(hero, villain, board)
+        monkeypatch.setattr(equity_module, '_DENSE_LIMIT', 1326 * 1326)
+        pairwise_results = equity_module._showdown(hero, villain, board)
+        for sorted_result, pairwise_result in zip(sorted_results, pairwise_results):
+            assert np.allclose(sorted_result, pairwise_result)
+
+
+class TestComboEquities:
+    board = 'Ah Kd 7c 2s'.split()
+
+    def test_every_combo_in_one_pass(self):
+        equities = combo_equities('AK QQ', 'XX', self.board)
+        assert equities.shape == (1326,)
+        assert equities[_eval.combo_index('AsKs')] == \
+            pytest.approx(equity('AsKs', 'XX', self.board).equity)
+        assert equities[_eval.combo_index('QsQc')] == \
+            pytest.approx(equity('QsQc', 'XX', self.board).equity)
+
+    def test_combos_not_in_range_are_nan(self):
+        equities = combo_equities('AK QQ', 'XX', self.board)
+        assert np.isnan(equities[_eval.combo_index('JsJc')])
+        # conflicting with the board
+        assert np.isnan(equities[_eval.combo_index('AhKs')])
+        assert np.count_nonzero(~np.isnan(equities)) == 3 * 3 + 6
+
+    def test_hand_equities(self):
+        equities = hand_equities('AK QQ', 'XX', self.board)
+        assert set(equities) == {Hand('AKs'), Hand('AKo'), Hand('QQ')}
+        assert equities[Hand('QQ')] == pytest.approx(equity('QQ', 'XX', self.board).equity)
+
+    def test_hand_grid(self):
+        grid = hand_grid({Hand('AA'): 1, Hand('AKs'): 0.5, Hand('AKo'): 0.25, Hand('32o'): 0})
+        assert grid[0, 0] == 1
+        assert grid[0, 1] == 0.5
+        assert grid[1, 0] == 0.25
+        assert grid[12, 11] == 0
+        assert np.isnan(grid[5, 5])
+
+
+class TestMultiwayEquity:
+    board = 'Ah 7d 2c'.split()
+
+    def test_heads_up_is_the_same_as_equity(self):
+        assert multiway_equity(['AsAh', 'KdKc'], self.board[1:])[0] == \
+            pytest.approx(equity('AsAh', 'KdKc', self.board[1:]))
+
+    def test_exact_three_way(self):
+        results = multiway_equity(['AsKs', 'QdQc', 'JhTh'], self.board)
+        assert sum(result.equity for result in results) == pytest.approx(1)
+        assert results[0].equity == pytest.approx(0.835, abs=0.001)
+
+    def test_split_pots(self):
+        # the board plays for everyone
+        results = multiway_equity(['2s3s', '2h3h', '4c4d'], 'Ac Kc Qc Jc Tc'.split())
+        assert [result.equity for result in results] == pytest.approx([1 / 3] * 3)
+        assert all(result.tie == 1 for result in results)
+
+    def test_sampled_ranges_with_card_removal(self):
+        np.random.seed(3)
+        sampled = multiway_equity(['AK QQ', 'XX'], self.board, samples=50000)[0]
+        assert sampled.equity == pytest.approx(equity('AK QQ', 'XX', self.board).equity,
+                                               abs=0.01)
+
+    def test_sampled_ten_players(self):
+        np.random.seed(4)
+        results = multiway_equity(['AsAh'] + ['XX'] * 9, samples=20000)
+        assert sum(result.equity for result in results) == pytest.approx(1)
+        assert results[0].equity == pytest.approx(0.31, abs=0.02)
+
+    def test_exact_needs_combos(self):
+        with pytest.raises(ValueError):
+            multiway_equity(['AK', 'QQ', 'JJ'])
+
+    @pytest.mark.parametrize('players', (['AsAh'], ['XX'] * 11, ['AsAh', 'AsKs', 'QQ']))
+    def test_invalid_players_raise_ValueError(self, players):
+        with pytest.raises(ValueError):
+            multiway_equity(players, samples=100)
+
+
+class TestEquitySession:
+    hero, villain = 'AsKs', 'QQ JJ 98s'
+    board = 'Qh 7s 2s 3d Ts'.split()
+
+    def test_streets_are_the_same_as_calculated_separately(self):
+        session = EquitySession(self.hero, self.villain)
+        for street_end in (3, 4, 5):
+            result = session.add(*self.board[len(session.board):street_end])
+            assert result == pytest.approx(equity(self.hero, self.villain,
+                                                  self.board[:street_end]))
+
+    def test_streets_from_hand_history_board(self):
+        session = EquitySession(self.hero, self.villain)
+        results = session.streets(tuple(Card(card) for card in self.board[:4]))
+        assert len(results) == 2
+        assert results[1] == pytest.approx(equity(self.hero, self.villain, self.board[:4]))
+        assert len(session.streets(self.board)) == 1
+
+    def test_board_not_starting_with_added_cards_raises_ValueError(self):
+        session = EquitySession(self.hero, self.villain)
+        session.add('Qh', '7s', '2s')
+        with pytest.raises(ValueError):
+            session.streets('Qh 7s 3d 2s'.split())
+
+    @pytest.mark.parametrize('cards', (['Qh'], ['Ah', 'Ad', 'Ac', '2c', '2d', '2h']))
+    def test_invalid_cards_raise_ValueError(self, cards):
+        session = EquitySession(self.hero, self.villain)
+        session.add('Qh', '7s', '2s')
+        with pytest.raises(ValueError):
+            session.add(*cards)
+
+
+class TestRandomState:
+    board = ['Qh', '7s', '2s']
+
+    def test_same_seed_same_result(self):
+        first = equity('AsKs', 'QQ JJ', self.board, samples=1000, random_state=5)
+        assert first == equity('AsKs', 'QQ JJ', self.board, samples=1000, random_state=5)
+        assert first != equity('AsKs', 'QQ JJ', self.board, samples=1000, random_state=6)
+
+    def test_multiway_same_seed_same_result(self):
+        players = ['AsKs', 'QQ JJ', 'XX']
+        first = multiway_equity(players, self.board, samples=1000, random_state=5)
+        random_state = np.random.RandomState(5)
+        assert first == multiway_equity(players, self.board, samples=1000,
+                                        random_state=random_state)
+
+    def test_spawned_random_states_are_independent_and_reproducible(self):
+        first = [state.randint(1 << 30) for state in _spawn_random_states(7, 4)]
+        assert first == [state.randint(1 << 30) for state in _spawn_random_states(7, 4)]
+        assert len(set(first)) == 4
+
+    def test_parallel_map_stops_the_workers(self):
+        children = multiprocessing.active_children()
+        assert _parallel_map(abs, [-1, 2, -3], processes=2) == [1, 2, 3]
+        assert _parallel_map(abs, [-1, 2, -3]) == [1, 2, 3]
+        with pytest.raises(ValueError):
+            _parallel_map(int, ['1', 'x'], processes=2)
+        assert multiprocessing.active_children() == children
+
+
+class TestSampleEquity:
+    board = ['Qh', '7s', '2d']
+
+    @pytest.mark.parametrize('method', equity_module.SAMPLING_METHODS)
+    def test_close_to_exact(self, method):
+        exact = equity('AsKs', 'QQ JJ 98s', self.board).equity
+        result = sample_equity('AsKs', 'QQ JJ 98s', self.board, 20000, method, random_state=1)
+        assert result.equity == pytest.approx(exact, abs=4 * result.stderr)
+        assert 0.002 < result.stderr < 0.006
+        assert result.equity == pytest.approx(result.win + result.tie / 2)
+
+    def test_effective_samples_of_plain_sampling(self):
+        result = sample_equity('AK', 'QQ', samples=1000, method='plain', random_state=1)
+        assert result.effective_samples == pytest.approx(1000)
+
+    def test_stratified_samples_every_hero_combo(self, monkeypatch):
+        sampled = []
+        original = equity_module._sample_runouts
+
+        def sample_runouts(board, masks, random_state):
+            sampled.extend(masks)
+            return original(board, masks, random_state)
+
+        monkeypatch.setattr(equity_module, '_sample_runouts', sample_runouts)
+        sample_equity('AA', 'KK', samples=12, method='stratified', random_state=1)
+        aces = {int(mask) & ~(0xF << 44) for mask in sampled}
+        assert len(aces) == 6
+
+    def test_same_seed_same_result(self):
+        first = sample_equity('AK', 'XX', samples=500, random_state=3)
+        assert first == sample_equity('AK', 'XX', samples=500, random_state=3)
+
+    def test_invalid_method_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            sample_equity('AK', 'QQ', method='quasi')
+
+    def test_impossible_matchup_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            sample_equity('AsAh', 'AsAd')
+
+
+class TestBatchEquity:
+    queries = [
+        ('AsKs', 'QQ JJ', 'Qh 7s 2d'.split()),
+        ('AhKh', 'QQ JJ', 'Qs 7h 2d'.split()),
+        (Combo('AsKd'), Combo('QhQc'), 'Qs 7h 2d 3c'.split()),
+        ('AsKd', 'QhQc', 'Qs 7h 2d 3c 4s'.split()),
+        ('AhKc', 'QsQd', 'Qh 7s 2c'.split()),
+        ('AK', 'XX', 'Qs 7h 2d 3c'.split()),
+    ]
+
+    def test_same_as_one_by_one(self):
+        results = batch_equity(self.queries)
+        assert results == [pytest.approx(equity(*query)) for query in self.queries]
+
+    def test_isomorphic_queries_are_calculated_once(self, monkeypatch):
+        calculated = []
+        original = equity_module._board_equities
+
+        def board_equities(board, dead, queries, samples, random_state):
+            calculated.extend(queries)
+            return original(board, dead, queries, samples, random_state)
+
+        monkeypatch.setattr(equity_module, '_board_equities', board_equities)
+        batch_equity(self.queries[:2] + [self.queries[-1]] * 3)
+        assert len(calculated) == 2
+
+    def test_impossible_query_is_None(self):
+        results = batch_equity([('AsAh', 'AsAd', None), ('AsKs', 'QQ', 'As 7h 2d'.split())])
+        assert results[0] is None
+        assert results[1] is None
+
+    def test_preflop_combos_share_the_runouts(self):
+        results = batch_equity([('AsAh', 'KdKc', None), ('AcAd', 'KhKs', None)])
+        assert results[0] == results[1]
+        assert results[0].equity == pytest.approx(0.8125549)
+
+    def test_samples(self):
+        results = batch_equity(self.queries[:4], samples=5000, random_state=1)
+        for query, result in zip(self.queries, results):
+            assert result.equity == pytest.approx(equity(*query).equity, abs=0.02)
+
+
+class TestDeadCards:
+    board = ['Qh', '7s', '2d']
+    dead = ['Qs', 'Qc', 'Js']
+
+    def test_dead_cards_are_out_of_the_deck(self):
+        cards = _eval.cards_to_array(['As', 'Ks', 'Jh', 'Jd'] + self.board + self.dead)
+        deck = np.array([card for card in range(52) if card not in cards])
+        runouts = deck[_eval.combinations(len(deck), 2)]
+        values = []
+        for hole_cards in (cards[:2], cards[2:4]):
+            hands = np.empty((len(runouts), 7), dtype=np.int8)
+            hands[:, :2], hands[:, 2:5], hands[:, 5:] = hole_cards, cards[4:7], runouts
+            values.append(_eval.evaluate(hands))
+        expected = (values[0] > values[1]).mean() + (values[0] == values[1]).mean() / 2
+
+        result = equity('AsKs', 'JhJd', self.board, dead=self.dead)
+        assert result.equity == pytest.approx(expected)
+        assert result != equity('AsKs', 'JhJd', self.board)
+
+    def test_range_combos_with_dead_cards_are_removed(self):
+        result = equity('AsKs', 'QQ JJ', self.board, dead=self.dead)
+        assert result == equity('AsKs', 'JcJd JcJh JdJh', self.board, dead=self.dead)
+
+    def test_every_api_accepts_dead_cards(self):
+        expected = equity('AsKs', 'QQ JJ', self.board, dead=self.dead)
+        assert batch_equity([('AsKs', 'QQ JJ', self.board, self.dead)]) == [expected]
+        session = EquitySession('AsKs', 'QQ JJ', dead=self.dead)
+        assert session.add(*self.board) == pytest.approx(expected)
+        sampled = sample_equity('AsKs', 'QQ JJ', self.board, 20000, dead=self.dead,
+                                random_state=1)
+        assert sampled.equity == pytest.approx(expected.equity, abs=0.015)
+        multiway = multiway_equity(['AsKs', 'QQ JJ'], self.board, 20000, 1, self.dead)
+        assert multiway[0].equity == pytest.approx(expected.equity, abs=0.015)
+
+    def test_all_combos_dead_raises_ValueError(self):
+        with pytest.raises(ValueError):
+            equity('AsKs', 'QQ', self.board, dead=self.dead)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker.flops import canonical_flops, FlopTable, _every_flop
+from poker.equity import equity
+from poker import _eval
+
+
+def test_canonical_flops():
+    flops, counts = canonical_flops()
+    assert flops.shape == (1755, 3)
+    assert counts.sum() == 22100
+    assert set(counts) == {4, 12, 24}
+
+    # every flop is isomorphic to exactly one canonical flop
+    canonical = set()
+    for flop in flops:
+        permuted = {tuple(sorted(cards)) for cards in _eval.PERMUTED_CARDS[:, flop]}
+        assert not permuted & canonical
+        canonical |= permuted
+    assert len(canonical) == 22100
+
+
+def test_flop_results_are_the_same_as_equity():
+    flops = [['Ah', '7d', '2c'], ['Ks', 'Qs', 'Ts'], ['6h', '6d', '5c']]
+    table = FlopTable.generate('QQ+ AKs', 'TT+ AQ+ KQs', flops, turns=True)
+    for flop, flop_equity, distribution in zip(flops, table.equity, table.distribution):
+        assert flop_equity == pytest.approx(equity('QQ+ AKs', 'TT+ AQ+ KQs', flop).equity)
+        assert distribution.sum() == pytest.approx(1)
+
+    assert table.turn_equity.shape == (3, 52)
+    assert np.isnan(table.turn_equity[0, _eval.cards_to_array(flops[0])]).all()
+    turn_equity = equity('QQ+ AKs', 'TT+ AQ+ KQs', flops[1] + ['2h']).equity
+    assert table.turn_equity[1, _eval.card_index('2h')] == pytest.approx(turn_equity)
+
+
+def test_asymmetric_ranges_use_every_flop():
+    flops, counts = _every_flop(_eval.to_weights('22+ AK'), _eval.to_weights('XX'))
+    assert len(flops) == 1755 and counts.sum() == 22100
+
+    # isomorphic flops are different for a specific combo, one can not stand for the others
+    isomorphic = [['Ks', 'Qs', 'Ts'], ['Kh', 'Qh', 'Th']]
+    table = FlopTable.generate('AsJs', 'QQ', isomorphic)
+    assert table.equity[0] == 1 > table.equity[1]
+
+    for hero, villain in (('AsJs', 'QQ'), ('QQ', _eval.to_weights('QQ') * np.arange(1326))):
+        flops, counts = _every_flop(_eval.to_weights(hero), _eval.to_weights(villain))
+        assert len(flops) == 22100 and (counts == 1).all()
+        assert len({tuple(sorted(flop)) for flop in flops}) == 22100
+
+
+def test_nut_advantage():
+    flops = [['Kd', '7s', '2c'], ['As', '7d', '2h']]
+    table = FlopTable.generate('AA', 'KK', flops, samples=10, random_state=0)
+    # overpair of aces is among the strongest 5% of the hands on K72
+    assert table.hero_nuts.tolist() == [1, 1]
+    assert table.villain_nuts.tolist() == [1, 0]
+
+    table = FlopTable.generate('AA', '77', flops, samples=10, random_state=0, nut_ratio=0.02)
+    assert table.hero_nuts.tolist() == [0, 1]
+    assert table.villain_nuts.tolist() == [1, 1]
+    assert table.nut_advantage.tolist() == [-1, 0]
+
+
+def test_generate_save_and_load(tmpdir):
+    table = FlopTable.generate('AA KK', 'QQ JJ', samples=5, random_state=1, processes=2)
+    assert table.flops.shape == (1755, 3)
+    assert table.turn_equity is None
+    assert 0.7 < table.average_equity < 0.9
+
+    filename = tmpdir.join('flops.npz')
+    table.save(filename)
+    loaded = FlopTable.load(filename)
+    for field in FlopTable.fields[:-1]:
+        assert np.array_equal(getattr(loaded, field), getattr(table, field))
+    assert loaded.turn_equity is None
+
+    again = FlopTable.generate('AA KK', 'QQ JJ', samples=5, random_state=1)
+    assert np.array_equal(again.equity, table.equity)
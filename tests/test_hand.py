@@ -164,6 +164,12 @@ def test_make_random():
     assert isinstance(hand.second, Rank)
 
 
+def test_make_random_with_seed_is_reproducible():
+    hands = [Hand.make_random(seed) for seed in range(20)]
+    assert hands == [Hand.make_random(seed) for seed in range(20)]
+    assert len(set(hands)) > 1
+
+
 def test_hash():
     hand1 = Hand('22')
     hand2 = Hand('22')
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import itertools
+import pytest
+import numpy as np
+from poker import Strategy
+from poker.icm import finish_probabilities, icm, fgs_icm
+
+
+# nobody pushes at a short handed table
+FOLD = Strategy('[strategy]\ninaction = PUSH\n[10 BB]\nUTG = AA\n')
+
+PUSH = Strategy("""
+[strategy]
+inaction = PUSH
+outaction = FOLD
+
+[10 BB]
+BTN = 22+ A2+ K2+ Q2+
+SB = 22+ A2+ K2+ Q2+ J2+
+
+[10 BB vs BTN]
+inaction = CALL
+SB = 55+ A7+ KT+
+BB = 44+ A5+ KT+
+
+[10 BB vs SB]
+inaction = CALL
+BB = 22+ A2+ K8+ QT+
+""")
+
+
+def _permutation_icm(stacks, payouts):
+    """Malmuth-Harville by every finishing order."""
+    equities = np.zeros(len(stacks))
+    for order in itertools.permutations(range(len(stacks))):
+        probability, remaining = 1, sum(stacks)
+        for player in order:
+            probability *= stacks[player] / remaining
+            remaining -= stacks[player]
+        for place, player in enumerate(order[:len(payouts)]):
+            equities[player] += probability * payouts[place]
+    return equities
+
+
+@pytest.mark.parametrize('stacks, payouts', [
+    ([5000, 3000, 1500, 500, 2500, 800], [50, 30, 20]),
+    ([1000, 1000, 1000], [65, 35]),
+    ([7000, 200, 1300, 4500, 2000, 2000, 300], [40, 25, 15, 10, 6, 4]),
+])
+def test_exact_icm(stacks, payouts):
+    assert icm(stacks, payouts) == pytest.approx(_permutation_icm(stacks, payouts))
+
+
+def test_simple_cases():
+    assert icm([1000, 3000], [100]) == pytest.approx([25, 75])
+    # the second place payout is sure for both
+    assert icm([1000, 3000], [100, 50]) == pytest.approx([62.5, 87.5])
+    # payouts for more places than players were paid to busted players
+    assert icm([1000, 3000], [100, 50, 20]) == pytest.approx([62.5, 87.5])
+    assert icm([1500], [100, 50]) == pytest.approx([100])
+
+
+def test_finish_probabilities():
+    probabilities = finish_probabilities([5000, 3000, 1500, 500])
+    assert probabilities.shape == (4, 4)
+    assert probabilities.sum(axis=0) == pytest.approx(1)
+    assert probabilities.sum(axis=1) == pytest.approx(1)
+    assert probabilities[:, 0] == pytest.approx([0.5, 0.3, 0.15, 0.05])
+    # bigger stacks are less likely to finish last
+    assert (np.diff(probabilities[:, -1]) > 0).all()
+    assert finish_probabilities([5000, 3000, 1500, 500], places=2) == pytest.approx(
+        probabilities[:, :2])
+
+
+def test_sampled_icm():
+    stacks, payouts = [7000, 200, 1300, 4500, 2000, 2000, 300], [40, 25, 15, 10, 6, 4]
+    sampled = icm(stacks, payouts, samples=100000, random_state=0)
+    assert sampled == pytest.approx(icm(stacks, payouts), abs=0.3)
+    assert sampled.sum() == pytest.approx(100)
+    assert (sampled == icm(stacks, payouts, samples=100000, random_state=0)).all()
+
+
+def test_large_field():
+    random_state = np.random.RandomState(0)
+    stacks = random_state.randint(500, 20000, 300)
+    payouts = np.linspace(10, 1, 30)
+    probabilities = finish_probabilities(stacks, 30, samples=20000, random_state=1)
+    assert probabilities.shape == (300, 30)
+    assert probabilities.sum(axis=0) == pytest.approx(1)
+    assert probabilities[:, 0] == pytest.approx(stacks / stacks.sum(), abs=0.003)
+    assert icm(stacks, payouts, samples=20000, random_state=1).sum() == pytest.approx(
+        payouts.sum())
+
+    with pytest.raises(ValueError):
+        icm(stacks, payouts)
+
+
+def test_invalid_stacks():
+    with pytest.raises(ValueError):
+        icm([1000, 0, 500], [100])
+    with pytest.raises(ValueError):
+        icm([], [100])
+    with pytest.raises(ValueError):
+        icm([1000, 500], [])
+
+
+
+def test_fgs_without_hands():
+    stacks, payouts = [5000, 3000, 1500, 500], [50, 30, 20]
+    assert fgs_icm(stacks, payouts, FOLD, (10, 20, 0), hands=0, samples=10) == \
+        pytest.approx(icm(stacks, payouts))
+
+
+def test_fgs_blinds_and_busting():
+    # the small blind posts the last chips and finishes third when the big blind wins them
+    payouts = [50, 30, 20]
+    equities = fgs_icm([1000, 5, 1000], payouts, FOLD, (10, 20, 0), hands=1, samples=100)
+    assert equities == pytest.approx(np.append(icm([1000, 1005], payouts), 20)[[0, 2, 1]])
+
+    # without pushes the big blind wins what the small blind posted
+    cache = {}
+    equities = fgs_icm([1000] * 3, payouts, FOLD, (50, 100, 10), hands=1, samples=100,
+                       cache=cache)
+    assert equities[2] > equities[0] > equities[1]
+    assert equities.sum() == pytest.approx(100)
+    assert len(cache) == 1
+
+
+def test_fgs_with_push_fold():
+    stacks, payouts = [1000, 800, 600, 400], [50, 30, 20]
+    cache = {}
+    equities = fgs_icm(stacks, payouts, PUSH, (50, 100, 10), hands=3, samples=20000,
+                       random_state=0, cache=cache)
+    assert equities.sum() == pytest.approx(100)
+    assert equities == pytest.approx(icm(stacks, payouts), abs=2)
+    assert 1 < len(cache) < 20000
+    same = fgs_icm(stacks, payouts, [PUSH] * 4, (50, 100, 10), hands=3, samples=20000,
+                   processes=2, random_state=0)
+    assert (same == equities).all()
+
+    with pytest.raises(ValueError):
+        fgs_icm(stacks, payouts, [PUSH] * 3, (50, 100, 10))
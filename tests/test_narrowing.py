@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+from decimal import Decimal
+import numpy as np
+import pytest
+from poker import _eval
+from poker.constants import Action
+from poker.handhistory import _PlayerAction
+from poker.preflop import PreflopTable
+from poker.narrowing import ActionModel, narrow_range, _range_strengths, _parse_actions
+
+
+FLOP = ['Kh', '8d', '4c']
+
+
+@pytest.fixture(scope='module')
+def table():
+    # preflop strength is the index of the hand
+    strength = np.arange(169) / 168
+    hands = 0.5 + 0.35 * (strength[:, np.newaxis] - strength[np.newaxis, :])
+    return PreflopTable(None, np.round(hands * PreflopTable.scale).astype(np.uint16))
+
+
+def test_range_strengths():
+    values = np.array([3., 1., 2., 2., 5.])
+    weights = np.array([1., 1., 1., 1., 0.])
+    assert _range_strengths(values, weights).tolist() == [0.875, 0.125, 0.5, 0.5, 1]
+    assert _range_strengths(values, np.zeros(5)).tolist() == [0.5] * 5
+
+
+def test_action_model():
+    model = ActionModel({'bet': (0, 0, 1)})
+    strengths = np.array([0, 0.25, 0.5, 0.75, 1])
+    bet = _PlayerAction('villain', Action.BET, Decimal(10))
+    assert model(bet, strengths).tolist() == [0, 0, 0, 0.5, 1]
+    assert model(_PlayerAction('villain', Action.FOLD, None), strengths).tolist() == \
+        [1, 0.75, 0.5, 0.25, 0]
+    assert model(_PlayerAction('villain', Action.WIN, 10), strengths).tolist() == [1] * 5
+
+
+def test_narrow_range():
+    streets = [
+        ((), [_PlayerAction('villain', Action.CALL, Decimal(2))]),
+        (FLOP, [_PlayerAction('hero', Action.BET, Decimal(3)),
+                _PlayerAction('villain', Action.RAISE, Decimal(9)),
+                _PlayerAction('hero', Action.CALL, Decimal(9))]),
+        (FLOP + ['2s'], [_PlayerAction('villain', Action.BET, Decimal(20))]),
+    ]
+    model = ActionModel({'raise': (0, 0, 1), 'bet': (0, 1)})
+    decisions = narrow_range('KK 88 44 AQo 22', streets, 'villain', model, dead=['Ks', 'Qs'])
+    assert [(decision.street, decision.action.action) for decision in decisions] == \
+        [('preflop', Action.CALL), ('flop', Action.RAISE), ('turn', Action.BET)]
+
+    # preflop actions do not change the range without a table
+    preflop = decisions[0].weights
+    # the dead Ks and Qs remove three kings and three AQo
+    assert preflop.sum() == 36 - 3 - 3
+    assert preflop[_eval.combo_index('AhQh')] == 0
+    # sets raise, board cards are removed
+    flop = decisions[1].weights
+    assert flop[_eval.combo_index('8c8h')] > flop[_eval.combo_index('AhQd')] == 0
+    assert flop[_eval.combo_index('8d8h')] == flop[_eval.combo_index('KhKd')] == 0
+    turn = decisions[2].weights
+    assert turn[_eval.combo_index('2s2h')] == 0
+    assert turn[_eval.combo_index('KcKd')] > turn[_eval.combo_index('8c8h')] > 0
+
+
+def test_preflop_table_and_street_models(table):
+    streets = [((), [_PlayerAction('villain', Action.RAISE, Decimal(3))])]
+    weights = narrow_range(np.ones(1326), streets, 'villain', table=table)[0].weights
+    assert weights[_eval.combo_index('AsAh')] > weights[_eval.combo_index('7h2c')]
+
+    models = {'flop': ActionModel()}
+    assert narrow_range(np.ones(1326), streets, 'villain', models, table)[0].weights.sum() == 1326
+
+
+def test_parse_actions():
+    lines = ['Dealt to hero [Ac Jh]', 'lean abadia: raises 40 to 60 and is all-in',
+             'lean: calls 60', 'villain raises to $1.25', 'villain: doesn\'t show hand',
+             'Uncalled bet (80) returned to lean', 'villain folds']
+    assert _parse_actions(lines, ['lean abadia', 'villain', 'hero', 'lean']) == (
+        _PlayerAction('lean abadia', Action.RAISE, Decimal(60)),
+        _PlayerAction('lean', Action.CALL, Decimal(60)),
+        _PlayerAction('villain', Action.RAISE, Decimal('1.25')),
+        _PlayerAction('villain', Action.FOLD, None),
+    )
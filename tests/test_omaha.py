@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import itertools
+import numpy as np
+import pytest
+from poker.constants import Game
+from poker.omaha import omaha_equity, _evaluate_high, _evaluate_low
+from poker import _eval
+
+
+def _reference_high(hand, board):
+    return max(_eval.evaluate(np.array(hole + three))
+               for hole in itertools.combinations(hand, 2)
+               for three in itertools.combinations(board, 3))
+
+
+def _reference_low(hand, board):
+    lows = []
+    for hole, three in itertools.product(itertools.combinations(hand, 2),
+                                         itertools.combinations(board, 3)):
+        ranks = [1 if card >> 2 == 12 else (card >> 2) + 2 for card in hole + three]
+        if len(set(ranks)) == 5 and max(ranks) <= 8:
+            lows.append(sorted(ranks, reverse=True))
+    return min(lows) if lows else None
+
+
+def test_evaluation_uses_exactly_two_hole_cards():
+    random_state = np.random.RandomState(0)
+    for _ in range(100):
+        cards = random_state.permutation(52)[:13].astype(np.int8)
+        hands, board = cards[:8].reshape(1, 2, 4), cards[8:].reshape(1, 5)
+        highs, lows = _evaluate_high(hands, board)[0], _evaluate_low(hands, board)[0]
+        references = [_reference_low(tuple(hand), tuple(board[0])) for hand in hands[0]]
+        for player in range(2):
+            assert highs[player] == _reference_high(tuple(hands[0, player]), tuple(board[0]))
+        if None not in references:
+            assert (lows[0] < lows[1]) == (references[0] < references[1])
+        else:
+            assert [low == 512 for low in lows] == [low is None for low in references]
+
+
+def test_four_of_a_suit_on_board_is_not_a_flush():
+    hands = np.array([_eval.cards_to_array('As Ad Kc Qc'.split())]).reshape(1, 1, 4)
+    board = np.array([_eval.cards_to_array('2h 5h 8h Jh 3c'.split())])
+    category = _evaluate_high(hands, board)[0, 0] >> _eval.CATEGORY_SHIFT
+    assert category == _eval.PAIR
+
+
+class TestOmahaEquity:
+    board = ['Qs', '7h', '2d']
+
+    def test_exact(self):
+        results = omaha_equity(['AsAhKsKh', '7c8c9dTd'], self.board)
+        assert results[0].equity == pytest.approx(0.6537, abs=0.0001)
+        assert sum(result.equity for result in results) == pytest.approx(1)
+
+    def test_sampled_close_to_exact(self):
+        exact = omaha_equity(['AsAhKsKh', '7c8c9dTd'], self.board)
+        sampled = omaha_equity(['AsAhKsKh', '7c8c9dTd'], self.board, samples=5000,
+                               random_state=1)
+        assert sampled[0].equity == pytest.approx(exact[0].equity, abs=0.02)
+
+    def test_hi_lo_splits_the_pot(self):
+        # the wheel is the best low and the best high too
+        results = omaha_equity(['As2h9c9d', 'KsKhQcJd'], '3s 4h 5d Tc Jc'.split(),
+                               game=Game.OHILO)
+        assert results[0] == (1, 1, 1, 1)
+        results = omaha_equity(['As2hKcKd', 'QsQhQcJd'], '3s 4h 8d Qd Jc'.split(),
+                               game='Omaha Hi/Lo')
+        assert results[0].equity == 0.5
+        assert results[0].low == 1 and results[1].high == 1
+
+    def test_no_low_goes_to_high(self):
+        # broadway for the first player, nobody has a low
+        results = omaha_equity(['As2hKcKd', 'QsQhQcJd'], '9s Th Kh Qd Jc'.split(),
+                               game=Game.OHILO)
+        assert results[0] == (1, 1, 1, 1)
+
+    def test_ranges_and_random_hands(self):
+        results = omaha_equity([{'AsAhKsKh': 1, 'AcAdKcKd': 3}, None], self.board,
+                               samples=5000, random_state=2)
+        assert sum(result.equity for result in results) == pytest.approx(1)
+        assert results[0].equity == pytest.approx(0.65, abs=0.05)
+
+    def test_dead_cards(self):
+        with pytest.raises(ValueError):
+            omaha_equity(['AsAhKsKh', '7c8c9dTd'], self.board, dead=['As'])
+
+    @pytest.mark.parametrize('players, kwargs', (
+        (['AsAhKsKh'], {}),
+        (['AsAhKsKh', None], {}),
+        (['AsAhKsKh', 'AsQhJcTc'], {}),
+        (['AsAhKsKh', '7c8c9dTd'], {'game': Game.HOLDEM}),
+        (['AsAhKs', '7c8c9dTd'], {}),
+    ))
+    def test_invalid_arguments_raise_ValueError(self, players, kwargs):
+        with pytest.raises(ValueError):
+            omaha_equity(players, self.board, **kwargs)
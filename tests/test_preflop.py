@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker.preflop import PreflopTable, _get_canonical_pairs, _calculate_pairs, _hand_matchups
+from poker import _eval
+
+
+@pytest.fixture(scope='module')
+def table():
+    # every combo has 75% against any worse combo
+    first, second = np.meshgrid(np.arange(1326), np.arange(1326), indexing='ij')
+    combos = np.where(first > second, 0.75, 0.25) * PreflopTable.scale
+    combos[first == second] = PreflopTable.scale / 2
+    combos[_eval.conflicts(np.arange(1326), np.arange(1326))] = 0
+    return PreflopTable(np.round(combos).astype(np.uint16))
+
+
+def test_canonical_pairs():
+    first, second, keys, reverse = _get_canonical_pairs()
+    assert len(first) == 1326 * 1225 // 2
+    assert len(np.unique(keys)) == 47008
+
+
+def test_suit_isomorphic_pairs_have_the_same_representative():
+    first, second, keys, reverse = _get_canonical_pairs()
+    pair_keys = dict(zip(zip(first, second), keys))
+
+    def get_key(hero, villain):
+        hero, villain = sorted([_eval.combo_index(hero), _eval.combo_index(villain)])
+        return pair_keys[hero, villain]
+
+    assert get_key('AsKs', 'QdQc') == get_key('AhKh', 'QsQc') == get_key('QhQd', 'AcKc')
+    assert get_key('AsKs', 'QdQc') != get_key('AsKs', 'QsQc')
+
+
+def test_calculate_pairs():
+    pair = _eval.combo_index('AsAh') * 1326 + _eval.combo_index('KdKc')
+    equities = _calculate_pairs((np.array([pair]), 20000, 0))
+    assert equities[0] / PreflopTable.scale == pytest.approx(0.8126, abs=0.01)
+    # the seed is in the argument
+    assert (_calculate_pairs((np.array([pair]), 20000, 0)) == equities).all()
+
+
+def test_hand_matchups_are_made_once():
+    possible, hand_combos, matchups = _hand_matchups()
+    assert _hand_matchups()[2] is matchups
+    # AA vs AA: 6 * 1 combos, AKs vs KK: 4 * 3
+    aces, big_slick, kings = [_eval.COMBO_HANDS[_eval.combo_index(combo)]
+                              for combo in ('AsAh', 'AsKs', 'KsKh')]
+    assert matchups[aces, aces] == 6 and matchups[big_slick, kings] == 12
+    assert possible.sum() == 1326 * 1225 and hand_combos.sum() == 1326
+
+
+def test_combo_equity(table):
+    assert table.combo_equity('AsAh', 'KdKc') == pytest.approx(0.75, abs=1e-4)
+    assert table.combo_equity('KdKc', 'AsAh') == pytest.approx(0.25, abs=1e-4)
+    with pytest.raises(ValueError):
+        table.combo_equity('AsAh', 'AsKd')
+
+
+def test_hand_equity(table):
+    assert table.hand_equity('AA', 'KK') == pytest.approx(0.75, abs=1e-4)
+    assert table.hand_equity('AA', 'AA') == pytest.approx(0.5, abs=1e-4)
+
+
+def test_range_equity_is_weighted_by_possible_matchups(table):
+    assert table.range_equity('AA', 'KK') == pytest.approx(0.75, abs=1e-4)
+    assert table.range_equity('AA KK', 'KK') == pytest.approx((36 * 0.75 + 6 * 0.5) / 42,
+                                                              abs=1e-4)
+    assert table.range_equity('XX', 'XX') == pytest.approx(0.5)
+
+
+def test_save_and_load_memory_mapped(table, tmpdir):
+    table.save(unicode(tmpdir))
+    loaded = PreflopTable.load(unicode(tmpdir))
+    assert isinstance(loaded.combos, np.memmap)
+    assert loaded.range_equity('AA KK', 'KK') == table.range_equity('AA KK', 'KK')
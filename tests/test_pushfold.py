@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+from collections import OrderedDict
+import numpy as np
+import pytest
+from poker import Strategy, Range
+from poker.preflop import PreflopTable, _hand_matchups
+from poker.hand import Hand
+from poker.equity import hand_grid
+from poker.pushfold import (solve_push_fold, push_fold_strategy, evaluate_strategy, _PushFoldGame,
+                            _HAND_COMBOS)
+
+
+@pytest.fixture(scope='module')
+def table():
+    # hand equities depending smoothly on the difference of the hands' strength (their index)
+    strength = np.arange(169) / 168
+    hands = 0.5 + 0.35 * (strength[:, np.newaxis] - strength[np.newaxis, :])
+    return PreflopTable(None, np.round(hands * PreflopTable.scale).astype(np.uint16))
+
+
+def _is_top(probabilities):
+    """Whether hands are played from the strongest (the biggest index) ones."""
+    played = probabilities >= 0.5
+    return not played.any() or played[np.argmax(played):].all()
+
+
+def test_heads_up(table):
+    solution = solve_push_fold(table, [10, 10])
+    assert solution.positions == ('sb', 'bb')
+    assert list(solution.push) == ['sb']
+    assert list(solution.call) == [('sb', 'bb')]
+    push, call = solution.push['sb'], solution.call['sb', 'bb']
+    assert _is_top(push) and _is_top(call)
+    # the small blind pushes wider than the big blind calls
+    assert (push >= 0.5).sum() > (call >= 0.5).sum() > 0
+    # chip EV is zero sum
+    assert sum(solution.ev.values()) == pytest.approx(20)
+    assert isinstance(solution.push_range('sb'), Range)
+    assert len(solution.push_range('sb')) == _HAND_COMBOS[push >= 0.5].sum()
+
+
+def test_shorter_stacks_push_wider(table):
+    short = solve_push_fold(table, [5, 5]).push['sb']
+    deep = solve_push_fold(table, [20, 20]).push['sb']
+    assert (short >= 0.5).sum() > (deep >= 0.5).sum()
+
+
+def test_heads_up_action_evs(table):
+    """Compare to the EVs calculated by hand with random strategies."""
+    random_state = np.random.RandomState(0)
+    push, call = random_state.random_sample((1, 169)), random_state.random_sample((2, 2, 169))
+    game = _PushFoldGame(table, np.array([8., 12.]), 0.5, 1, 0, None)
+    push_evs, call_evs, push_reach, call_reach = game.action_evs(push, call)
+
+    equities = np.asarray(table.hands) / table.scale
+    matchups = _hand_matchups()[2]
+    called = matchups.dot(call[0, 1]) / (_HAND_COMBOS * 1225)
+    equity = (matchups * equities).dot(call[0, 1]) / matchups.dot(call[0, 1])
+    assert push_evs[0, 0] == pytest.approx(7.5)
+    assert push_evs[1, 0] == pytest.approx((1 - called) * 9 + called * equity * 16)
+
+    pushes = matchups.dot(push[0])
+    equity = (matchups * equities).dot(push[0]) / pushes
+    assert call_evs[0, 0, 1] == pytest.approx(11)
+    assert call_evs[1, 0, 1] == pytest.approx(equity * 20 + (1 - equity) * 4)
+    assert push_reach == pytest.approx([1])
+    assert call_reach[0, 1] == pytest.approx(push[0].dot(_HAND_COMBOS) / 1326)
+
+
+def test_equilibrium_is_not_exploitable(table):
+    stacks = [12, 8, 15, 10]
+    solution = solve_push_fold(table, stacks, ante=0.1, tolerance=1e-5)
+    game = _PushFoldGame(table, np.array(stacks, dtype=np.float64), 0.5, 1, 0.1, None)
+    push = np.array(list(solution.push.values()))
+    call = np.zeros((4, 4, 169))
+    for (pusher, caller), probabilities in solution.call.items():
+        call[solution.positions.index(pusher), solution.positions.index(caller)] = probabilities
+    regret = game.best_responses(push, call, *game.action_evs(push, call))[2]
+    assert regret < 1e-5 * sum(stacks)
+    assert sum(solution.ev.values()) == pytest.approx(sum(stacks))
+    assert all(_is_top(probabilities) for probabilities in solution.push.values())
+
+
+def test_icm_tightens_calls(table):
+    stacks = [10, 10, 10, 10]
+    chips = solve_push_fold(table, stacks)
+    prizes = solve_push_fold(table, stacks, payouts=[50, 30, 20])
+    assert sum(prizes.ev.values()) == pytest.approx(100)
+    # on the bubble busting costs more than doubling up wins, so calls are tighter
+    for pusher, caller in chips.call:
+        assert ((prizes.call[pusher, caller] >= 0.5).sum() <
+                (chips.call[pusher, caller] >= 0.5).sum())
+
+
+def test_push_fold_strategy(table):
+    solutions = OrderedDict((('%d BB' % depth, solve_push_fold(table, [depth] * 3))
+                             for depth in (8, 10)))
+    strategy = Strategy(push_fold_strategy(solutions, calls=True))
+    assert list(strategy) == ['8 BB', '8 BB vs BTN', '8 BB vs SB', '10 BB', '10 BB vs BTN',
+                              '10 BB vs SB']
+    assert strategy.name == 'Preflop PUSH'
+
+    situation = strategy['10 BB']
+    assert situation.inaction == 'PUSH'
+    assert situation.btn == solutions['10 BB'].push_range('btn')
+    assert situation.sb == solutions['10 BB'].push_range('sb')
+    assert situation.bb is None and situation.utg is None
+
+    situation = strategy['8 BB vs BTN']
+    assert situation.inaction == 'CALL'
+    assert situation.btn is None
+    assert situation.sb == solutions['8 BB'].call_range('btn', 'sb')
+    assert situation.bb == solutions['8 BB'].call_range('btn', 'bb')
+
+    assert list(Strategy(push_fold_strategy(solutions))) == ['8 BB', '10 BB']
+
+
+def test_evaluate_equilibrium_strategy(table):
+    solution = solve_push_fold(table, [10] * 3)
+    strategy = Strategy(push_fold_strategy({'10 BB': solution}, calls=True))
+    results = evaluate_strategy(table, strategy)
+    assert list(results) == ['10 BB']
+    assert list(results['10 BB']) == ['btn', 'sb']
+    for position, result in results['10 BB'].items():
+        assert result.grid.shape == (13, 13)
+        assert result.ev == pytest.approx(solution.ev[position], abs=0.05)
+        # pushed hands win more than folding them, the rest do not
+        push_range = solution.push_range(position)
+        grid = hand_grid(dict((hand, hand in push_range.hands) for hand in Hand))
+        assert (result.grid[grid == 1] > -0.01).all()
+        assert (result.grid[grid == 0] < 0.01).all()
+        assert result.gain > 0
+
+
+def test_evaluate_strategy(table):
+    strategy = Strategy('[strategy]\ninaction = PUSH\n\n[10 BB]\nBTN = 22+\nSB = XX\n\n'
+                        '[ignored]\ninaction = CALL\nBB = AA\n')
+    chips = evaluate_strategy(table, strategy, 'AA')
+    assert list(chips) == ['10 BB']
+    # with the tightest calls pushing any hand is profitable
+    assert (chips['10 BB']['sb'].grid > 0).all()
+    assert chips['10 BB']['btn'].gain > 0
+
+    calls = {'sb': 'XX', 'bb': 'XX'}
+    looser = evaluate_strategy(table, strategy, calls)['10 BB']
+    assert looser['sb'].gain < chips['10 BB']['sb'].gain
+    # against any two cards the best hand gains the most
+    assert looser['sb'].grid[0, 0] == np.nanmax(looser['sb'].grid)
+    assert looser['sb'].grid[12, 11] < 0
+
+    deeper = evaluate_strategy(table, strategy, calls, stacks=[20, 15, 15])['10 BB']
+    # more is won and lost with deeper stacks
+    assert np.nanmax(deeper['sb'].grid) > np.nanmax(looser['sb'].grid)
+    assert np.nanmin(deeper['sb'].grid) < np.nanmin(looser['sb'].grid)
+    prizes = evaluate_strategy(table, strategy, calls, payouts=[50, 30, 20])['10 BB']
+    assert prizes['sb'].gain < 0
+    assert (prizes['btn'].ev + prizes['sb'].ev) < 100
+
+    with pytest.raises(ValueError):
+        evaluate_strategy(table, Strategy('[strategy]\n[short]\nSB = XX\n'), 'AA')
+
+
+def test_invalid_stacks(table):
+    with pytest.raises(ValueError):
+        solve_push_fold(table, [10])
+    with pytest.raises(ValueError):
+        solve_push_fold(table, [10] * 10)
+    with pytest.raises(ValueError):
+        solve_push_fold(table, [10, 0, 10])
@@ -453,3 +453,70 @@ class TestContains:
 
 def test_pickable():
     assert pickle.loads(pickle.dumps(Range('Ako 22+'))) == Range('AKo 22+')
+
+
+def test_unpickle_sets_of_hands_and_combos():
+    range = Range.__new__(Range)
+    range.__setstate__({'_hands': {Hand('AKo'), Hand('22')}, '_combos': {Combo('AsKs')}})
+    assert range == Range('AKo 22 AsKs')
+
+
+class TestSetOperations:
+    def test_union(self):
+        assert Range('22+ A2s+') | Range('TT+ AKo 72o') == Range('22+ A2s+ AKo 72o')
+
+    def test_intersection(self):
+        assert Range('22+ A2s+') & Range('TT+ AKo AhKh') == Range('TT+ AhKh')
+
+    def test_difference(self):
+        assert Range('XX') - Range('AA') == \
+            Range('KK- A2+ K2+ Q2+ J2+ T2+ 92+ 82+ 72+ 62+ 52+ 42+ 32')
+        assert Range('AK') - Range('AsKs') == Range('AcKc AdKd AhKh AKo')
+
+    def test_symmetric_difference(self):
+        assert Range('22+') ^ Range('TT+ AKs') == Range('22-99 AKs')
+
+    def test_other_types_are_not_supported(self):
+        with pytest.raises(TypeError):
+            Range('AA') | 'KK'
+
+    def test_subsets(self):
+        assert Range('AsKs').issubset(Range('AK'))
+        assert not Range('AK').issubset(Range('AKs'))
+        assert Range('22+').issuperset(Range('TT+'))
+        assert Range('22+').isdisjoint(Range('AK'))
+        assert not Range('AK').isdisjoint(Range('AsKs'))
+
+    def test_equal_ranges_have_the_same_hash(self):
+        assert hash(Range('AA AhKh')) == hash(Range('AhKh AsAh AA'))
+        assert Range('AA') != Range('KK')
+        assert not Range('AA') != Range('AA')
+
+    def test_length_and_membership_of_results(self):
+        range = Range('XX') - Range('AA')
+        assert len(range) == 1320
+        assert range.percent == 99.55
+        assert 'AsAh' not in range
+        assert Hand('AA') not in range
+        assert Combo('KsKh') in range
+
+    def test_from_objects(self):
+        assert Range.from_objects([Hand('AKs'), Combo('2s2h'), '33']) == Range('AKs 2s2h 33')
+
+
+class TestHeatmap:
+    def test_html_cells_colored_from_red_to_green(self):
+        html = Range('AA KK').to_html(heatmap={Hand('AA'): 1, Hand('KK'): 0, Hand('QQ'): 0.5})
+        assert '<td class="pair" style="background-color:#00ff00">AA</td>' in html
+        assert '<td class="pair" style="background-color:#ff0000">KK</td>' in html
+        # not in range
+        assert '<td class="pair">QQ' not in html
+        assert 'ffff00' not in html
+
+    def test_without_heatmap_html_is_unchanged(self):
+        assert Range('AA').to_html() == Range('AA').to_html(heatmap={})
+
+    def test_ascii_colored_with_ansi_codes(self):
+        ascii = Range('AA').to_ascii(heatmap={Hand('AA'): 0.5})
+        assert '\x1b[30;48;5;226mAA  \x1b[0m' in ascii
+        assert len(Range('AA').to_ascii()) == len(ascii) - len('\x1b[30;48;5;226m\x1b[0m')
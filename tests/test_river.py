@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker import _eval
+from poker.river import solve_river, _build_tree, _Matchups
+
+
+BOARD = ['Kh', '8d', '4c', '2s', '2h']
+
+
+def _weighted_ev(solution, player):
+    ev, weights = solution.ev[player], solution.weights[player]
+    live = ~np.isnan(ev)
+    return weights[live].dot(ev[live]) / weights[live].sum()
+
+
+def test_matchups():
+    board = _eval.cards_to_array(['Ks', '8h', '3h', '2c', '7d'])
+    live = np.flatnonzero((_eval.COMBO_MASKS & _eval.cards_to_mask(board)) == 0)
+    random_state = np.random.RandomState(0)
+    heroes = random_state.choice(live, 300, replace=False)
+    villains = random_state.choice(live, 500, replace=False)
+    cards = np.empty((1326, 7), dtype=np.int8)
+    cards[:, :2], cards[:, 2:] = _eval.COMBO_CARDS, board
+    values = _eval.evaluate(cards)
+
+    weights = random_state.random_sample(len(villains))
+    win, tie, total = _Matchups(heroes, values[heroes], villains,
+                                values[villains]).compare(weights)
+    possible = ~_eval.conflicts(heroes, villains)
+    difference = values[heroes][:, np.newaxis] - values[villains][np.newaxis, :]
+    assert win == pytest.approx(((difference > 0) & possible).dot(weights))
+    assert tie == pytest.approx(((difference == 0) & possible).dot(weights))
+    assert total == pytest.approx(possible.dot(weights))
+
+
+def test_bet_tree():
+    root = _build_tree(10, 30, (0.5, 1), (1,), 1, True)
+    assert root.actions == ('check', 'bet 5', 'bet 10', 'allin')
+    assert root.children['check'].actions == ('check', 'bet 5', 'bet 10', 'allin')
+    assert root.children['check'].children['check'].is_terminal
+    # raise to the call plus the pot after calling, capped at the stack
+    assert root.children['bet 5'].actions == ('fold', 'call', 'raise 25', 'allin')
+    assert root.children['bet 10'].actions == ('fold', 'call', 'allin')
+    # only one raise
+    assert root.children['bet 5'].children['raise 25'].actions == ('fold', 'call')
+    assert root.children['allin'].actions == ('fold', 'call')
+    node = root.children['check'].children['bet 5'].children['call']
+    assert node.is_terminal and node.contributions == (5, 5)
+
+    root = _build_tree(10, 30, (0.5,), (), 2, False)
+    assert root.actions == ('check', 'bet 5')
+    assert root.children['bet 5'].actions == ('fold', 'call')
+
+
+def test_polarized_against_bluffcatchers():
+    """Nuts and air against bluffcatchers with one pot sized bet: the betting range has one
+    bluff for every two value bets, the bluffcatchers call half the time."""
+    # as much air as the three possible combos of eights
+    nuts, air = _eval.to_weights('8h8c 8h8s 8c8s'), _eval.to_weights('76o')
+    oop = nuts + air * 3 / air.sum()
+    solution = solve_river(oop, 'KQo', BOARD, 10, 10, bet_sizes=(1,), raise_sizes=(),
+                           allin=False, iterations=2000, tolerance=0.0001)
+    assert solution.exploitability < 0.01
+    assert solution.root.actions == ('check', 'allin')
+
+    bets = solution.strategy()['allin']
+    assert bets[nuts > 0].sum() == pytest.approx(3, abs=0.01)
+    assert bets[air > 0].sum() == pytest.approx(1.5, abs=0.01)
+    calls = solution.strategy('allin')['call'].sum() / solution.ranges('allin')[1].sum()
+    assert calls == pytest.approx(0.5, abs=0.01)
+    # the nuts win the pot and the bet half the time, the air breaks even
+    assert _weighted_ev(solution, 0) == pytest.approx(7.5, abs=0.01)
+    assert _weighted_ev(solution, 1) == pytest.approx(2.5, abs=0.01)
+
+
+def test_solution():
+    solution = solve_river('AA KK 88 33 22 77 AhQh JhTh 6h5h', 'KQ KJ AK 99 T9s',
+                           ['Ks', '8h', '3h', '2c', '7d'], 10, 30, iterations=200)
+    assert solution.exploitability < 0.01
+    assert solution.ranges().tolist() == solution.weights.tolist()
+
+    node = solution.node('check')
+    assert node.player == 1
+    in_range = solution.weights[1] > 0
+    assert node.strategy.shape == (4, 1326)
+    assert node.strategy[:, in_range].sum(axis=0) == pytest.approx(1)
+    assert not node.strategy[:, ~in_range].any()
+
+    strategy = solution.strategy('check')
+    assert list(strategy) == list(node.actions)
+    assert sum(strategy.values()) == pytest.approx(solution.ranges('check')[1])
+    assert solution.ranges('check')[0] == pytest.approx(solution.strategy()['check'])
+
+    assert _weighted_ev(solution, 0) + _weighted_ev(solution, 1) == pytest.approx(10, abs=0.1)
+    # sets win at least the pot
+    assert solution.ev[0, _eval.combo_index('8c8d')] >= 10
+    assert np.isnan(solution.ev[1, _eval.combo_index('8c8d')])
+
+
+def test_invalid_spots():
+    with pytest.raises(ValueError):
+        solve_river('AA', 'KK', BOARD[:4], 10, 10)
+    with pytest.raises(ValueError):
+        solve_river('KhKd', 'AA', BOARD, 10, 10)
+    with pytest.raises(ValueError):
+        solve_river('AsAd', 'AsAh', BOARD, 10, 10, dead=['Ah'])
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import threading
+import multiprocessing
+import pytest
+from poker.hand import Range, Combo
+from poker.equity import equity
+from poker.service import EquityService, CancelledError, TimeoutError
+
+
+@pytest.fixture(scope='module')
+def service():
+    service = EquityService(processes=2)
+    yield service
+    service.close()
+
+
+def test_result_is_the_same_as_synchronous(service):
+    request = service.submit(Combo('AsKs'), Range('QQ JJ'), ['Qh', '7s', '2s'])
+    assert request.result(timeout=30) == equity('AsKs', 'QQ JJ', ['Qh', '7s', '2s'])
+    assert request.done()
+
+
+def test_identical_requests_are_merged(service):
+    first = service.submit('XX', 'XX', ['Qh', '7s', '2s'])
+    second = service.submit('XX', 'XX', ['Qd', '7c', '2c'])
+    assert first.key == second.key
+    assert list(service._in_flight.values()) == [[first, second]]
+    assert first.result(timeout=60) == second.result(timeout=60)
+    assert service._in_flight == {}
+
+
+def test_cancel(service):
+    first = service.submit('XX', 'XX', ['Qh', '7s', '2s'])
+    second = service.submit('XX', 'XX', ['Qh', '7s', '2s'])
+    assert first.cancel()
+    assert first.cancelled()
+    with pytest.raises(CancelledError):
+        first.result()
+    assert second.result(timeout=60).equity == pytest.approx(0.5)
+    assert not second.cancel()
+
+
+def test_deadline(service):
+    request = service.submit('XX', 'XX', deadline=0.01, samples=10 ** 6)
+    with pytest.raises(TimeoutError):
+        request.result(timeout=30)
+    # later identical requests start a new calculation
+    assert request not in service._in_flight.get(request.key, [])
+    assert request.key not in service._in_flight
+
+
+class RecordingPool(object):
+    def __init__(self):
+        self.arguments = []
+
+    def apply_async(self, function, arguments, callback):
+        self.arguments.append(arguments[0])
+
+
+def test_unseeded_sampled_requests_are_independent():
+    service = EquityService()
+    service._pool = RecordingPool()
+    service.submit('AA', 'KK', samples=2000)
+    service.submit('AA', 'QQ', samples=2000)
+    service.submit('AA', 'KK', ['2c', '3d', '4h'])
+    first, second, exact = [argument[4] for argument in service._pool.arguments]
+    # the workers are forked with the same global random state, every job gets its own stream
+    assert first.randint(1 << 30, size=5).tolist() != second.randint(1 << 30, size=5).tolist()
+    assert exact is None
+
+
+def test_result_timeout(service):
+    request = service.submit('XX', 'AA', ['Kh', '7s', '2s'])
+    with pytest.raises(TimeoutError):
+        request.result(timeout=0)
+    request.result(timeout=60)
+
+
+def test_errors_are_raised(service):
+    request = service.submit('AsAh', 'AsAd', ['Kh', '7s', '2s'])
+    with pytest.raises(ValueError):
+        request.result(timeout=30)
+
+
+def test_done_callback(service):
+    called = threading.Event()
+    request = service.submit('AsAh', 'KK', ['Kh', '7s', '2s'])
+    request.add_done_callback(lambda request: called.set())
+    assert called.wait(30)
+    request.add_done_callback(lambda request: called.clear())
+    assert not called.is_set()
+
+
+def test_close_fails_running_requests():
+    before = set(multiprocessing.active_children())
+    service = EquityService(processes=1)
+    called = threading.Event()
+    request = service.submit('XX', 'XX', samples=10 ** 7)
+    request.add_done_callback(lambda request: called.set())
+    service.close()
+    assert called.is_set()
+    with pytest.raises(CancelledError):
+        request.result(timeout=0)
+    assert service._in_flight == {}
+    # the terminated workers are joined
+    assert set(multiprocessing.active_children()) <= before
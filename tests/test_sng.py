@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import numpy as np
+import pytest
+from poker import Strategy
+from poker.sng import simulate_sng, _compile_chart, _deal, _play_tournaments
+
+
+LEVELS = [(10, 20, 0), (25, 50, 5), (50, 100, 10), (100, 200, 25)]
+
+ANY_TWO = Strategy("""
+[strategy]
+name = Any two
+inaction = PUSH
+outaction = FOLD
+
+[10 BB]
+BTN = XX
+SB = XX
+
+[10 BB vs BTN]
+inaction = CALL
+SB = 22+ A2+ K2+ Q2+ J7+
+BB = 22+ A2+ K2+ Q2+ J7+
+
+[10 BB vs SB]
+inaction = CALL
+BB = 22+ A2+ K2+ Q2+ J7+
+""")
+
+TIGHT = Strategy("""
+[strategy]
+name = Tight
+inaction = PUSH
+outaction = FOLD
+
+[30 BB]
+BTN = QQ+
+SB = QQ+
+
+[5 BB]
+BTN = 22+ A2+ K2+
+SB = 22+ A2+ K2+
+""")
+
+
+def test_deal():
+    cards = _deal(10000, 23, np.random.RandomState(0))
+    assert cards.shape == (10000, 23)
+    assert all(len(set(row)) == 23 for row in cards[:100])
+    counts = np.bincount(cards[:, 0], minlength=52)
+    assert counts.min() > 100 and counts.max() < 300
+
+
+def test_compile_chart():
+    chart = _compile_chart(TIGHT, 'AA')
+    assert chart.depths.tolist() == [5, 30]
+    assert chart.push.shape == (2, 9, 1326) and chart.call.shape == (2, 9, 9, 1326)
+    # btn, sb
+    assert chart.push[1, 6].sum() == chart.push[1, 7].sum() == 18
+    assert not chart.push[1, 8].any()
+    assert chart.call[0, 6, 8].sum() == 6
+
+    chart = _compile_chart(ANY_TWO, None)
+    assert chart.depths.tolist() == [10]
+    assert chart.call[0, 6, 7].sum() == chart.call[0, 7, 8].sum() > 0
+    assert not chart.call[0, 7, 6].any()
+
+
+def test_every_place_once():
+    chart = _compile_chart(ANY_TWO, None)
+    places = _play_tournaments(([chart], [0, 0, 0], np.array([500., 1000., 1500.]), LEVELS, 5,
+                                1000, 500, np.random.RandomState(0)))
+    assert (np.sort(places, axis=1) == [1, 2, 3]).all()
+    # the biggest stack wins most often
+    assert (places == 1).mean(axis=0).argmax() == 2
+
+
+def test_symmetric_field():
+    results = simulate_sng(ANY_TWO, [1000] * 3, LEVELS, [30, 0, 0], tournaments=3000,
+                           random_state=0)
+    assert sum(result.roi for result in results) == pytest.approx(0)
+    for result in results:
+        assert result.finishes.sum() == pytest.approx(1)
+        assert result.itm == pytest.approx(result.finishes[0])
+        assert result.roi_interval[0] < 0 < result.roi_interval[1]
+        assert result.itm_interval[0] < 1 / 3 < result.itm_interval[1]
+
+
+def test_compare_charts():
+    results = simulate_sng([ANY_TWO, TIGHT, TIGHT], [1000] * 3, LEVELS, [20, 10],
+                           tournaments=2000, calls='AA', hands_per_level=5, random_state=1)
+    # pushing any two into the tight players who only call with aces wins
+    assert results[0].roi_interval[0] > 0
+    assert results[0].itm > results[1].itm
+    assert results[0].finishes.tolist() != results[1].finishes.tolist()
+    assert results[0].roi == pytest.approx(results[0].finishes.dot([2, 1, 0]) - 1)
+
+
+def test_same_results_with_processes():
+    arguments = (ANY_TWO, [1000] * 2, LEVELS, [2]), dict(tournaments=6000, random_state=2)
+    single = simulate_sng(*arguments[0], **arguments[1])
+    parallel = simulate_sng(*arguments[0], processes=2, **arguments[1])
+    assert [result.finishes.tolist() for result in single] == \
+        [result.finishes.tolist() for result in parallel]
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        simulate_sng(ANY_TWO, [1000], LEVELS, [1])
+    with pytest.raises(ValueError):
+        simulate_sng([ANY_TWO, TIGHT], [1000] * 3, LEVELS, [1])
+    with pytest.raises(ValueError):
+        simulate_sng(ANY_TWO, [1000, 0], LEVELS, [1])
+    with pytest.raises(ValueError):
+        simulate_sng(Strategy('[strategy]\n[10 BB]\ninaction = CALL\nBB = AA\n'), [1000] * 2,
+                     LEVELS, [1])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, absolute_import, division, print_function
+
+import itertools
+import numpy as np
+import pytest
+from poker.strength import hand_strengths, range_strength, strength_buckets
+from poker import _eval
+
+
+def _reference(combo, board, villain_weights, bins):
+    """Hand strength and potentials by comparing with every villain combo on every runout."""
+    hero_cards = list(_eval.COMBO_CARDS[combo])
+    board = list(board)
+
+    def value(cards, runout=()):
+        return _eval.evaluate(np.array(list(cards) + board + list(runout)))
+
+    villains = [(villain, list(_eval.COMBO_CARDS[villain]))
+                for villain in np.flatnonzero(villain_weights)]
+    villains = [(villain, cards) for villain, cards in villains
+                if not set(cards) & set(hero_cards + board)]
+    deck = [card for card in range(52) if card not in hero_cards + board]
+
+    current, potentials = np.zeros(3), np.zeros((3, 3))
+    squares, histogram = 0, np.zeros(bins)
+    for villain, cards in villains:
+        difference = value(hero_cards) - value(cards)
+        current[0 if difference > 0 else 1 if difference == 0 else 2] += 1
+    for runout in itertools.combinations(deck, 5 - len(board)):
+        outcomes = np.zeros(3)
+        for villain, cards in villains:
+            if set(cards) & set(runout):
+                continue
+            current_class = np.sign(value(cards) - value(hero_cards)) + 1
+            outcome = np.sign(value(cards, runout) - value(hero_cards, runout)) + 1
+            potentials[current_class, outcome] += 1
+            outcomes[outcome] += 1
+        strength = (outcomes[0] + outcomes[1] / 2) / outcomes.sum()
+        squares += outcomes.sum() * strength ** 2
+        histogram[min(int(strength * bins), bins - 1)] += outcomes.sum()
+
+    hs = (current[0] + current[1] / 2) / current.sum()
+    ppot = ((potentials[2, 0] + potentials[2, 1] / 2 + potentials[1, 0] / 2) /
+            (potentials[2].sum() + potentials[1].sum() / 2))
+    npot = ((potentials[0, 2] + potentials[1, 2] / 2 + potentials[0, 1] / 2) /
+            (potentials[0].sum() + potentials[1].sum() / 2))
+    return hs, ppot, npot, squares / potentials.sum(), histogram / potentials.sum()
+
+
+@pytest.mark.parametrize('combo', ['AsKs', '9h8h', 'Kh3h'])
+def test_hand_strengths_on_the_turn(combo):
+    board, villain = ['Ah', '7d', '2c', 'Ts'], 'QQ+ AKs 98s 76s'
+    strengths = hand_strengths(board, villain=villain, bins=5)
+    index = _eval.combo_index(combo)
+    hs, ppot, npot, ehs2, histogram = _reference(index, _eval.cards_to_array(board),
+                                                 _eval.to_weights(villain), 5)
+    assert strengths.hs[index] == pytest.approx(hs)
+    assert strengths.ppot[index] == pytest.approx(ppot)
+    assert strengths.npot[index] == pytest.approx(npot)
+    assert strengths.ehs[index] == pytest.approx(hs * (1 - npot) + (1 - hs) * ppot)
+    assert strengths.ehs2[index] == pytest.approx(ehs2)
+    assert strengths.histogram[index] == pytest.approx(histogram)
+
+
+def test_hand_strengths_of_every_combo():
+    strengths = hand_strengths(['Ah', '7d', '2c', 'Ts', '3s'])
+    possible = ~np.isnan(strengths.hs)
+    assert possible.sum() == 1081
+    # against a random hand the average combo is in the middle
+    assert strengths.hs[possible].mean() == pytest.approx(0.5)
+    # no cards to come
+    assert (strengths.ppot[possible] == 0).all() and (strengths.npot[possible] == 0).all()
+    assert strengths.ehs[possible] == pytest.approx(strengths.hs[possible])
+    assert strengths.ehs2[possible] == pytest.approx(strengths.hs[possible] ** 2)
+    # the wheel is the nuts, only tied by other wheels
+    assert strengths.hs[_eval.combo_index('4s5s')] == np.nanmax(strengths.hs)
+
+
+def test_range_strength_is_the_strength_of_its_combos():
+    board = ['Ah', '7d', '2c', 'Ts']
+    combo = range_strength('AsKs', board)
+    strengths = hand_strengths(board)
+    index = _eval.combo_index('AsKs')
+    for field, value in zip(combo._fields, combo):
+        assert value == pytest.approx(getattr(strengths, field)[index])
+
+    weights = np.zeros(1326)
+    weights[[_eval.combo_index('AsKs'), _eval.combo_index('KcKd')]] = [1, 0.5]
+    both = range_strength(weights, board, samples=200, random_state=1)
+    assert 0 < both.npot < both.ehs < both.hs < 1
+    assert both.histogram.sum() == pytest.approx(1)
+
+
+@pytest.mark.parametrize('method', ['ehs2', 'histogram'])
+def test_strength_buckets(method):
+    board = ['Ah', '7d', '2c', 'Ts']
+    buckets = strength_buckets(board, 8, method=method)
+    strengths = hand_strengths(board)
+    assert (buckets[np.isnan(strengths.ehs)] == -1).all()
+    assert set(buckets[buckets >= 0]) == set(range(8))
+
+    bucket_ehs = [strengths.ehs[buckets == bucket].mean() for bucket in range(8)]
+    assert bucket_ehs == sorted(bucket_ehs)
+    if method == 'ehs2':
+        ranges = sorted((strengths.ehs2[buckets == bucket].min(),
+                         strengths.ehs2[buckets == bucket].max()) for bucket in range(8))
+        assert all(low[1] < high[0] for low, high in zip(ranges, ranges[1:]))
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        hand_strengths(['Ah', '7d'])
+    with pytest.raises(ValueError):
+        range_strength('AhAd', ['Ah', '7d', '2c'])
+    with pytest.raises(ValueError):
+        strength_buckets(['Ah', '7d', '2c'], 5, method='emd')